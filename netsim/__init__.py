@@ -0,0 +1,30 @@
+from .backends import HAVE_NUMBA, get_backend
+from .engine import (IZ_COLUMNS, IZ_RS, IZ_SPN, IZ_TAN, init_state,
+                     make_iz_params, prepare_weights, remove_autapses, step,
+                     synaptic_input, unpack_iz_params)
+from .network import run_network, simulate_network
+from .experiment import (default_learning_params, run_reward_learning,
+                         simulate_trial_batch, top_hat_input)
+from .runner import run_reward_learning_pool, run_units, spawn_rngs
+from .monitors import SpikeMonitor, StateMonitor, SummaryMonitor
+from .spikes import SpikeTrains
+from .connectivity import random_weights, weight_block
+from .inputs import (ArrayInput, Constant, HeldRandom, InputSource, Piecewise,
+                     as_input, top_hat)
+from .correlation import CorrelationMonitor, OnlineCovariance
+from .clustering import cluster_traces, knn_graph, membership_matrix
+from .analysis import ClusterAnalysis, dendrogram_colour_count
+from .results import SimulationResults
+from .readout import ClusterReadout
+from .store import ChunkedArray, ResultStore, StoreMonitor
+from .cache import StageCache, input_key
+from .checkpoint import Checkpointer, load_checkpoint, save_checkpoint
+from .sweep import (grid, learning_point, lhs, network_point, network_unit,
+                    random_points, run_adaptive_sweep, run_sweep)
+from .stopping import (Plateau, Saturated, Silent, StoppingCriterion,
+                       WeightConvergence, WeightsPinned, check_stopping)
+from .golden import (assert_golden, capture_golden, check_golden,
+                     reference_learning, reference_network)
+from .profiling import Profiler, profiled
+from .plotting import (lttb, new_figure, plot_raster, plot_trace, raster_image,
+                       results_figure, save_figure)
@@ -0,0 +1,192 @@
+import functools
+import hashlib
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+from scipy.cluster.hierarchy import cophenet, fcluster, linkage
+from scipy.spatial.distance import pdist
+
+from . import profiling
+from .clustering import cluster_traces
+
+# scipy's dendrogram cycles through C1 .. C9 below the colour threshold
+N_DENDROGRAM_COLOURS = 9
+
+
+def data_key(*arrays, **options):
+    '''Content hash of arrays (shape, dtype and bytes) plus options.'''
+    h = hashlib.blake2b(digest_size=16)
+    for x in arrays:
+        x = np.ascontiguousarray(x)
+        h.update(str((x.shape, x.dtype.str)).encode())
+        h.update(x.data)
+    h.update(repr(sorted(options.items())).encode())
+    return h.hexdigest()
+
+
+def dendrogram_colour_count(Z, n_colours=N_DENDROGRAM_COLOURS):
+    '''
+    np.unique(dendrogram(Z, no_plot=True)['color_list']).shape[0] without
+    laying out the dendrogram.
+
+    Links below 0.7 * max height are coloured per subtree, cycling through
+    n_colours colours; links at or above it share one extra colour.
+    '''
+    h = Z[:, 2]
+    threshold = 0.7 * h.max()
+    below = h < threshold
+
+    # a coloured subtree starts at a link below threshold whose parent is not
+    n_leaves = Z.shape[0] + 1
+    parent_below = np.zeros(Z.shape[0], dtype=bool)
+    children = Z[:, :2].astype(np.int64) - n_leaves
+    for col in range(2):
+        is_link = children[:, col] >= 0
+        parent_below[children[is_link, col]] = below[is_link]
+    n_subtrees = np.count_nonzero(below & ~parent_below)
+
+    return min(n_subtrees, n_colours) + int(not below.all())
+
+
+def _shared(func):
+    '''
+    cached_property that also stores its value in the instance's
+    _artefacts dict, which ClusterAnalysis.of shares between instances.
+    '''
+    name = func.__name__
+
+    @functools.wraps(func)
+    def get(self):
+        if name not in self._artefacts:
+            self._artefacts[name] = func(self)
+        return self._artefacts[name]
+
+    return cached_property(get)
+
+
+class ClusterAnalysis:
+    '''
+    Correlation clustering of a set of traces, each artefact computed once
+    on first access.
+
+    The pipeline is the one in the scratch scripts: cormat = np.corrcoef(g),
+    Ward linkage on the rows of cormat, n_clusters from the dendrogram colour
+    count and labels from fcluster(..., 'maxclust'). engine='spectral' or
+    'minibatch' takes the labels from clustering.cluster_traces instead
+    (linkage, cophenet and n_clusters' dendrogram rule then do not apply).
+    A precomputed cormat (e.g. from CorrelationMonitor) can be passed in
+    place of g for the linkage engine.
+
+    Use ClusterAnalysis.of(...) to share the work between the code that
+    simulates and the code that plots: the derived artefacts (cormat,
+    linkage, cophenet, n_clusters, labels) of the last cache_size analyses
+    are memoized on a hash of the data and options. Instances, and so the
+    traces g, are not kept.
+    '''
+
+    _cache = OrderedDict()
+    cache_size = 8
+
+    def __init__(self,
+                 g=None,
+                 cormat=None,
+                 method='ward',
+                 optimal_ordering=True,
+                 engine='linkage',
+                 n_clusters=None,
+                 **engine_options):
+        if g is None and cormat is None:
+            raise ValueError('need g or cormat')
+        self.g = g
+        if cormat is not None:
+            self.cormat = cormat
+        self.method = method
+        self.optimal_ordering = optimal_ordering
+        self.engine = engine
+        self._n_clusters = n_clusters
+        self.engine_options = engine_options
+        self._artefacts = {}
+
+    @classmethod
+    def of(cls, g=None, cormat=None, **options):
+        '''Instance sharing the cached artefacts of this data and options.'''
+        key = data_key(*[x for x in (g, cormat) if x is not None],
+                       cormat_given=cormat is not None,
+                       **options)
+        if key in cls._cache:
+            cls._cache.move_to_end(key)
+        else:
+            cls._cache[key] = {}
+            if len(cls._cache) > cls.cache_size:
+                cls._cache.popitem(last=False)
+        analysis = cls(g, cormat, **options)
+        analysis._artefacts = cls._cache[key]
+        return analysis
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    @_shared
+    @profiling.profiled('corrcoef')
+    def cormat(self):
+        return np.corrcoef(self.g)
+
+    @_shared
+    @profiling.profiled('linkage')
+    def linkage(self):
+        return linkage(self.cormat,
+                       method=self.method,
+                       optimal_ordering=self.optimal_ordering)
+
+    @_shared
+    @profiling.profiled('cophenet')
+    def cophenet(self):
+        '''Cophenetic correlation coefficient of the linkage.'''
+        c, coph_dists = cophenet(self.linkage, pdist(self.cormat))
+        return c
+
+    @_shared
+    def n_clusters(self):
+        if self._n_clusters is not None:
+            return self._n_clusters
+        if self.engine == 'linkage':
+            return dendrogram_colour_count(self.linkage)
+        return np.unique(self.labels).shape[0]
+
+    @_shared
+    @profiling.profiled('cluster_labels')
+    def labels(self):
+        '''cluster_labels, 1 .. n_clusters.'''
+        if self.engine == 'linkage':
+            return fcluster(self.linkage, self.n_clusters, criterion='maxclust')
+        return cluster_traces(self.g,
+                              self._n_clusters,
+                              method=self.engine,
+                              **self.engine_options)
+
+    @cached_property
+    def cluster_ids(self):
+        return np.unique(self.labels)
+
+    @cached_property
+    def cluster_means(self):
+        '''Mean row of cormat per cluster label 1 .. n_clusters (XX).'''
+        XX = np.zeros((self.n_clusters, self.cormat.shape[1]))
+        for i in range(self.n_clusters):
+            XX[i, :] = self.cormat[self.labels == i + 1, :].mean(axis=0)
+        return XX
+
+    @cached_property
+    def sort_inds(self):
+        return np.argsort(self.labels)
+
+    @cached_property
+    def cormat_sorted(self):
+        '''cormat with rows and columns in cluster order.'''
+        return self.cormat[np.ix_(self.sort_inds, self.sort_inds)]
+
+    def sorted(self, x):
+        '''Per-neuron array x (neurons on axis 0) in cluster order.'''
+        return x[self.sort_inds]
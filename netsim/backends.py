@@ -0,0 +1,276 @@
+import numpy as np
+import scipy.sparse as sp
+
+from .engine import step
+from .synapses import integrate_block_exact_numpy
+
+# NOTE: numba is optional; without it everything runs on the numpy path
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+
+def integrate_block_numpy(state, w, I_block, dt, iz, psp_amp, psp_decay,
+                          syn_sign, v_out, u_out, g_out, spike_out):
+    '''
+    Advance state through I_block.shape[1] steps with engine.step.
+
+    The *_out arrays have one more column than I_block: column 0 holds the
+    sample the block starts from and column i + 1 receives step i. Column i
+    is overwritten with vpeak when a cell fires on step i, exactly like
+    v[j, i - 1] = vpeak in the original loops.
+    '''
+    for i in range(I_block.shape[1]):
+
+        fired = step(state, I_block[:, i], w, iz, dt[i], psp_amp, psp_decay,
+                     syn_sign)
+
+        v_out[fired, i] = iz['vpeak'][fired]
+        v_out[:, i + 1] = state['v']
+        u_out[:, i + 1] = state['u']
+        g_out[:, i + 1] = state['g']
+        spike_out[:, i + 1] = state['spike']
+
+
+def _prepare_numpy(w):
+    return w
+
+
+if HAVE_NUMBA:
+
+    @numba.njit(cache=True)
+    def _euler_cells(i, v, u, g, spike, I_net, I_block, dt, C, vr, vt, vpeak,
+                     a, b, c, d, k, psp_amp, psp_decay, syn_sign, v_out,
+                     u_out, g_out, spike_out):
+
+        for jj in range(v.shape[0]):
+
+            dvdt = (k[jj] * (v[jj] - vr[jj]) * (v[jj] - vt[jj]) - u[jj] +
+                    syn_sign * I_net[jj] + I_block[jj, i]) / C[jj]
+            dudt = a[jj] * (b[jj] * (v[jj] - vr[jj]) - u[jj])
+            dgdt = (-g[jj] + psp_amp * spike[jj]) / psp_decay
+
+            v[jj] = v[jj] + dvdt * dt
+            u[jj] = u[jj] + dudt * dt
+            g[jj] = g[jj] + dgdt * dt
+            spike[jj] = 0.0
+
+            if v[jj] >= vpeak[jj]:
+                v_out[jj, i] = vpeak[jj]
+                v[jj] = c[jj]
+                u[jj] = u[jj] + d[jj]
+                spike[jj] = 1.0
+
+            v_out[jj, i + 1] = v[jj]
+            u_out[jj, i + 1] = u[jj]
+            g_out[jj, i + 1] = g[jj]
+            spike_out[jj, i + 1] = spike[jj]
+
+    @numba.njit(cache=True)
+    def _integrate_block_jit(v, u, g, spike, wT, I_block, dt, C, vr, vt,
+                             vpeak, a, b, c, d, k, psp_amp, psp_decay,
+                             syn_sign, v_out, u_out, g_out, spike_out):
+
+        for i in range(I_block.shape[1]):
+
+            # presynaptic drive is computed from g before any cell moves
+            I_net = np.dot(wT, g)
+
+            _euler_cells(i, v, u, g, spike, I_net, I_block, dt[i], C, vr, vt,
+                         vpeak, a, b, c, d, k, psp_amp, psp_decay, syn_sign,
+                         v_out, u_out, g_out, spike_out)
+
+    @numba.njit(cache=True)
+    def _integrate_block_csr_jit(v, u, g, spike, indptr, indices, data,
+                                 I_block, dt, C, vr, vt, vpeak, a, b, c, d, k,
+                                 psp_amp, psp_decay, syn_sign, v_out, u_out,
+                                 g_out, spike_out):
+
+        n_cells = v.shape[0]
+        I_net = np.empty(n_cells)
+
+        for i in range(I_block.shape[1]):
+
+            # row jj of w.T in CSR lists the presynaptic cells of jj
+            for jj in range(n_cells):
+                s = 0.0
+                for p in range(indptr[jj], indptr[jj + 1]):
+                    s += data[p] * g[indices[p]]
+                I_net[jj] = s
+
+            _euler_cells(i, v, u, g, spike, I_net, I_block, dt[i], C, vr, vt,
+                         vpeak, a, b, c, d, k, psp_amp, psp_decay, syn_sign,
+                         v_out, u_out, g_out, spike_out)
+
+
+def _prepare_numba(w):
+    '''w.T laid out for the kernels: C-contiguous dense or CSR.'''
+    if sp.issparse(w):
+        return w.T.tocsr()
+    return np.ascontiguousarray(w.T, dtype=float)
+
+
+def integrate_block_numba(state, wT, I_block, dt, iz, psp_amp, psp_decay,
+                          syn_sign, v_out, u_out, g_out, spike_out):
+    '''
+    Compiled equivalent of integrate_block_numpy; wT comes from
+    _prepare_numba.
+    '''
+    args = (np.ascontiguousarray(I_block, dtype=float),
+            np.ascontiguousarray(dt, dtype=float), iz['C'], iz['vr'],
+            iz['vt'], iz['vpeak'], iz['a'], iz['b'], iz['c'], iz['d'],
+            iz['k'], float(psp_amp), float(psp_decay), float(syn_sign), v_out,
+            u_out, g_out, spike_out)
+    if sp.issparse(wT):
+        _integrate_block_csr_jit(state['v'], state['u'], state['g'],
+                                 state['spike'], wT.indptr, wT.indices,
+                                 wT.data, *args)
+    else:
+        _integrate_block_jit(state['v'], state['u'], state['g'],
+                             state['spike'], wT, *args)
+
+
+if HAVE_NUMBA:
+
+    @numba.njit(cache=True)
+    def _exact_integrate_cells(i, dt, v, u, I_syn, I_block, C, vr, vt, a, b,
+                               k, psp_decay, syn_sign):
+
+        decay = np.exp(-dt / psp_decay)
+        for jj in range(v.shape[0]):
+            dvdt = (k[jj] * (v[jj] - vr[jj]) * (v[jj] - vt[jj]) - u[jj] +
+                    syn_sign * I_syn[jj] + I_block[jj, i]) / C[jj]
+            dudt = a[jj] * (b[jj] * (v[jj] - vr[jj]) - u[jj])
+            v[jj] = v[jj] + dvdt * dt
+            u[jj] = u[jj] + dudt * dt
+            I_syn[jj] = I_syn[jj] * decay
+
+    @numba.njit(cache=True)
+    def _exact_fire_cells(i, t_now, v, u, spike, g_last, t_last, vpeak, c, d,
+                          psp_decay, v_out, u_out, g_out, spike_out):
+
+        for jj in range(v.shape[0]):
+            spike[jj] = 0.0
+            if v[jj] >= vpeak[jj]:
+                v_out[jj, i] = vpeak[jj]
+                v[jj] = c[jj]
+                u[jj] = u[jj] + d[jj]
+                spike[jj] = 1.0
+
+            v_out[jj, i + 1] = v[jj]
+            u_out[jj, i + 1] = u[jj]
+            g_out[jj, i + 1] = g_last[jj] * np.exp(
+                -(t_now - t_last[jj]) / psp_decay)
+            spike_out[jj, i + 1] = spike[jj]
+
+    @numba.njit(cache=True)
+    def _integrate_block_exact_jit(v, u, spike, g_last, t_last, I_syn, w,
+                                   I_block, t_block, C, vr, vt, vpeak, a, b,
+                                   c, d, k, psp_jump, psp_decay, syn_sign,
+                                   v_out, u_out, g_out, spike_out):
+
+        n_cells = v.shape[0]
+
+        for i in range(I_block.shape[1]):
+
+            t_now = t_block[i + 1]
+            _exact_integrate_cells(i, t_now - t_block[i], v, u, I_syn, I_block,
+                                   C, vr, vt, a, b, k, psp_decay, syn_sign)
+
+            # spikes from the previous step arrive now
+            for kk in range(n_cells):
+                if spike[kk] != 0.0:
+                    for jj in range(n_cells):
+                        I_syn[jj] += psp_jump * w[kk, jj]
+                    g_last[kk] = g_last[kk] * np.exp(
+                        -(t_now - t_last[kk]) / psp_decay) + psp_jump
+                    t_last[kk] = t_now
+
+            _exact_fire_cells(i, t_now, v, u, spike, g_last, t_last, vpeak, c,
+                              d, psp_decay, v_out, u_out, g_out, spike_out)
+
+    @numba.njit(cache=True)
+    def _integrate_block_exact_csr_jit(v, u, spike, g_last, t_last, I_syn,
+                                       indptr, indices, data, I_block,
+                                       t_block, C, vr, vt, vpeak, a, b, c, d,
+                                       k, psp_jump, psp_decay, syn_sign,
+                                       v_out, u_out, g_out, spike_out):
+
+        n_cells = v.shape[0]
+
+        for i in range(I_block.shape[1]):
+
+            t_now = t_block[i + 1]
+            _exact_integrate_cells(i, t_now - t_block[i], v, u, I_syn, I_block,
+                                   C, vr, vt, a, b, k, psp_decay, syn_sign)
+
+            # row kk of w in CSR lists the targets of presynaptic cell kk
+            for kk in range(n_cells):
+                if spike[kk] != 0.0:
+                    for p in range(indptr[kk], indptr[kk + 1]):
+                        I_syn[indices[p]] += psp_jump * data[p]
+                    g_last[kk] = g_last[kk] * np.exp(
+                        -(t_now - t_last[kk]) / psp_decay) + psp_jump
+                    t_last[kk] = t_now
+
+            _exact_fire_cells(i, t_now, v, u, spike, g_last, t_last, vpeak, c,
+                              d, psp_decay, v_out, u_out, g_out, spike_out)
+
+
+def _prepare_exact_numba(w):
+    '''w itself (rows are presynaptic), C-contiguous dense or CSR.'''
+    if sp.issparse(w):
+        return w.tocsr()
+    return np.ascontiguousarray(w, dtype=float)
+
+
+def integrate_block_exact_numba(state, w, I_block, t_block, iz, psp_jump,
+                                psp_decay, syn_sign, v_out, u_out, g_out,
+                                spike_out):
+    '''
+    Compiled equivalent of synapses.integrate_block_exact_numpy; w comes
+    from _prepare_exact_numba.
+    '''
+    cells = (state['v'], state['u'], state['spike'], state['g_last'],
+             state['t_last'], state['I_syn'])
+    args = (np.ascontiguousarray(I_block, dtype=float),
+            np.ascontiguousarray(t_block, dtype=float), iz['C'], iz['vr'],
+            iz['vt'], iz['vpeak'], iz['a'], iz['b'], iz['c'], iz['d'],
+            iz['k'], float(psp_jump), float(psp_decay), float(syn_sign),
+            v_out, u_out, g_out, spike_out)
+    if sp.issparse(w):
+        _integrate_block_exact_csr_jit(*cells, w.indptr, w.indices, w.data,
+                                       *args)
+    else:
+        _integrate_block_exact_jit(*cells, w, *args)
+    state['g'] = g_out[:, -1].copy()
+
+
+# (weight preparation, block integrator) per backend and synapse mode
+BACKENDS = {
+    ('numpy', 'euler'): (_prepare_numpy, integrate_block_numpy),
+    ('numpy', 'exact'): (_prepare_numpy, integrate_block_exact_numpy),
+}
+if HAVE_NUMBA:
+    BACKENDS['numba', 'euler'] = (_prepare_numba, integrate_block_numba)
+    BACKENDS['numba', 'exact'] = (_prepare_exact_numba,
+                                  integrate_block_exact_numba)
+
+
+def get_backend(name='auto', synapses='euler'):
+    '''
+    Return (prepare, integrate) for name ('auto', 'numba' or 'numpy') and
+    synapse mode ('euler' or 'exact'). prepare(w) converts the weights once
+    per run into the layout integrate expects.
+
+    'auto' picks numba when it is importable and falls back to numpy.
+    '''
+    if name == 'auto':
+        name = 'numba' if HAVE_NUMBA else 'numpy'
+    if (name, synapses) not in BACKENDS:
+        raise ValueError('unknown or unavailable backend: {} ({} synapses)'.format(
+            name, synapses))
+    return BACKENDS[name, synapses]
@@ -0,0 +1,338 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from . import connectivity
+from .analysis import ClusterAnalysis
+from .backends import HAVE_NUMBA
+from .cache import code_version
+from .engine import IZ_SPN, IZ_TAN, make_iz_params
+from .experiment import default_learning_params, run_reward_learning
+from .inputs import Constant, top_hat
+from .network import simulate_network
+from .results import SimulationResults
+from .sweep import grid
+
+
+def time_grid(T, tau):
+    '''time_params as built at the top of every script.'''
+    t = np.arange(0, T, tau)
+    return {'tau': tau, 'T': T, 't': t, 'n': t.shape[0]}
+
+
+class StageTimer:
+    '''Wall time per named stage: with timer('simulate'): ...'''
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def __call__(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = (self.seconds.get(name, 0.0) +
+                                  time.perf_counter() - t0)
+
+
+def _scratch_network(timer, rng, n_cells=10, p=0.2, T=5000, tau=0.1,
+                     ksyn=2e3, ibif=340, backend='auto'):
+    time_params = time_grid(T, tau)
+    I = Constant(rng.uniform(ibif, ibif + 1, (n_cells, 1)))
+    with timer('weights'):
+        w = connectivity.random_weights(n_cells, p, ksyn,
+                                        seed=int(rng.integers(2**63)))
+    with timer('simulate'):
+        simulate_network(n_cells, w, I, time_params,
+                         make_iz_params(n_cells, IZ_SPN), backend=backend)
+    return n_cells, time_params['n']
+
+
+def scratch_weak(timer, rng, p=0.2, **size):
+    '''scratch.py, weakly interconnected (p = 0.2).'''
+    return _scratch_network(timer, rng, p=p, **size)
+
+
+def scratch_strong(timer, rng, p=0.95, **size):
+    '''scratch.py, strongly interconnected (p = 0.95).'''
+    return _scratch_network(timer, rng, p=p, **size)
+
+
+def learning(timer, rng, n_simulations=25, n_trials=5, T=3000, tau=0.1):
+    '''
+    tmp_hw4_3.py trial loop with n_trials trials per phase (acquisition,
+    extinction, reacquisition).
+    '''
+    time_params = time_grid(T, tau)
+    params = default_learning_params()
+    params['n_trials_acquisition'] = n_trials
+    params['n_trials_extinction'] = n_trials
+    params['n_trials_reacquisition'] = n_trials
+    with timer('trials'):
+        run_reward_learning(n_simulations, time_params, params, rng)
+    n_cells = params['w'].shape[0]
+    # trial 0 is the initial state and each trial integrates n - 1 steps
+    return n_simulations * n_cells, (3 * n_trials - 1) * (time_params['n'] - 1)
+
+
+def tan_cell(timer, rng, n_cells=1, T=1000, tau=0.1):
+    '''
+    The TAN of tmp_final_project.py, started from v = -70, u = -15, with a
+    baseline drive of 950 plus a pulse of 1000 over the middle third of the
+    run. The script's slow rebound current r (the 2.7 * r term in dudt) has
+    no counterpart in the engine and is left out.
+    '''
+    time_params = time_grid(T, tau)
+    n = time_params['n']
+    I = Constant(950) + top_hat(1000, n // 3, 2 * n // 3)
+    with timer('simulate'):
+        simulate_network(n_cells, np.zeros((n_cells, n_cells)), I,
+                         time_params, make_iz_params(n_cells, IZ_TAN),
+                         psp_amp=1e3, v0=-70, u0=-15)
+    return n_cells, n
+
+
+def clustering(timer, rng, n_cells=10, p=0.2, T=5000, tau=0.1, ksyn=2e3,
+               ibif=340):
+    '''
+    The analysis in plot_results on a scratch.py network: correlation,
+    linkage, cophenet, cluster labels and the per-cluster DataFrame. The
+    simulation itself is not timed, and cells that stayed silent (nan rows
+    in corrcoef) are left out.
+    '''
+    time_params = time_grid(T, tau)
+    I = Constant(rng.uniform(ibif, ibif + 1, (n_cells, 1)))
+    w = connectivity.random_weights(n_cells, p, ksyn,
+                                    seed=int(rng.integers(2**63)))
+    t, n, v, g, spike = simulate_network(n_cells, w, I, time_params)
+    active = g.std(1) > 0
+    v, g = v[active], g[active]
+
+    analysis = ClusterAnalysis(g)
+    with timer('corrcoef'):
+        analysis.cormat
+    with timer('linkage'):
+        analysis.linkage
+    with timer('cophenet'):
+        analysis.cophenet
+    with timer('labels'):
+        analysis.labels
+        analysis.sort_inds
+    with timer('frame'):
+        SimulationResults(t, analysis.labels, v=v,
+                          g=g).cluster_frame('g', every=100)
+    return g.shape[0], n
+
+
+WORKLOADS = {
+    'scratch_weak': scratch_weak,
+    'scratch_strong': scratch_strong,
+    'learning': learning,
+    'tan_cell': tan_cell,
+    'clustering': clustering,
+}
+
+# NOTE: stages that only build inputs; not counted towards throughput
+SETUP_STAGES = ('weights', )
+
+# NOTE: (workload, list of size dicts); grid() scales each axis
+SUITES = {
+    'quick': [
+        ('scratch_weak', grid(n_cells=[10, 100], T=[1000])),
+        ('scratch_strong', grid(n_cells=[10, 100], T=[1000])),
+        ('learning', grid(n_simulations=[25], n_trials=[2], T=[1000])),
+        ('tan_cell', grid(T=[1000])),
+        ('clustering', grid(n_cells=[10, 100], T=[1000])),
+    ],
+    'full': [
+        ('scratch_weak', grid(n_cells=[10, 100, 1000], T=[5000],
+                              tau=[0.1, 0.05])),
+        ('scratch_strong', grid(n_cells=[10, 100, 1000], T=[5000],
+                                tau=[0.1, 0.05])),
+        ('scratch_weak', grid(n_cells=[1000], p=[0.01, 0.05], T=[5000])),
+        ('learning', grid(n_simulations=[1, 25, 100], n_trials=[5],
+                          T=[3000])),
+        ('tan_cell', grid(n_cells=[1, 1000], T=[1000], tau=[0.1, 0.01])),
+        ('clustering', grid(n_cells=[10, 100, 1000], T=[5000])),
+    ],
+}
+
+
+def run_case(workload, size=None, repeat=3, memory=True, seed=0,
+             warmup=True):
+    '''
+    Time one workload at one size. Every repeat draws from the same seed,
+    so each run does the same work; with warmup, one untimed run first
+    takes the numba compilation and cache loading out of the timings.
+    Returns a flat record: seconds and throughput in steps and
+    neuron-steps per second of the fastest run, all excluding
+    SETUP_STAGES, its per-stage times (setup included) and the peak traced
+    memory in MB (nan without memory).
+    '''
+    func = WORKLOADS[workload]
+    size = {} if size is None else dict(size)
+
+    if warmup:
+        func(StageTimer(), np.random.default_rng(seed), **size)
+
+    best = None
+    for _ in range(repeat):
+        timer = StageTimer()
+        n_cells, n_steps = func(timer, np.random.default_rng(seed), **size)
+        total = sum(s for name, s in timer.seconds.items()
+                    if name not in SETUP_STAGES)
+        if best is None or total < best[0]:
+            best = (total, timer.seconds)
+    seconds, stages = best
+
+    peak_mb = np.nan
+    if memory:
+        tracemalloc.start()
+        try:
+            func(StageTimer(), np.random.default_rng(seed), **size)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'workload': workload,
+        'case': case_name(workload, size),
+        'size': size,
+        'n_cells': n_cells,
+        'n_steps': n_steps,
+        'seconds': seconds,
+        'steps_per_s': n_steps / seconds,
+        'neuron_steps_per_s': n_cells * n_steps / seconds,
+        'peak_mb': peak_mb,
+        'stages': stages,
+    }
+
+
+def case_name(workload, size):
+    return workload + json.dumps(size, sort_keys=True)
+
+
+def run_suite(suite='quick', repeat=3, memory=True, seed=0, verbose=False):
+    '''Every case of SUITES[suite] (or of a list of (workload, sizes)).'''
+    cases = SUITES[suite] if isinstance(suite, str) else suite
+    records = []
+    for workload, sizes in cases:
+        for size in sizes:
+            record = run_case(workload, size, repeat, memory, seed)
+            if verbose:
+                print('{:<60s} {:10.3f} s {:14.0f} neuron-steps/s'.format(
+                    record['case'], record['seconds'],
+                    record['neuron_steps_per_s']))
+            records.append(record)
+    return records
+
+
+def environment():
+    '''Where the numbers were measured.'''
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'numba': HAVE_NUMBA,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'platform': platform.platform(),
+        'code_version': code_version(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def _json_default(x):
+    if isinstance(x, np.generic):
+        return x.item()
+    raise TypeError(type(x))
+
+
+def save_results(path, records):
+    with open(path, 'w') as f:
+        json.dump({
+            'environment': environment(),
+            'records': records
+        },
+                  f,
+                  indent=1,
+                  default=_json_default)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['records']
+
+
+def compare(records, baseline, tolerance=0.2):
+    '''
+    Table of cases found in both runs, with speedup = baseline seconds /
+    seconds and a regression flag where the speedup is below 1 - tolerance.
+    '''
+    cols = ['case', 'seconds', 'neuron_steps_per_s', 'peak_mb']
+    new = pd.DataFrame(records)[cols]
+    old = pd.DataFrame(baseline)[cols]
+    table = new.merge(old, on='case', suffixes=('', '_baseline'))
+    table['speedup'] = table['seconds_baseline'] / table['seconds']
+    table['regression'] = table['speedup'] < 1 - tolerance
+    return table
+
+
+def main(argv=None):
+    '''
+    Run a suite, optionally save it and compare it against a baseline:
+
+        python -m netsim.bench --suite quick --out bench.json
+        python -m netsim.bench --suite quick --baseline bench.json
+
+    Each workload is a canonical run taken from one of the scripts, scaled
+    through its size keywords (n_cells, p, T, tau, ...). A case is timed
+    repeat times and the fastest run is kept; peak memory comes from one
+    more run under tracemalloc, so its overhead never touches the timings.
+    Returns 1 if any case is slower than the baseline by more than
+    tolerance.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='python -m netsim.bench',
+        description=main.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', default='quick', choices=sorted(SUITES))
+    parser.add_argument('--workload', action='append', choices=sorted(
+        WORKLOADS), help='only run these workloads')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    cases = [(workload, sizes) for workload, sizes in SUITES[args.suite]
+             if args.workload is None or workload in args.workload]
+    records = run_suite(cases, args.repeat, not args.no_memory, args.seed,
+                        verbose=True)
+    if args.out:
+        save_results(args.out, records)
+
+    if args.baseline:
+        table = compare(records, load_results(args.baseline), args.tolerance)
+        with pd.option_context('display.width', 200, 'display.max_columns',
+                               None, 'display.max_colwidth', 60):
+            print(table[['case', 'seconds', 'seconds_baseline', 'speedup',
+                         'regression']])
+        if table['regression'].any():
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
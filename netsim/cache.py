@@ -0,0 +1,239 @@
+import functools
+import glob
+import hashlib
+import os
+import pickle
+import sys
+import sysconfig
+import types
+
+import numpy as np
+import scipy.sparse as sp
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_code_version = None
+_LIBRARY_PATHS = tuple(
+    os.path.abspath(sysconfig.get_paths()[k])
+    for k in ('stdlib', 'platstdlib', 'purelib', 'platlib'))
+
+
+def code_version():
+    '''Hash of the netsim sources, so cached results expire with the code.'''
+    global _code_version
+    if _code_version is None:
+        h = hashlib.blake2b(digest_size=16)
+        for path in sorted(glob.glob(os.path.join(_PACKAGE_DIR, '*.py'))):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def _is_library(func):
+    '''
+    True for netsim's own functions (versioned by code_version) and those of
+    installed packages and the standard library, which are hashed by name.
+    '''
+    module = getattr(func, '__module__', None) or ''
+    if module == __package__ or module.startswith(__package__ + '.'):
+        return True
+    path = getattr(sys.modules.get(module), '__file__', None)
+    if path is None:
+        return False
+    path = os.path.abspath(path)
+    return any(path.startswith(p) for p in _LIBRARY_PATHS)
+
+
+def _update_code(h, code, seen):
+    h.update(code.co_code)
+    _update(h, code.co_names, seen)
+    for c in code.co_consts:
+        # nested functions and comprehensions; their repr holds an address
+        if isinstance(c, types.CodeType):
+            _update_code(h, c, seen)
+        else:
+            _update(h, repr(c), seen)
+
+
+def _update_function(h, func, seen):
+    h.update(b'function')
+    h.update(func.__qualname__.encode())
+    code = func.__code__
+    _update_code(h, code, seen)
+    # referenced globals and closure cells are part of what the function
+    # computes; modules stand for themselves by name
+    for name in code.co_names:
+        if name in func.__globals__:
+            _update(h, name, seen)
+            _update(h, func.__globals__[name], seen)
+    for cell in func.__closure__ or ():
+        _update(h, cell.cell_contents, seen)
+    _update(h, func.__defaults__, seen)
+    _update(h, func.__kwdefaults__, seen)
+
+
+def _update(h, x, seen=None):
+    if seen is None:
+        seen = set()
+    if isinstance(x, np.ndarray):
+        h.update(b'ndarray')
+        h.update(str((x.shape, x.dtype.str)).encode())
+        h.update(np.ascontiguousarray(x).data)
+    elif sp.issparse(x):
+        x = x.tocsr()
+        h.update(b'sparse')
+        h.update(str(x.shape).encode())
+        for a in (x.data, x.indices, x.indptr):
+            _update(h, a, seen)
+    elif isinstance(x, dict):
+        h.update(b'dict')
+        for k in sorted(x, key=repr):
+            _update(h, k, seen)
+            _update(h, x[k], seen)
+    elif isinstance(x, (list, tuple)):
+        h.update(type(x).__name__.encode())
+        for v in x:
+            _update(h, v, seen)
+    elif x is None or isinstance(x, (bool, int, float, complex, str, bytes,
+                                     np.generic)):
+        h.update(repr(x).encode())
+    elif isinstance(x, types.ModuleType):
+        h.update(b'module')
+        h.update(x.__name__.encode())
+    elif isinstance(x, (type, np.ufunc, types.BuiltinFunctionType)):
+        # ufuncs, builtins and classes are defined by where they live
+        h.update(type(x).__name__.encode())
+        h.update('{}.{}'.format(getattr(x, '__module__', None),
+                                getattr(x, '__qualname__',
+                                        x.__name__)).encode())
+    elif isinstance(x, functools.partial):
+        h.update(b'partial')
+        _update(h, (x.func, x.args, x.keywords), seen)
+    elif isinstance(x, types.MethodType):
+        h.update(b'method')
+        _update(h, (x.__self__, x.__func__), seen)
+    elif callable(x) and hasattr(x, '__qualname__') and _is_library(x):
+        h.update(b'library callable')
+        h.update('{}.{}'.format(x.__module__, x.__qualname__).encode())
+    elif isinstance(x, types.FunctionType):
+        if id(x) in seen:
+            # recursion through globals: the name is enough
+            h.update(x.__qualname__.encode())
+            return
+        seen.add(id(x))
+        _update_function(h, x, seen)
+    elif hasattr(x, '__dict__') and any(not k.startswith('_') for k in vars(x)):
+        # objects such as input sources: their public state defines them
+        h.update('{}.{}'.format(type(x).__module__,
+                                type(x).__qualname__).encode())
+        _update(h, {
+            k: v
+            for k, v in vars(x).items() if not k.startswith('_')
+        }, seen)
+    else:
+        r = repr(x)
+        if ' at 0x' in r:
+            raise TypeError('cannot build a content key for {!r}'.format(x))
+        h.update(type(x).__qualname__.encode())
+        h.update(r.encode())
+
+
+def input_key(*args, **kwargs):
+    '''
+    Content hash of arbitrary stage inputs (arrays, dicts, sources...).
+
+    Functions of scripts are hashed by their bytecode, constants, default
+    arguments, closure cells and the current values of the globals they
+    name; functions of netsim, installed packages and the standard
+    library, ufuncs, builtins, classes and modules by their qualified
+    name (so input_key alone does not expire with library code; StageCache
+    adds code_version for netsim). Other
+    objects are hashed by their public attributes, or by repr if they have
+    none; objects whose repr is only an address raise TypeError.
+    '''
+    h = hashlib.blake2b(digest_size=20)
+    _update(h, args)
+    _update(h, kwargs)
+    return h.hexdigest()
+
+
+class StageCache:
+    '''
+    Content-addressed cache of pipeline stage outputs on disk.
+
+    run(func, *args, **kwargs) returns func(*args, **kwargs), computing it
+    only if no result is stored under the hash of the function's code, the
+    netsim code version and every argument (w, I, time_params, iz_params,
+    seeds...). Outputs are pickled, one file per key. Hits refresh the
+    file's access time; once the directory exceeds max_bytes the least
+    recently used entries are deleted.
+    '''
+
+    def __init__(self, path='.netsim_cache', max_bytes=2 * 1024**3,
+                 enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, func, *args, **kwargs):
+        return input_key(func.__qualname__, func, code_version(), args,
+                         kwargs)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def get(self, key):
+        path = self._file(key)
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        path = self._file(key)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    def run(self, func, *args, **kwargs):
+        if not self.enabled:
+            return func(*args, **kwargs)
+        key = self.key(func, *args, **kwargs)
+        if key in self:
+            return self.get(key)
+        value = func(*args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def entries(self):
+        '''(mtime, size, path) of every entry, least recently used first.'''
+        out = []
+        for path in glob.glob(os.path.join(self.path, '*.pkl')):
+            st = os.stat(path)
+            out.append((st.st_mtime, st.st_size, path))
+        return sorted(out)
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        '''Delete least recently used entries until under max_bytes.'''
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        self.evict(0)
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+import numpy as np
+
+
+def save_checkpoint(path, arrays, rng=None, meta=None, compress=False):
+    '''
+    Write arrays (a dict of ndarrays), the bit generator state of rng and a
+    JSON-serializable meta dict to one .npz file. The file is written
+    next to path and renamed over it, so a kill mid-write leaves the
+    previous checkpoint intact.
+    '''
+    out = dict(arrays)
+    out['__meta__'] = np.array(json.dumps(meta or {}))
+    if rng is not None:
+        out['__rng__'] = np.array(json.dumps(rng.bit_generator.state))
+
+    tmp = path + '.tmp.npz'
+    if compress:
+        np.savez_compressed(tmp, **out)
+    else:
+        np.savez(tmp, **out)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, rng=None, key=None):
+    '''
+    Read a checkpoint written by save_checkpoint. If rng is given its bit
+    generator is restored in place, so the random stream continues exactly
+    where it was saved. With key, a checkpoint whose meta['key'] differs
+    raises ValueError, before rng is touched. Returns (arrays, meta).
+    '''
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(str(z['__meta__']))
+        if key is not None and meta.get('key') != key:
+            raise ValueError(
+                'checkpoint {} is from a different experiment'.format(path))
+        arrays = {k: z[k] for k in z.files if not k.startswith('__')}
+        if rng is not None and '__rng__' in z.files:
+            rng.bit_generator.state = json.loads(str(z['__rng__']))
+    return arrays, meta
+
+
+class Checkpointer:
+    '''
+    Decide when a loop saves: every `every` iterations, and (if
+    min_seconds is set) no more often than once per min_seconds of wall
+    time, which bounds the checkpoint overhead of fast loops.
+    '''
+
+    def __init__(self, path, every=10, min_seconds=None, compress=False):
+        self.path = path
+        self.every = every
+        self.min_seconds = min_seconds
+        self.compress = compress
+        self._last = time.monotonic()
+
+    def exists(self):
+        return self.path is not None and os.path.exists(self.path)
+
+    def due(self, i):
+        if self.path is None or (i + 1) % self.every:
+            return False
+        if self.min_seconds is not None:
+            return time.monotonic() - self._last >= self.min_seconds
+        return True
+
+    def save(self, arrays, rng=None, meta=None):
+        save_checkpoint(self.path, arrays, rng, meta, self.compress)
+        self._last = time.monotonic()
+
+    def load(self, rng=None, key=None):
+        return load_checkpoint(self.path, rng, key)
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
@@ -0,0 +1,139 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import eigsh
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+
+def unit_rows(g, every=1):
+    '''
+    Centre each trace and scale it to unit norm, so that the dot product of
+    two rows is their Pearson correlation (np.corrcoef of g[:, ::every]).
+    Flat traces stay zero.
+    '''
+    X = np.array(g[:, ::every], dtype=float)
+    X -= X.mean(1, keepdims=True)
+    norm = np.linalg.norm(X, axis=1, keepdims=True)
+    norm[norm == 0] = 1
+    return X / norm
+
+
+def knn_graph(X, k=15, block_rows=1024):
+    '''
+    Sparse symmetric k-nearest-neighbour affinity graph of the rows of X
+    (from unit_rows), with affinity (1 + corr) / 2.
+
+    Similarities are computed block_rows rows at a time, so memory is
+    O(block_rows * N + N * k) rather than N x N.
+    '''
+    N = X.shape[0]
+    k = min(k, N - 1)
+    cols = np.zeros((N, k), dtype=np.int64)
+    vals = np.zeros((N, k))
+
+    for r0 in range(0, N, block_rows):
+        r1 = min(r0 + block_rows, N)
+        S = X[r0:r1] @ X.T
+        S[np.arange(r1 - r0), np.arange(r0, r1)] = -np.inf
+        idx = np.argpartition(-S, k - 1, axis=1)[:, :k]
+        cols[r0:r1] = idx
+        vals[r0:r1] = np.take_along_axis(S, idx, axis=1)
+
+    rows = np.repeat(np.arange(N), k)
+    A = sp.csr_matrix(((1 + vals.ravel()) / 2, (rows, cols.ravel())),
+                      shape=(N, N))
+    return A.maximum(A.T).tocsr()
+
+
+def spectral_embedding(A, n_components):
+    '''
+    Leading eigenvectors of the normalized affinity D^-1/2 A D^-1/2 and
+    their eigenvalues, largest first.
+    '''
+    d = np.asarray(A.sum(1)).ravel()
+    d[d == 0] = 1
+    d = 1 / np.sqrt(d)
+    L = sp.diags(d) @ A @ sp.diags(d)
+
+    N = A.shape[0]
+    if N <= 2 * n_components + 1 or N < 200:
+        lam, vec = np.linalg.eigh(L.toarray())
+        lam, vec = lam[-n_components:], vec[:, -n_components:]
+    else:
+        lam, vec = eigsh(L, k=n_components, which='LA')
+    order = np.argsort(lam)[::-1]
+    return lam[order], vec[:, order]
+
+
+def eigengap(lam, max_clusters):
+    '''Number of clusters at the largest gap in the leading eigenvalues.'''
+    gaps = -np.diff(lam[:max_clusters + 1])
+    return int(np.argmax(gaps[1:]) + 2) if gaps.shape[0] > 1 else 1
+
+
+def cluster_traces(g,
+                   n_clusters=None,
+                   method='spectral',
+                   k=15,
+                   every=1,
+                   max_clusters=10,
+                   seed=None,
+                   block_rows=1024):
+    '''
+    Cluster neurons by the correlation of their traces (rows of g) without
+    the dense N x N linkage.
+
+    method='spectral' clusters a spectral embedding of the k-nearest-
+    neighbour graph; with n_clusters None the count comes from the
+    eigengap (at least 2, at most max_clusters). method='minibatch' runs
+    MiniBatchKMeans on the unit-norm traces directly (Euclidean distance
+    there is sqrt(2 - 2 corr)) and needs n_clusters. every decimates the
+    traces first.
+
+    Returns cluster_labels in 1 .. n_clusters, as fcluster does.
+    '''
+    X = unit_rows(g, every)
+
+    if method == 'minibatch':
+        if n_clusters is None:
+            raise ValueError("method='minibatch' needs n_clusters")
+        km = MiniBatchKMeans(n_clusters=n_clusters,
+                             random_state=seed,
+                             n_init=3,
+                             batch_size=max(1024, 10 * n_clusters))
+        return km.fit_predict(X).astype(np.int32) + 1
+
+    if method != 'spectral':
+        raise ValueError('unknown clustering method: {}'.format(method))
+
+    A = knn_graph(X, k, block_rows)
+    n_components = min(max_clusters + 1, X.shape[0] - 1)
+    lam, vec = spectral_embedding(A, n_components)
+    if n_clusters is None:
+        n_clusters = max(eigengap(lam, max_clusters), 2)
+
+    E = vec[:, :n_clusters]
+    E /= np.maximum(np.linalg.norm(E, axis=1, keepdims=True), 1e-12)
+    km = KMeans(n_clusters=n_clusters, random_state=seed, n_init=10)
+    return km.fit_predict(E).astype(np.int32) + 1
+
+
+def membership_matrix(cluster_labels, ids=None):
+    '''
+    Normalized (k x N) cluster membership operator: row c has 1 / size at
+    the neurons labelled ids[c], so M @ x gives per-cluster means of any
+    per-neuron array x. ids (sorted) defaults to np.unique(cluster_labels);
+    neurons with labels outside ids are left out.
+    Returns ids, M (CSR).
+    '''
+    cluster_labels = np.asarray(cluster_labels)
+    if ids is None:
+        ids = np.unique(cluster_labels)
+    rows = np.searchsorted(ids, cluster_labels)
+    valid = rows < ids.shape[0]
+    valid[valid] = ids[rows[valid]] == cluster_labels[valid]
+    rows = rows[valid]
+    cols = np.nonzero(valid)[0]
+    size = np.bincount(rows, minlength=ids.shape[0])
+    M = sp.csr_matrix((1 / size[rows], (rows, cols)),
+                      shape=(ids.shape[0], cluster_labels.shape[0]))
+    return ids, M
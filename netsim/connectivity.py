@@ -0,0 +1,136 @@
+import numpy as np
+import scipy.sparse as sp
+
+from . import runner
+
+# NOTE: rows are drawn in chunks of SEED_ROWS, chunk c from SeedSequence(seed)
+# spawned at c, so the matrix does not depend on how rows are split into
+# blocks or over workers
+SEED_ROWS = 64
+
+
+def _seed_entropy(seed):
+    '''Entropy that makes SeedSequence(seed) reproducible even for None.'''
+    if isinstance(seed, np.random.SeedSequence):
+        return seed.entropy
+    if seed is None:
+        return np.random.SeedSequence().entropy
+    return seed
+
+
+def _bernoulli_positions(rng, size, p):
+    '''Sorted flat indices i < size with an independent P(hit) = p each.'''
+    if p <= 0 or size == 0:
+        return np.zeros(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(size, dtype=np.int64)
+
+    # NOTE: gaps between hits are geometric, so only the hits are drawn
+    pos = []
+    last = -1
+    while last < size:
+        remaining = size - last - 1
+        m = int(remaining * p + 5 * np.sqrt(remaining * p) + 16)
+        gaps = rng.geometric(p, m)
+        hits = last + np.cumsum(gaps)
+        pos.append(hits)
+        last = hits[-1]
+    pos = np.concatenate(pos)
+    return pos[pos < size]
+
+
+def _chunk_rng(entropy, c):
+    seq = np.random.SeedSequence(entropy, spawn_key=(c, ))
+    return np.random.default_rng(seq)
+
+
+def _weight_block_unit(unit, rng=None):
+    # rows come from the streams of their chunks, not from the unit's rng
+    row0, row1 = unit['rows']
+    n_cells = unit['n_cells']
+    p = unit['p']
+    lo, hi = unit['eps_range']
+
+    pos = []
+    eps = []
+    for c in range(row0 // SEED_ROWS, (row1 - 1) // SEED_ROWS + 1):
+        c0 = c * SEED_ROWS
+        c1 = min(c0 + SEED_ROWS, n_cells)
+        chunk_rng = _chunk_rng(unit['entropy'], c)
+        hits = _bernoulli_positions(chunk_rng, (c1 - c0) * n_cells, p)
+        draws = chunk_rng.uniform(lo, hi, hits.shape[0])
+        # a chunk the block only overlaps is drawn whole and cut to its rows
+        hits += (c0 - row0) * n_cells
+        keep = (hits >= 0) & (hits < (row1 - row0) * n_cells)
+        pos.append(hits[keep])
+        eps.append(draws[keep])
+    pos = np.concatenate(pos)
+    rows = pos // n_cells
+    cols = pos % n_cells
+    data = (unit['ksyn'] / p) * np.concatenate(eps)
+
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=row1 - row0))))
+    return sp.csr_matrix((data, cols, indptr), shape=(row1 - row0, n_cells))
+
+
+def _block_units(n_cells, p, ksyn, seed, block_rows, eps_range):
+    entropy = _seed_entropy(seed)
+    return [{
+        'rows': (row0, min(row0 + block_rows, n_cells)),
+        'n_cells': n_cells,
+        'p': p,
+        'ksyn': ksyn,
+        'entropy': entropy,
+        'eps_range': eps_range,
+    } for row0 in range(0, n_cells, block_rows)]
+
+
+def random_weights(n_cells,
+                   p,
+                   ksyn,
+                   seed=None,
+                   block_rows=1024,
+                   sparse='auto',
+                   eps_range=(0.8, 1.2),
+                   n_workers=1):
+    '''
+    Random connectivity with the same distribution as the scripts:
+
+        w = (uniform < p) * (ksyn / p) * uniform(0.8, 1.2)
+
+    generated in blocks of block_rows presynaptic rows without any dense
+    N x N temporaries. Every SEED_ROWS rows are drawn from their own stream
+    spawned from SeedSequence(seed), so blocks can be built in parallel
+    (n_workers), the result is the same for any block_rows and n_workers,
+    and any block can be rebuilt alone with weight_block. sparse='auto'
+    returns CSR when p <= 0.15 and a dense array otherwise; True/False
+    force the layout.
+    '''
+    units = _block_units(n_cells, p, ksyn, seed, block_rows, eps_range)
+    blocks = runner.run_units(_weight_block_unit, units, n_workers=n_workers)
+
+    if sparse == 'auto':
+        sparse = p <= 0.15
+    if sparse:
+        return sp.vstack(blocks, format='csr')
+
+    w = np.zeros((n_cells, n_cells))
+    for unit, block in zip(units, blocks):
+        row0, row1 = unit['rows']
+        w[row0:row1] = block.toarray()
+    return w
+
+
+def weight_block(b,
+                 n_cells,
+                 p,
+                 ksyn,
+                 seed,
+                 block_rows=1024,
+                 eps_range=(0.8, 1.2)):
+    '''
+    Rebuild block b (rows b * block_rows onward, as CSR) of the matrix
+    random_weights returns for the same arguments. seed must not be None.
+    '''
+    unit = _block_units(n_cells, p, ksyn, seed, block_rows, eps_range)[b]
+    return _weight_block_unit(unit)
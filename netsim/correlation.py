@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class OnlineCovariance:
+    '''
+    Running mean and co-moment matrix of N signals, fed in blocks of
+    samples.
+
+    Each block's own mean and centred co-moment are merged into the totals
+    with the pairwise update of Chan et al., which avoids the cancellation
+    of the naive sum / sum-of-squares formula on long, slowly varying
+    traces like g.
+    '''
+
+    def __init__(self, n_signals):
+        self.n = 0
+        self.mean = np.zeros(n_signals)
+        self.comoment = np.zeros((n_signals, n_signals))
+
+    def update(self, X):
+        '''Add the samples in the columns of X, shape (n_signals, m).'''
+        m = X.shape[1]
+        if m == 0:
+            return
+        mean_b = X.mean(1)
+        Xc = X - mean_b[:, None]
+        self._merge(m, mean_b, Xc @ Xc.T)
+
+    def merge(self, other):
+        '''Fold in the totals of another accumulator over the same signals.'''
+        if other.n:
+            self._merge(other.n, other.mean, other.comoment)
+
+    def _merge(self, n_b, mean_b, comoment_b):
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.comoment += comoment_b + np.outer(delta, delta) * (self.n * n_b / n)
+        self.mean += delta * (n_b / n)
+        self.n = n
+
+    def cov(self):
+        '''Sample covariance, as np.cov.'''
+        return self.comoment / (self.n - 1)
+
+    def corr(self):
+        '''Correlation matrix, as np.corrcoef (nan rows for flat signals).'''
+        sd = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = self.comoment / np.outer(sd, sd)
+        return np.clip(c, -1, 1, out=c)
+
+
+class CorrelationMonitor:
+    '''
+    Correlation matrix of one state variable (g by default), accumulated
+    during the run so the trace itself is never stored.
+
+    After a run monitor.corr equals np.corrcoef of the full trace of the
+    recorded neurons. With window set (in steps), monitor.windows also holds
+    one matrix per consecutive window, shape (n_windows, N, N), starting at
+    the times in monitor.window_t; a final partial window is dropped.
+    '''
+
+    def __init__(self, variable='g', neurons=None, window=None):
+        self.variable = variable
+        self.neurons = neurons
+        self.window = window
+        self.corr = None
+        self.windows = None
+        self.window_t = None
+
+    def start(self, n_cells, n, t):
+        if self.neurons is None:
+            self.neurons = np.arange(n_cells)
+        self.neurons = np.asarray(self.neurons)
+        m = self.neurons.shape[0]
+        self.t = t
+        self._total = OnlineCovariance(m)
+        self._current = OnlineCovariance(m)
+        self._windows = []
+
+    def record(self, i_first, block):
+        # column 0 was already seen as the last column of the previous block
+        first = 0 if i_first == 0 else 1
+        X = block[self.variable][self.neurons, first:]
+        self._total.update(X)
+
+        if self.window is None:
+            return
+        while X.shape[1]:
+            take = self.window - self._current.n
+            self._current.update(X[:, :take])
+            X = X[:, take:]
+            if self._current.n == self.window:
+                self._windows.append(self._current.corr())
+                self._current = OnlineCovariance(self.neurons.shape[0])
+
+    def finish(self):
+        self.corr = self._total.corr()
+        if self.window is not None:
+            m = self.neurons.shape[0]
+            self.windows = (np.stack(self._windows) if self._windows else
+                            np.zeros((0, m, m)))
+            self.window_t = self.t[::self.window][:len(self._windows)]
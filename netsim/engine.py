@@ -0,0 +1,130 @@
+import numpy as np
+import scipy.sparse as sp
+
+from . import profiling
+
+# NOTE: columns of iz_params (one row per neuron)
+IZ_COLUMNS = ('C', 'vr', 'vt', 'vpeak', 'a', 'b', 'c', 'd', 'k')
+
+# striatal projection neuron
+IZ_SPN = np.array([50, -80, -25, 40, 0.01, -20, -55, 150, 1])
+
+# regular spiking neuron
+IZ_RS = np.array([100, -60, -40, 35, 0.03, -2, -50, 100, 0.7])
+
+# tonically active neuron
+IZ_TAN = np.array([100, -75, -45, 35, 1, 5, -55, 150, 1.2])
+
+
+def make_iz_params(n_cells, row=IZ_SPN):
+    '''Stack one row of Izhikevich parameters for every cell.'''
+    return np.tile(np.asarray(row, dtype=float), (n_cells, 1))
+
+
+def unpack_iz_params(iz_params):
+    '''Split iz_params into one (n_cells,) column vector per parameter.'''
+    iz_params = np.atleast_2d(np.asarray(iz_params, dtype=float))
+    return {name: iz_params[:, i].copy() for i, name in enumerate(IZ_COLUMNS)}
+
+
+def remove_autapses(w):
+    '''Copy of w with the diagonal zeroed (the loops skip jj == kk).'''
+    if sp.issparse(w):
+        w = sp.csr_matrix(w, dtype=float)
+        w = w - sp.diags(w.diagonal())
+        w.eliminate_zeros()
+        return w.tocsr()
+    w = np.array(w, dtype=float)
+    np.fill_diagonal(w, 0)
+    return w
+
+
+def prepare_weights(w, sparse='auto', max_density=0.15, min_cells=500):
+    '''
+    Zero the diagonal of w and choose dense or CSR storage.
+
+    sparse=True/False forces the layout. With 'auto', scipy.sparse input
+    stays sparse and dense input is converted to CSR when the network has at
+    least min_cells cells and at most max_density of its entries are
+    non-zero; below that size the dense matvec is faster anyway.
+    '''
+    w = remove_autapses(w)
+    if sparse == 'auto':
+        sparse = sp.issparse(w) or (w.shape[0] >= min_cells and
+                                    np.count_nonzero(w) <= max_density * w.size)
+    if sparse and not sp.issparse(w):
+        return sp.csr_matrix(w)
+    if not sparse and sp.issparse(w):
+        return w.toarray()
+    return w
+
+
+def init_state(n_cells, iz_params, v0=None, u0=None):
+    '''Working buffers for one time step: v, u, g and spike, each (n_cells,).'''
+    iz = unpack_iz_params(iz_params)
+    v = iz['vr'].copy() if v0 is None else np.array(
+        np.broadcast_to(v0, (n_cells, )), dtype=float)
+    u = np.zeros(n_cells) if u0 is None else np.array(
+        np.broadcast_to(u0, (n_cells, )), dtype=float)
+    return {
+        'v': v,
+        'u': u,
+        'g': np.zeros(n_cells),
+        'spike': np.zeros(n_cells),
+    }
+
+
+def synaptic_input(w, g):
+    '''
+    Summed presynaptic drive onto every cell, i.e. sum_k w[k, j] * g[k].
+
+    g may carry a leading simulation axis, (n_sims, n_cells), with either a
+    shared w or one weight matrix per simulation, (n_sims, n_cells, n_cells).
+    '''
+    if g.ndim == 1:
+        return w.T @ g
+    if w.ndim == 2:
+        return g @ w
+    return np.einsum('sk,skj->sj', g, w)
+
+
+def step(state, I_ext, w, iz, dt, psp_amp, psp_decay, syn_sign=-1):
+    '''
+    Advance every neuron in state by one Euler step of size dt.
+
+    iz is the dict returned by unpack_iz_params. syn_sign is -1 for the
+    inhibitory SPN networks (scratch*.py subtract I_net) and +1 for the
+    trial loops in tmp_hw4*.py (which add I_net). State arrays may have a
+    leading simulation axis. Returns the boolean mask of cells that crossed
+    vpeak on this step.
+    '''
+    v = state['v']
+    u = state['u']
+    g = state['g']
+
+    prof = profiling.active
+    if prof is None:
+        I_net = synaptic_input(w, g)
+    else:
+        with prof.phase('synaptic_input'):
+            I_net = synaptic_input(w, g)
+
+    dvdt = (iz['k'] * (v - iz['vr']) * (v - iz['vt']) - u + syn_sign * I_net +
+            I_ext) / iz['C']
+    dudt = iz['a'] * (iz['b'] * (v - iz['vr']) - u)
+    dgdt = (-g + psp_amp * state['spike']) / psp_decay
+
+    v = v + dvdt * dt
+    u = u + dudt * dt
+    g = g + dgdt * dt
+
+    fired = v >= iz['vpeak']
+    v = np.where(fired, iz['c'], v)
+    u = u + fired * iz['d']
+
+    state['v'] = v
+    state['u'] = u
+    state['g'] = g
+    state['spike'] = fired.astype(float)
+
+    return fired
@@ -0,0 +1,297 @@
+import numpy as np
+
+from . import profiling
+from .cache import input_key
+from .checkpoint import Checkpointer
+from .engine import (IZ_RS, init_state, make_iz_params, remove_autapses, step,
+                     unpack_iz_params)
+from .stopping import check_stopping
+
+
+def default_learning_params():
+    '''
+    Parameters of the acquisition / extinction / reacquisition experiment in
+    tmp_hw4_3.py: ctx -> d1 and ctx -> d2 plastic, d2 -> d1 fixed.
+    '''
+    w_min = 0.1
+    w = np.zeros((3, 3))
+    w[0, 1] = w_min  # ctx -> d1
+    w[0, 2] = w_min  # ctx -> d2
+    w[2, 1] = -0.05  # d2 -> d1
+
+    w_in = np.zeros(3)
+    w_in[0] = 0.6
+
+    return {
+        'iz_params': make_iz_params(3, IZ_RS),
+        'w': w,
+        'w_in': w_in,
+        'input_amp': 3e2,
+        'psp_amp': 5e5,
+        'psp_decay': 400,
+        'n_trials_acquisition': 20,
+        'n_trials_extinction': 20,
+        'n_trials_reacquisition': 20,
+        'alpha_d1': 1e-15,
+        'beta_d1': 1e-15,
+        'alpha_d2': 1e-15,
+        'beta_d2': 1e-15,
+        'alpha_pr': 0.05,
+        'w_min': w_min,
+        'w_max': 1.0,
+        'p_reward': 1.0,
+        'p_guess': 0.2,
+    }
+
+
+def top_hat_input(w_in, n_steps, amp):
+    '''Input on for the middle third of the trial, scaled per cell by w_in.'''
+    I_in = np.zeros(n_steps)
+    I_in[n_steps // 3:2 * n_steps // 3] = amp
+    return np.outer(w_in, I_in)
+
+
+@profiling.profiled('simulate_trials')
+def simulate_trial_batch(w,
+                         I_ext,
+                         time_params,
+                         iz_params,
+                         psp_amp,
+                         psp_decay,
+                         syn_sign=1,
+                         trace_sim=None):
+    '''
+    Run one trial for a batch of independent simulations at once.
+
+    w is (n_sims, n_cells, n_cells) and the state carries the same leading
+    simulation axis, so every simulation advances in the same array step.
+    Only the per-trial sums of g used by the learning rule are kept,
+    (n_sims, n_cells); if trace_sim is given, full v and g traces of that
+    simulation are returned as well (otherwise None).
+    '''
+    t = time_params['t']
+    n = time_params['n']
+    n_sims, n_cells = w.shape[0], w.shape[1]
+
+    iz = unpack_iz_params(iz_params)
+    w = np.stack([remove_autapses(ws) for ws in w])
+
+    state = init_state(n_cells, iz_params)
+    for key in state:
+        state[key] = np.tile(state[key], (n_sims, 1))
+
+    g_sum = state['g'].copy()
+
+    v_trace = g_trace = None
+    if trace_sim is not None:
+        v_trace = np.zeros((n_cells, n))
+        g_trace = np.zeros((n_cells, n))
+        v_trace[:, 0] = state['v'][trace_sim]
+        profiling.count('alloc_bytes', v_trace.nbytes + g_trace.nbytes)
+
+    prof = profiling.active
+    n_spikes = 0
+    for i in range(1, n):
+
+        dt = t[i] - t[i - 1]
+
+        fired = step(state, I_ext[:, i - 1], w, iz, dt, psp_amp, psp_decay,
+                     syn_sign)
+        g_sum += state['g']
+        if prof is not None:
+            n_spikes += np.count_nonzero(fired)
+
+        if trace_sim is not None:
+            f = fired[trace_sim]
+            v_trace[f, i - 1] = iz['vpeak'][f]
+            v_trace[:, i] = state['v'][trace_sim]
+            g_trace[:, i] = state['g'][trace_sim]
+
+    if prof is not None:
+        prof.count('steps', n - 1)
+        prof.count('neuron_steps', (n - 1) * n_sims * n_cells)
+        prof.count('spikes', n_spikes)
+
+    return g_sum, v_trace, g_trace
+
+
+@profiling.profiled('learning_update')
+def _learning_update(saved, trl, g_sum, params, rng):
+    '''
+    Response, reward, reward prediction and weight update after trial trl,
+    written in place into the arrays of saved (see run_reward_learning).
+    g_sum holds the per-trial sums of g from simulate_trial_batch.
+    '''
+    w = saved['w']
+    response = saved['response']
+    obtained_reward = saved['obtained_reward']
+    predicted_reward = saved['predicted_reward']
+    delta = saved['delta']
+    n_simulations = w.shape[0]
+    n_acq = params['n_trials_acquisition']
+    n_ext = params['n_trials_extinction']
+    w_min = params['w_min']
+    w_max = params['w_max']
+
+    resp_act = np.clip(w[:, 0, 1] - w[:, 0, 2], 0, 1)
+    resp_prob = 1 / (1 + np.exp(-10 * (resp_act - 0.2)))
+    response[:, trl] = ((resp_prob > rng.random(n_simulations)) |
+                        (rng.random(n_simulations) < params['p_guess']))
+
+    # no reward during extinction
+    rewarded = response[:, trl] == 1
+    rewarded &= rng.random(n_simulations) < params['p_reward']
+    if n_acq <= trl < n_acq + n_ext:
+        rewarded[:] = False
+    obtained_reward[:, trl] = rewarded
+
+    predicted_reward[:, trl] = predicted_reward[:, trl - 1] + params[
+        'alpha_pr'] * delta[:, trl - 1]
+    delta[:, trl] = obtained_reward[:, trl] - predicted_reward[:, trl]
+
+    pre = g_sum[:, 0]
+    post_d1 = g_sum[:, 1]
+    post_d2 = g_sum[:, 2]
+    d = delta[:, trl]
+    pos = d > 0
+    w[:, 0, 1] += np.where(
+        pos, params['alpha_d1'] * pre * post_d1 * d * (w_max - w[:, 0, 1]),
+        params['beta_d1'] * pre * post_d1 * d * w_min)
+    w[:, 0, 2] -= np.where(
+        pos, params['beta_d2'] * pre * post_d2 * d * w_min,
+        params['alpha_d2'] * pre * post_d2 * d * (w_max - w[:, 0, 2]))
+
+    w[:, 0, 1] = np.clip(w[:, 0, 1], w_min, w_max)
+    w[:, 0, 2] = np.clip(w[:, 0, 2], w_min, w_max)
+
+    saved['w_rec_d1'][:, trl] = w[:, 0, 1]
+    saved['w_rec_d2'][:, trl] = w[:, 0, 2]
+
+
+@profiling.profiled('run_reward_learning')
+def run_reward_learning(n_simulations,
+                        time_params,
+                        params=None,
+                        rng=None,
+                        verbose=False,
+                        checkpoint=None,
+                        checkpoint_every=10,
+                        checkpoint_seconds=None,
+                        stopping=None):
+    '''
+    Batched version of the trial loop in tmp_hw4_3.py.
+
+    v/u/g, the weights w, predicted_reward, delta and response all carry a
+    leading simulation axis, and the response and reward draws are made per
+    simulation from rng (a numpy Generator). Returns a dict of
+    (n_simulations, n_trials) learning curves plus v and g traces of
+    simulation 0 on the final trial.
+
+    With checkpoint (an .npz path), weights, learning curves, the trial
+    index and the rng state are saved every checkpoint_every trials (and
+    at most once per checkpoint_seconds, if set). If the file exists when
+    the run starts, the run resumes from it and gives bit-identical
+    results to an uninterrupted run; a checkpoint of different arguments
+    (stopping included) raises ValueError and leaves rng alone. The file
+    is removed on completion.
+
+    stopping is a list of stopping.StoppingCriterion checked after every
+    trial; the first that fires ends the run early. The result then records
+    n_trials_run and stop_reason, learning curves are nan after the last
+    trial run and v and g are None.
+    '''
+    if params is None:
+        params = default_learning_params()
+    if rng is None:
+        rng = np.random.default_rng()
+
+    n_acq = params['n_trials_acquisition']
+    n_ext = params['n_trials_extinction']
+    n_trials = n_acq + n_ext + params['n_trials_reacquisition']
+
+    I_ext = top_hat_input(params['w_in'], time_params['n'],
+                          params['input_amp'])
+    w = np.tile(params['w'], (n_simulations, 1, 1))
+
+    obtained_reward = np.zeros((n_simulations, n_trials))
+    predicted_reward = np.zeros((n_simulations, n_trials))
+    delta = np.zeros((n_simulations, n_trials))
+    response = np.zeros((n_simulations, n_trials))
+    motor_act_rec = np.zeros((n_simulations, n_trials))
+    w_rec_d1 = np.zeros((n_simulations, n_trials))
+    w_rec_d2 = np.zeros((n_simulations, n_trials))
+    w_rec_d1[:, 0] = w[:, 0, 1]
+    w_rec_d2[:, 0] = w[:, 0, 2]
+
+    # everything a resumed run needs; updated in place by the trial loop
+    saved = {
+        'w': w,
+        'obtained_reward': obtained_reward,
+        'predicted_reward': predicted_reward,
+        'delta': delta,
+        'response': response,
+        'motor_act_rec': motor_act_rec,
+        'w_rec_d1': w_rec_d1,
+        'w_rec_d2': w_rec_d2,
+    }
+    ckpt = Checkpointer(checkpoint, checkpoint_every, checkpoint_seconds)
+    # the stopping criteria decide how far a run gets, so they are part of
+    # the experiment a checkpoint belongs to
+    key = input_key(n_simulations, time_params, params, stopping)
+    first_trial = 1
+    if ckpt.exists():
+        arrays, meta = ckpt.load(rng, key)
+        for name, x in saved.items():
+            x[...] = arrays[name]
+        first_trial = meta['trial'] + 1
+
+    v = g = None
+    last_trial = n_trials - 1
+    stop_reason = None
+    for trl in range(first_trial, n_trials):
+
+        if verbose:
+            print(trl)
+
+        g_sum, v, g = simulate_trial_batch(
+            w,
+            I_ext,
+            time_params,
+            params['iz_params'],
+            params['psp_amp'],
+            params['psp_decay'],
+            trace_sim=0 if trl == n_trials - 1 else None)
+
+        motor_act_rec[:, trl] = g_sum[:, 1]
+
+        _learning_update(saved, trl, g_sum, params, rng)
+
+        with profiling.phase('stopping'):
+            stop_reason = check_stopping(stopping, trl, saved, params)
+        if stop_reason is not None:
+            last_trial = trl
+            break
+
+        # the last trial is never saved: its v and g traces are not kept
+        if trl < n_trials - 1 and ckpt.due(trl):
+            with profiling.phase('checkpoint'):
+                ckpt.save(saved, rng, {'key': key, 'trial': trl})
+
+    ckpt.remove()
+    for name, x in saved.items():
+        if name != 'w':
+            x[:, last_trial + 1:] = np.nan
+
+    return {
+        'obtained_reward': obtained_reward,
+        'predicted_reward': predicted_reward,
+        'delta': delta,
+        'response': response,
+        'motor_act_rec': motor_act_rec,
+        'w_rec_d1': w_rec_d1,
+        'w_rec_d2': w_rec_d2,
+        'v': v,
+        'g': g,
+        'n_trials_run': last_trial + 1,
+        'stop_reason': stop_reason,
+    }
@@ -0,0 +1,548 @@
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import cophenet
+from scipy.spatial.distance import squareform
+
+from . import connectivity
+from .analysis import ClusterAnalysis
+from .checkpoint import load_checkpoint, save_checkpoint
+from .engine import IZ_SPN, make_iz_params
+from .experiment import default_learning_params, run_reward_learning
+from .network import simulate_network
+from .spikes import SpikeTrains
+
+
+def reference_network(n_cells, w, I, time_params, iz_params=None,
+                      psp_amp=1, psp_decay=100, syn_sign=-1):
+    '''
+    The jj/kk loop of the original scratch.py simulate_network, one neuron
+    and one presynaptic partner at a time, kept as the definition of the
+    dynamics (including v[jj, i - 1] = vpeak on a spike). iz_params may
+    differ per cell and I is (n_cells, n) or (n_cells, 1). Slow: meant for
+    small golden cases only.
+    '''
+    t = time_params['t']
+    n = time_params['n']
+    if iz_params is None:
+        iz_params = make_iz_params(n_cells)
+    w = np.asarray(w.toarray() if hasattr(w, 'toarray') else w, dtype=float)
+    I = np.broadcast_to(np.asarray(I, dtype=float), (n_cells, n))
+
+    v = np.zeros((n_cells, n))
+    u = np.zeros((n_cells, n))
+    g = np.zeros((n_cells, n))
+    spike = np.zeros((n_cells, n))
+    v[:, 0] = iz_params[:, 1]
+
+    for i in range(1, n):
+
+        dt = t[i] - t[i - 1]
+
+        for jj in range(n_cells):
+
+            C, vr, vt, vpeak, a, b, c, d, k = iz_params[jj]
+
+            I_net = 0.0
+            for kk in range(n_cells):
+                if jj != kk:
+                    I_net += w[kk, jj] * g[kk, i - 1]
+
+            dvdt = (k * (v[jj, i - 1] - vr) * (v[jj, i - 1] - vt) -
+                    u[jj, i - 1] + syn_sign * I_net + I[jj, i - 1]) / C
+            dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
+            dgdt = (-g[jj, i - 1] + psp_amp * spike[jj, i - 1]) / psp_decay
+
+            v[jj, i] = v[jj, i - 1] + dvdt * dt
+            u[jj, i] = u[jj, i - 1] + dudt * dt
+            g[jj, i] = g[jj, i - 1] + dgdt * dt
+
+            if v[jj, i] >= vpeak:
+                v[jj, i - 1] = vpeak
+                v[jj, i] = c
+                u[jj, i] = u[jj, i] + d
+                spike[jj, i] = 1
+
+    return t, n, v, g, spike
+
+
+def reference_learning(n_simulations, time_params, params, rng):
+    '''
+    The original tmp_hw4_3.py trial loop, one simulation and one neuron at
+    a time, drawing from rng in the order the script drew from
+    np.random. As in the script, u is not reset between trials. Returns
+    the learning curves under the keys of run_reward_learning.
+    '''
+    t = time_params['t']
+    n_steps = time_params['n']
+    iz_params = params['iz_params']
+    n_cells = iz_params.shape[0]
+    n_acq = params['n_trials_acquisition']
+    n_ext = params['n_trials_extinction']
+    n_trials = n_acq + n_ext + params['n_trials_reacquisition']
+    w_min = params['w_min']
+    w_max = params['w_max']
+    psp_amp = params['psp_amp']
+    psp_decay = params['psp_decay']
+
+    I_in = np.zeros(n_steps)
+    I_in[n_steps // 3:2 * n_steps // 3] = params['input_amp']
+    w_in = params['w_in']
+
+    obtained_reward = np.zeros((n_simulations, n_trials))
+    predicted_reward = np.zeros((n_simulations, n_trials))
+    delta = np.zeros((n_simulations, n_trials))
+    response = np.zeros((n_simulations, n_trials))
+    motor_act_rec = np.zeros((n_simulations, n_trials))
+    w_rec_d1 = np.zeros((n_simulations, n_trials))
+    w_rec_d2 = np.zeros((n_simulations, n_trials))
+
+    v = np.zeros((n_cells, n_steps))
+    u = np.zeros((n_cells, n_steps))
+    g = np.zeros((n_cells, n_steps))
+    spike = np.zeros((n_cells, n_steps))
+
+    for sim in range(n_simulations):
+
+        w = params['w'].copy()
+        w_rec_d1[sim, 0] = w[0, 1]
+        w_rec_d2[sim, 0] = w[0, 2]
+
+        for trl in range(1, n_trials):
+
+            v[:] = 0
+            g[:] = 0
+            spike[:] = 0
+            v[:, 0] = iz_params[:, 1]
+
+            for i in range(1, n_steps):
+
+                dt = t[i] - t[i - 1]
+
+                for jj in range(n_cells):
+
+                    C, vr, vt, vpeak, a, b, c, d, k = iz_params[jj]
+
+                    I_net = 0.0
+                    for kk in range(n_cells):
+                        if jj != kk:
+                            I_net += w[kk, jj] * g[kk, i - 1]
+                    I_net += w_in[jj] * I_in[i - 1]
+
+                    dvdt = (k * (v[jj, i - 1] - vr) * (v[jj, i - 1] - vt) -
+                            u[jj, i - 1] + I_net) / C
+                    dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
+                    dgdt = (-g[jj, i - 1] +
+                            psp_amp * spike[jj, i - 1]) / psp_decay
+
+                    v[jj, i] = v[jj, i - 1] + dvdt * dt
+                    u[jj, i] = u[jj, i - 1] + dudt * dt
+                    g[jj, i] = g[jj, i - 1] + dgdt * dt
+
+                    if v[jj, i] >= vpeak:
+                        v[jj, i - 1] = vpeak
+                        v[jj, i] = c
+                        u[jj, i] = u[jj, i] + d
+                        spike[jj, i] = 1
+
+            motor_act_rec[sim, trl] = g[1, :].sum()
+
+            resp_act = np.clip(w[0, 1] - w[0, 2], 0, 1)
+            resp_prob = 1 / (1 + np.exp(-10 * (resp_act - 0.2)))
+            if resp_prob > rng.random():
+                response[sim, trl] = 1
+            elif rng.random() < params['p_guess']:
+                response[sim, trl] = 1
+
+            extinction = n_acq <= trl < n_acq + n_ext
+            if not extinction and response[sim, trl] == 1:
+                if rng.random() < params['p_reward']:
+                    obtained_reward[sim, trl] = 1
+
+            predicted_reward[sim, trl] = (
+                predicted_reward[sim, trl - 1] +
+                params['alpha_pr'] * delta[sim, trl - 1])
+            delta[sim, trl] = (obtained_reward[sim, trl] -
+                               predicted_reward[sim, trl])
+
+            pre = g[0, :].sum()
+            post_d1 = g[1, :].sum()
+            post_d2 = g[2, :].sum()
+            if delta[sim, trl] > 0:
+                w[0, 1] += (params['alpha_d1'] * pre * post_d1 *
+                            delta[sim, trl] * (w_max - w[0, 1]))
+                w[0, 2] -= (params['beta_d2'] * pre * post_d2 *
+                            delta[sim, trl] * w_min)
+            else:
+                w[0, 1] += (params['beta_d1'] * pre * post_d1 *
+                            delta[sim, trl] * w_min)
+                w[0, 2] -= (params['alpha_d2'] * pre * post_d2 *
+                            delta[sim, trl] * (w_max - w[0, 2]))
+
+            w[0, 1] = np.clip(w[0, 1], w_min, w_max)
+            w[0, 2] = np.clip(w[0, 2], w_min, w_max)
+
+            w_rec_d1[sim, trl] = w[0, 1]
+            w_rec_d2[sim, trl] = w[0, 2]
+
+    return {
+        'obtained_reward': obtained_reward,
+        'predicted_reward': predicted_reward,
+        'delta': delta,
+        'response': response,
+        'motor_act_rec': motor_act_rec,
+        'w_rec_d1': w_rec_d1,
+        'w_rec_d2': w_rec_d2,
+    }
+
+
+# NOTE: small enough for the reference loops to run in seconds, long and
+# strongly driven enough for a few hundred spikes per network, with the
+# inhibition visibly thinning them out (scratch_coupled loses a quarter).
+# The learning case answers and rewards every trial, so the outcome draws
+# cannot make the candidate and the reference take different paths.
+GOLDEN_CASES = {
+    'scratch_weak': {
+        'kind': 'network',
+        'n_cells': 10,
+        'p': 0.2,
+        'ksyn': 2e3,
+        'ibif': 600,
+        'T': 2000,
+        'tau': 0.1,
+    },
+    'scratch_strong': {
+        'kind': 'network',
+        'n_cells': 10,
+        'p': 0.95,
+        'ksyn': 2e3,
+        'ibif': 600,
+        'T': 2000,
+        'tau': 0.1,
+    },
+    'scratch_coupled': {
+        'kind': 'network',
+        'n_cells': 10,
+        'p': 0.5,
+        'ksyn': 5e3,
+        'ibif': 500,
+        'T': 2000,
+        'tau': 0.1,
+    },
+    'learning': {
+        'kind': 'learning',
+        'n_simulations': 2,
+        'n_trials': 10,
+        'T': 1000,
+        'tau': 0.1,
+        'params': {
+            'p_guess': 1.0,
+            'p_reward': 1.0
+        },
+    },
+}
+
+
+def default_tolerances():
+    '''
+    Agreement required of a candidate engine. Spiking networks are chaotic:
+    a change in summation order (numba's dot product against the reference
+    loop) moves single spikes after a few hundred ms and the exact synapses
+    drift sooner. Spikes are therefore matched within spike_window ms over
+    the first spike_horizon ms, and over the whole run within a fraction of
+    each neuron's interspike interval, which drift stays below and a
+    changed synapse does not:
+
+    spike_window   ms between a reference spike and its match
+    spike_match    fraction of spikes (both ways) that must find a match
+    spike_horizon  ms from the start over which spikes are matched
+    isi_window     whole-run match window, as a fraction of the neuron's
+                   median reference interspike interval
+    isi_match      fraction of spikes (both ways) matched over the run
+    rate_rtol,     per-neuron firing rate agreement, |dr| <= rate_atol +
+    rate_atol      rate_rtol * r (Hz)
+    g_std_rtol     relative difference of the per-neuron std of g
+    corr_atol      max difference between correlation matrices of g
+    weight_atol    max difference of the mean weight trajectories
+    motor_rtol     relative difference of the mean motor activity per trial
+    response_atol  difference of the response rate over all trials
+    label_margin   relative distance from the cut of the reference linkage
+                   below which a pair of neurons is not compared
+    label_match    fraction of the other pairs that must be in the same
+                   cluster (or not) as in the reference
+
+    Cluster labels are compared up to permutation, as co-membership of
+    pairs. Pairs that the reference linkage joins close to its cut (two
+    merges a few % apart, as in scratch_strong) flip with the same small
+    spike shifts and are left out.
+    '''
+    return {
+        'spike_window': 1.0,
+        'spike_match': 0.9,
+        'spike_horizon': 300.0,
+        'isi_window': 0.25,
+        'isi_match': 0.9,
+        'rate_rtol': 0.05,
+        'rate_atol': 0.5,
+        'g_std_rtol': 0.005,
+        'corr_atol': 0.1,
+        'weight_atol': 1e-4,
+        'motor_rtol': 1e-3,
+        'response_atol': 0.05,
+        'label_margin': 0.2,
+        'label_match': 0.95,
+    }
+
+
+def exact_tolerances():
+    '''
+    default_tolerances for synapses='exact'. Its exact decay of g is a
+    different discretisation from the reference Euler step, so spikes are
+    matched over 200 ms, within 0.35 of an interspike interval over the run,
+    and the std of g may differ by 2 %, which still rejects psp_decay=110 or
+    psp_amp=1.02.
+    '''
+    return {
+        **default_tolerances(), 'spike_horizon': 200.0,
+        'isi_window': 0.35,
+        'g_std_rtol': 0.02
+    }
+
+
+def _time_params(case):
+    t = np.arange(0, case['T'], case['tau'])
+    return {'tau': case['tau'], 'T': case['T'], 't': t, 'n': t.shape[0]}
+
+
+def _learning_params(case):
+    params = default_learning_params()
+    for phase in ('acquisition', 'extinction', 'reacquisition'):
+        params['n_trials_' + phase] = case['n_trials']
+    params.update(case.get('params', {}))
+    return params
+
+
+def capture_golden(path, cases=None, seed=0, verbose=False):
+    '''
+    Run the reference loops on every case of GOLDEN_CASES (or cases) and
+    save inputs and outputs to one .npz: for networks the weights, input,
+    spike events and g traces (as float32); for the learning loop the
+    learning curves. Case c draws its inputs from SeedSequence(seed)
+    spawned at c.
+    '''
+    cases = GOLDEN_CASES if cases is None else cases
+    arrays = {}
+    rngs = [
+        np.random.default_rng(s)
+        for s in np.random.SeedSequence(seed).spawn(len(cases))
+    ]
+    for (name, case), rng in zip(cases.items(), rngs):
+        if verbose:
+            print(name)
+        time_params = _time_params(case)
+        out = {}
+        if case['kind'] == 'network':
+            n_cells = case['n_cells']
+            I = rng.uniform(case['ibif'], case['ibif'] + 1, (n_cells, 1))
+            w = connectivity.random_weights(n_cells, case['p'], case['ksyn'],
+                                            seed=int(rng.integers(2**63)),
+                                            sparse=False)
+            t, n, v, g, spike = reference_network(
+                n_cells, w, I, time_params, make_iz_params(n_cells, IZ_SPN))
+            neurons, steps = np.nonzero(spike)
+            out = {
+                'w': w,
+                'I': I,
+                'spike_neurons': neurons,
+                'spike_steps': steps,
+                'g': g.astype(np.float32),
+            }
+        else:
+            out = reference_learning(case['n_simulations'], time_params,
+                                     _learning_params(case), rng)
+        arrays.update({name + '/' + k: x for k, x in out.items()})
+
+    save_checkpoint(path, arrays, meta={'cases': cases, 'seed': seed},
+                    compress=True)
+
+
+def load_golden(path):
+    '''{case: {'case': parameters, name: array, ...}} from capture_golden.'''
+    arrays, meta = load_checkpoint(path)
+    golden = {name: {'case': case} for name, case in meta['cases'].items()}
+    for key, x in arrays.items():
+        name, var = key.split('/', 1)
+        golden[name][var] = x
+    return golden
+
+
+def match_fraction(ref, new, window):
+    '''Fraction of the times in ref with a time in new within window.'''
+    if ref.shape[0] == 0:
+        return 1.0
+    if new.shape[0] == 0:
+        return 0.0
+    j = np.searchsorted(new, ref)
+    before = new[np.maximum(j - 1, 0)]
+    after = new[np.minimum(j, new.shape[0] - 1)]
+    nearest = np.minimum(abs(ref - before), abs(ref - after))
+    return np.mean(nearest <= window)
+
+
+def _corr(g):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(np.corrcoef(g))
+
+
+def _isi_window(times, fraction, default):
+    isi = np.diff(times)
+    return fraction * np.median(isi) if isi.shape[0] else default
+
+
+def label_agreement(ref_g, g, margin):
+    '''
+    Fraction of neuron pairs that are in the same cluster (or not) in the
+    ClusterAnalysis labels of g as in those of ref_g, so independent of how
+    clusters are numbered. Pairs whose cophenetic distance in the reference
+    linkage is within margin (relative) of the cut that gives its labels
+    are not counted.
+    '''
+    ref = ClusterAnalysis(cormat=_corr(ref_g))
+    new = ClusterAnalysis(cormat=_corr(g))
+    n = ref.labels.shape[0]
+    k = ref.n_clusters
+    Z = ref.linkage
+    heights = np.concatenate([[0], Z[:, 2], [np.inf]])
+    cut = 0.5 * (heights[n - k] + heights[n - k + 1])
+    coph = squareform(cophenet(Z))
+    decided = (coph * (1 + margin) <= cut) | (coph >= cut * (1 + margin))
+    decided &= ~np.eye(n, dtype=bool)
+    if not decided.any():
+        return 1.0
+    same_ref = ref.labels[:, None] == ref.labels[None, :]
+    same_new = new.labels[:, None] == new.labels[None, :]
+    return np.mean(same_ref[decided] == same_new[decided])
+
+
+def compare_network(ref, t, g, spike, tolerances=None):
+    '''
+    Checks of one candidate run (t, g, spike) against a golden network
+    case: list of (check, value, limit, passed).
+    '''
+    tol = {**default_tolerances(), **(tolerances or {})}
+    n_cells = g.shape[0]
+    ref_trains = SpikeTrains.from_events(ref['spike_neurons'],
+                                         ref['spike_steps'], n_cells, t)
+    trains = SpikeTrains.from_dense(spike, t)
+
+    horizon = t[0] + tol['spike_horizon']
+
+    def early(trains, i):
+        times = trains.spike_times(i)
+        return times[times < horizon]
+
+    match = min(
+        min(match_fraction(early(ref_trains, i), early(trains, i),
+                           tol['spike_window']),
+            match_fraction(early(trains, i), early(ref_trains, i),
+                           tol['spike_window'])) for i in range(n_cells))
+
+    whole = 1.0
+    for i in range(n_cells):
+        ref_times = ref_trains.spike_times(i)
+        times = trains.spike_times(i)
+        window = _isi_window(ref_times, tol['isi_window'],
+                             tol['spike_window'])
+        whole = min(whole, match_fraction(ref_times, times, window),
+                    match_fraction(times, ref_times, window))
+
+    r_ref = ref_trains.rates()
+    r_new = trains.rates()
+    rate_err = max(np.max(abs(r_new - r_ref) - tol['rate_rtol'] * r_ref), 0)
+
+    std_ref = ref['g'].std(1)
+    std_err = np.max(
+        abs(g.std(1) - std_ref) / np.maximum(std_ref, np.finfo(float).tiny))
+    corr_err = np.max(abs(_corr(g) - _corr(ref['g'])))
+    labels = label_agreement(ref['g'], g, tol['label_margin'])
+
+    return [
+        ('spike_match', match, tol['spike_match'],
+         match >= tol['spike_match']),
+        ('isi_match', whole, tol['isi_match'], whole >= tol['isi_match']),
+        ('rate_error', rate_err, tol['rate_atol'],
+         rate_err <= tol['rate_atol']),
+        ('g_std_error', std_err, tol['g_std_rtol'],
+         std_err <= tol['g_std_rtol']),
+        ('corr_error', corr_err, tol['corr_atol'],
+         corr_err <= tol['corr_atol']),
+        ('label_match', labels, tol['label_match'],
+         labels >= tol['label_match']),
+    ]
+
+
+def compare_learning(ref, res, tolerances=None):
+    '''
+    Checks of a candidate run_reward_learning result against a golden
+    learning case. The response and reward draws need not come from the
+    same random stream, so only the weight trajectories, motor activity
+    and overall response rate are compared, all as means over simulations.
+    With the outcomes fixed as in GOLDEN_CASES these are deterministic and
+    have to agree to well below the change of one learning rate.
+    '''
+    tol = {**default_tolerances(), **(tolerances or {})}
+    w_err = max(
+        np.max(abs(res[k].mean(0) - ref[k].mean(0)))
+        for k in ('w_rec_d1', 'w_rec_d2'))
+    motor_ref = ref['motor_act_rec'][:, 1:].mean(0)
+    motor_new = res['motor_act_rec'][:, 1:].mean(0)
+    motor_err = np.max(abs(motor_new - motor_ref) /
+                       np.maximum(abs(motor_ref), np.finfo(float).tiny))
+    resp_err = abs(res['response'][:, 1:].mean() -
+                   ref['response'][:, 1:].mean())
+    return [
+        ('weight_error', w_err, tol['weight_atol'],
+         w_err <= tol['weight_atol']),
+        ('motor_error', motor_err, tol['motor_rtol'],
+         motor_err <= tol['motor_rtol']),
+        ('response_error', resp_err, tol['response_atol'],
+         resp_err <= tol['response_atol']),
+    ]
+
+
+def check_golden(path, network=simulate_network,
+                 learning=run_reward_learning, tolerances=None, seed=0):
+    '''
+    Run a candidate engine on every golden case and compare it with the
+    reference outputs. network has the signature of simulate_network (use
+    functools.partial to pick a backend or synapse mode) and learning that
+    of run_reward_learning. Returns a DataFrame with one row per check:
+    case, check, value, limit, passed.
+    '''
+    rows = []
+    for name, ref in load_golden(path).items():
+        case = ref['case']
+        time_params = _time_params(case)
+        if case['kind'] == 'network':
+            n_cells = case['n_cells']
+            t, n, v, g, spike = network(n_cells, ref['w'], ref['I'],
+                                        time_params,
+                                        make_iz_params(n_cells, IZ_SPN))
+            checks = compare_network(ref, t, g, spike, tolerances)
+        else:
+            res = learning(case['n_simulations'], time_params,
+                           _learning_params(case),
+                           np.random.default_rng(seed))
+            checks = compare_learning(ref, res, tolerances)
+        rows += [(name, ) + c for c in checks]
+    return pd.DataFrame(rows,
+                        columns=['case', 'check', 'value', 'limit', 'passed'])
+
+
+def assert_golden(path, **kwargs):
+    '''check_golden, raising AssertionError with the failed checks.'''
+    table = check_golden(path, **kwargs)
+    failed = table[~table['passed']]
+    if len(failed):
+        raise AssertionError('golden traces not reproduced:\n' +
+                             failed.to_string(index=False))
+    return table
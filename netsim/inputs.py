@@ -0,0 +1,165 @@
+import numpy as np
+
+
+class InputSource:
+    '''
+    Lazily evaluated input current.
+
+    Subclasses implement block(i0, i1), returning the input for steps
+    i0 .. i1 - 1 as an array of shape (rows, i1 - i0), where rows is
+    n_cells or 1 (broadcast over cells). Sources combine with + and *,
+    against other sources, scalars or per-cell vectors, so nothing of size
+    (n_cells, n) is ever built.
+    '''
+
+    # make ndarray * source defer to __rmul__
+    __array_ufunc__ = None
+
+    def block(self, i0, i1):
+        raise NotImplementedError
+
+    def __add__(self, other):
+        return Combined(np.add, self, as_input(other))
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        return Combined(np.multiply, self, as_input(other))
+
+    __rmul__ = __mul__
+
+
+def _column(values):
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 0:
+        return values.reshape(1, 1)
+    return values.reshape(-1, 1)
+
+
+class Constant(InputSource):
+    '''Input fixed in time: a scalar or one value per cell.'''
+
+    def __init__(self, values):
+        self.values = _column(values)
+
+    def block(self, i0, i1):
+        return np.broadcast_to(self.values, (self.values.shape[0], i1 - i0))
+
+
+class Piecewise(InputSource):
+    '''
+    Piecewise-constant input: levels[k] applies from step edges[k] until
+    the next edge, and zero before edges[0]. Each level is a scalar or one
+    value per cell.
+    '''
+
+    def __init__(self, edges, levels):
+        self.edges = np.asarray(edges)
+        if len(levels) != self.edges.shape[0]:
+            raise ValueError('need one level per edge')
+        cols = [_column(x) for x in levels]
+        rows = max(c.shape[0] for c in cols)
+        # row 0 is the zero level before the first edge
+        self.levels = np.zeros((len(cols) + 1, rows))
+        for k, c in enumerate(cols):
+            self.levels[k + 1] = c[:, 0]
+
+    def block(self, i0, i1):
+        k = np.searchsorted(self.edges, np.arange(i0, i1), side='right')
+        return self.levels[k].T
+
+
+def top_hat(amp, start, stop):
+    '''amp (scalar or per cell) for steps start .. stop - 1, zero elsewhere.'''
+    return Piecewise([start, stop], [amp, 0])
+
+
+class HeldRandom(InputSource):
+    '''
+    Uniform(low, high) input per cell, redrawn every hold steps.
+
+    Segment s is drawn from SeedSequence([seed, s]), so any block can be
+    evaluated in any order and gives the same values.
+    '''
+
+    def __init__(self, low, high, n_cells, hold, seed=None):
+        self.low = low
+        self.high = high
+        self.n_cells = n_cells
+        self.hold = int(hold)
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self._last = (None, None)
+
+    def segment(self, s):
+        if self._last[0] != s:
+            rng = np.random.default_rng([self.seed, s])
+            self._last = (s, rng.uniform(self.low, self.high, self.n_cells))
+        return self._last[1]
+
+    def block(self, i0, i1):
+        out = np.empty((self.n_cells, i1 - i0))
+        for s in range(i0 // self.hold, (i1 - 1) // self.hold + 1):
+            a = max(s * self.hold, i0) - i0
+            b = min((s + 1) * self.hold, i1) - i0
+            out[:, a:b] = self.segment(s)[:, None]
+        return out
+
+
+class ArrayInput(InputSource):
+    '''A precomputed (n_cells, n) array, in memory or memory-mapped.'''
+
+    def __init__(self, array):
+        self.array = array
+
+    @classmethod
+    def from_file(cls, path):
+        '''Memory-map a .npy file so only the blocks in use are read.'''
+        return cls(np.load(path, mmap_mode='r'))
+
+    def block(self, i0, i1):
+        return self.array[:, i0:i1]
+
+
+class Combined(InputSource):
+    '''Elementwise op (np.add, np.multiply) of two sources.'''
+
+    def __init__(self, op, a, b):
+        self.op = op
+        self.a = a
+        self.b = b
+
+    def block(self, i0, i1):
+        return self.op(self.a.block(i0, i1), self.b.block(i0, i1))
+
+
+def as_input(I, n_cells=None, n=None):
+    '''
+    Wrap I as an InputSource: sources pass through, scalars and
+    (n_cells,)/(n_cells, 1) arrays become Constant and (n_cells, n) or
+    (1, n) arrays ArrayInput. Given n_cells and n, a 1-D array of length n
+    (and not n_cells or 1) is read as one time course shared by all cells,
+    i.e. as (1, n); a 1-D array of any other length raises ValueError.
+    '''
+    if isinstance(I, InputSource):
+        return I
+    I = np.asarray(I, dtype=float)
+    if (I.ndim == 1 and n_cells is not None and
+            I.shape[0] not in (1, n_cells)):
+        if I.shape[0] == n:
+            return ArrayInput(I[None, :])
+        raise ValueError(
+            '1-D input of length {} matches neither n_cells = {} nor n = {}; '
+            'pass ({},) or ({}, 1) for one value per cell and (1, {}) or '
+            '({}, {}) for input over time'.format(I.shape[0], n_cells, n,
+                                                  n_cells, n_cells, n,
+                                                  n_cells, n))
+    if I.ndim == 2 and I.shape[1] > 1:
+        return ArrayInput(I)
+    return Constant(I)
+
+
+def input_block(source, n_cells, i0, i1):
+    '''source.block(i0, i1) broadcast to (n_cells, i1 - i0) for the backends.'''
+    return np.broadcast_to(source.block(i0, i1), (n_cells, i1 - i0))
@@ -0,0 +1,146 @@
+import numpy as np
+
+from .spikes import SpikeTrains
+
+STATE_VARIABLES = ('v', 'u', 'g', 'spike')
+
+
+class StateMonitor:
+    '''
+    Record selected state variables of selected neurons every few steps.
+
+    variables is any subset of ('v', 'u', 'g', 'spike'), neurons an index
+    array (None records every cell) and every the decimation in time steps.
+    After a run the traces are in monitor[var] with shape
+    (n_recorded_neurons, n_samples), sampled at monitor.t.
+    '''
+
+    def __init__(self, variables=('v', 'g'), neurons=None, every=1,
+                 dtype=float):
+        for var in variables:
+            if var not in STATE_VARIABLES:
+                raise ValueError('unknown state variable: {}'.format(var))
+        self.variables = tuple(variables)
+        self.neurons = neurons
+        self.every = int(every)
+        self.dtype = dtype
+        self.data = {}
+        self.t = None
+
+    def start(self, n_cells, n, t):
+        if self.neurons is None:
+            self.neurons = np.arange(n_cells)
+        self.neurons = np.asarray(self.neurons)
+        self.t = t[::self.every]
+        n_samples = self.t.shape[0]
+        self.data = {
+            var: np.zeros((self.neurons.shape[0], n_samples), dtype=self.dtype)
+            for var in self.variables
+        }
+
+    def record(self, i_first, block):
+        '''
+        block maps each state variable to an (n_cells, m) array holding
+        steps i_first .. i_first + m - 1. Step i_first is the last step of
+        the previous block, re-recorded because a spike at its first new
+        step overwrites that v sample with vpeak.
+        '''
+        m = next(iter(block.values())).shape[1]
+        steps = np.arange(i_first, i_first + m)
+        cols = np.nonzero(steps % self.every == 0)[0]
+        if cols.size == 0:
+            return
+        idx = steps[cols] // self.every
+        for var in self.variables:
+            self.data[var][:, idx] = block[var][self.neurons][:, cols]
+
+    def finish(self):
+        pass
+
+    def __getitem__(self, var):
+        return self.data[var]
+
+    @property
+    def nbytes(self):
+        return sum(x.nbytes for x in self.data.values())
+
+
+class SummaryMonitor:
+    '''
+    Per-neuron running sums and maxima of state variables, accumulated block
+    by block so a run keeps O(n_cells) memory.
+
+    After a run monitor.sum[var] and monitor.max[var] have shape
+    (n_recorded_neurons,); sum[var] equals var.sum(1) of the full trace, for
+    any block size, and spike_counts the number of spikes per neuron.
+    '''
+
+    def __init__(self, variables=('g', 'spike'), neurons=None):
+        for var in variables:
+            if var not in STATE_VARIABLES:
+                raise ValueError('unknown state variable: {}'.format(var))
+        self.variables = tuple(variables)
+        self.neurons = neurons
+        self.sum = {}
+        self.max = {}
+
+    def start(self, n_cells, n, t):
+        if self.neurons is None:
+            self.neurons = np.arange(n_cells)
+        self.neurons = np.asarray(self.neurons)
+        m = self.neurons.shape[0]
+        self.sum = {var: np.zeros(m) for var in self.variables}
+        self.max = {var: np.full(m, -np.inf) for var in self.variables}
+        self._last = {var: np.zeros(m) for var in self.variables}
+
+    def record(self, i_first, block):
+        # column 0 was summed as the last column of the previous block, but a
+        # spike at the first new step has since set its v to vpeak, so only
+        # the change is added; it can only grow, so it still counts for max
+        for var in self.variables:
+            x = block[var][self.neurons]
+            self.sum[var] += x[:, 1:].sum(1) + (x[:, 0] - self._last[var])
+            self._last[var] = x[:, -1]
+            np.maximum(self.max[var], x.max(1), out=self.max[var])
+
+    def finish(self):
+        pass
+
+    @property
+    def spike_counts(self):
+        return self.sum['spike'].astype(int)
+
+
+class SpikeMonitor:
+    '''
+    Record spikes as (neuron, step) events instead of a dense matrix.
+    After a run monitor.trains is a spikes.SpikeTrains.
+    '''
+
+    def __init__(self, neurons=None):
+        self.neurons = neurons
+        self.trains = None
+        self._neurons = []
+        self._steps = []
+
+    def start(self, n_cells, n, t):
+        if self.neurons is None:
+            self.neurons = np.arange(n_cells)
+        self.neurons = np.asarray(self.neurons)
+        self.t = t
+        self._neurons = []
+        self._steps = []
+
+    def record(self, i_first, block):
+        # column 0 was already seen as the last column of the previous block
+        rows, cols = np.nonzero(block['spike'][self.neurons, 1:])
+        self._neurons.append(rows)
+        self._steps.append(cols + i_first + 1)
+
+    def finish(self):
+        neurons = np.concatenate(self._neurons) if self._neurons else []
+        steps = np.concatenate(self._steps) if self._steps else []
+        self.trains = SpikeTrains.from_events(neurons, steps,
+                                              self.neurons.shape[0], self.t)
+        self._neurons = []
+        self._steps = []
@@ -0,0 +1,186 @@
+import numpy as np
+
+from . import profiling
+from .backends import get_backend
+from .engine import init_state, make_iz_params, prepare_weights, unpack_iz_params
+from .inputs import as_input, input_block
+from .monitors import STATE_VARIABLES
+from .synapses import init_exact_synapses
+
+
+def _block_integrator(state, w, time_params, backend, synapses, psp_amp,
+                      psp_decay, psp_jump):
+    '''
+    Bind the backend for the chosen synapse mode to the run's weights and
+    time grid.
+
+    Returns advance(state, I_block, i0, i1, iz, syn_sign, outs), which
+    integrates steps i0 .. i1 - 1 into outs (v, u, g, spike), each with
+    i1 - i0 + 1 columns.
+    '''
+    t = time_params['t']
+    prepare, integrate = get_backend(backend, synapses)
+    w = prepare(w)
+
+    if synapses == 'exact':
+        init_exact_synapses(state, t[0])
+        if psp_jump is None:
+            # same PSP peak as the Euler update at the run's nominal tau
+            psp_jump = psp_amp * time_params['tau'] / psp_decay
+
+        def advance(state, I_block, i0, i1, iz, syn_sign, outs):
+            integrate(state, w, I_block, t[i0 - 1:i1], iz, psp_jump,
+                      psp_decay, syn_sign, *outs)
+
+    else:
+        dt = np.diff(t)
+
+        def advance(state, I_block, i0, i1, iz, syn_sign, outs):
+            integrate(state, w, I_block, dt[i0 - 1:i1 - 1], iz, psp_amp,
+                      psp_decay, syn_sign, *outs)
+
+    return advance
+
+
+def _count_block(n_cells, m, spike):
+    # column 0 of spike repeats the last step of the previous block
+    if profiling.active is not None:
+        profiling.count('steps', m)
+        profiling.count('neuron_steps', n_cells * m)
+        profiling.count('spikes', int(np.count_nonzero(spike[:, 1:])))
+
+
+@profiling.profiled('simulate_network')
+def simulate_network(n_cells,
+                     w,
+                     I,
+                     time_params,
+                     iz_params=None,
+                     psp_amp=1,
+                     psp_decay=100,
+                     syn_sign=-1,
+                     v0=None,
+                     u0=None,
+                     backend='auto',
+                     block_size=5000,
+                     synapses='euler',
+                     psp_jump=None,
+                     sparse='auto'):
+    '''
+    Vectorized replacement for the jj/kk loops in the scratch scripts.
+
+    Every cell is advanced in one array operation per time step, with
+    synaptic input computed as w.T @ g. Defaults reproduce scratch.py (SPN
+    cells, psp_amp = 1, psp_decay = 100, inhibitory coupling). Returns
+    t, n, v, g, spike like the original function, including the convention
+    that the sample before a spike is overwritten with vpeak.
+
+    backend is passed to backends.get_backend; the run is integrated in
+    blocks of block_size steps. synapses='exact' replaces the Euler update
+    of g with event-driven exponential decay (see synapses.py); psp_jump is
+    the conductance added per spike in that mode. w may be dense or
+    scipy.sparse; sparse is passed to engine.prepare_weights, which picks the
+    storage (and so the synaptic input path) from the density. I is an
+    array or an inputs.InputSource, evaluated one block at a time.
+    '''
+    t = time_params['t']
+    n = time_params['n']
+
+    if iz_params is None:
+        iz_params = make_iz_params(n_cells)
+    iz = unpack_iz_params(iz_params)
+    w = prepare_weights(w, sparse)
+    I = as_input(I, n_cells, n)
+
+    v = np.zeros((n_cells, n))
+    u = np.zeros((n_cells, n))
+    g = np.zeros((n_cells, n))
+    spike = np.zeros((n_cells, n))
+    profiling.count('alloc_bytes', 4 * v.nbytes)
+
+    state = init_state(n_cells, iz_params, v0, u0)
+    v[:, 0] = state['v']
+    u[:, 0] = state['u']
+
+    advance = _block_integrator(state, w, time_params, backend, synapses,
+                                psp_amp, psp_decay, psp_jump)
+
+    for i0 in range(1, n, block_size):
+        i1 = min(i0 + block_size, n)
+        outs = [x[:, i0 - 1:i1] for x in (v, u, g, spike)]
+        with profiling.phase('input'):
+            I_block = input_block(I, n_cells, i0 - 1, i1 - 1)
+        with profiling.phase('integrate'):
+            advance(state, I_block, i0, i1, iz, syn_sign, outs)
+        _count_block(n_cells, i1 - i0, outs[3])
+
+    return t, n, v, g, spike
+
+
+@profiling.profiled('run_network')
+def run_network(n_cells,
+                w,
+                I,
+                time_params,
+                monitors,
+                iz_params=None,
+                psp_amp=1,
+                psp_decay=100,
+                syn_sign=-1,
+                v0=None,
+                u0=None,
+                backend='auto',
+                block_size=1000,
+                synapses='euler',
+                psp_jump=None,
+                sparse='auto'):
+    '''
+    Same integration as simulate_network, but nothing is stored unless a
+    monitor asks for it.
+
+    The state lives in (n_cells,) working buffers plus one
+    (n_cells, block_size + 1) scratch block per variable; after every block
+    each monitor in monitors picks out what it records. Returns the final
+    state dict.
+    '''
+    t = time_params['t']
+    n = time_params['n']
+
+    if iz_params is None:
+        iz_params = make_iz_params(n_cells)
+    iz = unpack_iz_params(iz_params)
+    w = prepare_weights(w, sparse)
+    I = as_input(I, n_cells, n)
+
+    state = init_state(n_cells, iz_params, v0, u0)
+    buffers = {var: np.zeros((n_cells, block_size + 1)) for var in STATE_VARIABLES}
+    profiling.count('alloc_bytes', sum(x.nbytes for x in buffers.values()))
+
+    advance = _block_integrator(state, w, time_params, backend, synapses,
+                                psp_amp, psp_decay, psp_jump)
+
+    for monitor in monitors:
+        monitor.start(n_cells, n, t)
+
+    for i0 in range(1, n, block_size):
+        i1 = min(i0 + block_size, n)
+
+        block = {var: buffers[var][:, :i1 - i0 + 1] for var in STATE_VARIABLES}
+        for var in STATE_VARIABLES:
+            block[var][:, 0] = state[var]
+
+        with profiling.phase('input'):
+            I_block = input_block(I, n_cells, i0 - 1, i1 - 1)
+        with profiling.phase('integrate'):
+            advance(state, I_block, i0, i1, iz, syn_sign,
+                    [block[var] for var in STATE_VARIABLES])
+        _count_block(n_cells, i1 - i0, block['spike'])
+
+        with profiling.phase('monitors'):
+            for monitor in monitors:
+                monitor.record(i0 - 1, block)
+
+    for monitor in monitors:
+        monitor.finish()
+
+    return state
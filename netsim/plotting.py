@@ -0,0 +1,134 @@
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from . import profiling
+from .spikes import SpikeTrains
+
+
+def new_figure(nrows=1, ncols=1, figsize=(12, 6), interactive=False,
+               **kwargs):
+    '''
+    Figure and axes drawn on an Agg canvas, outside pyplot: nothing is
+    shown, nothing blocks and no display is needed. With interactive, the
+    figure is made by pyplot instead, so plt.show() opens it as well.
+    '''
+    if interactive:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize)
+    else:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+    ax = fig.subplots(nrows, ncols, squeeze=False, **kwargs)
+    return fig, ax
+
+
+@profiling.profiled('matplotlib')
+def save_figure(fig, path, dpi=100):
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+
+
+def lttb(x, y, n_out):
+    '''
+    Largest-Triangle-Three-Buckets downsampling of the curve (x, y) to
+    n_out points. Keeps peaks and troughs (spikes, PSP onsets) that plain
+    decimation such as y[::100] drops. Returns the indices of the kept
+    points.
+    '''
+    n = x.shape[0]
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # first and last point are kept; the rest falls into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.zeros(n_out, dtype=np.int64)
+    idx[-1] = n - 1
+
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b < n_out - 3:
+            nxt = slice(edges[b + 1], edges[b + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) -
+                      (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + np.argmax(area)
+        idx[b + 1] = a
+    return idx
+
+
+def plot_trace(ax, t, y, max_points=2000, **kwargs):
+    '''Plot y(t) downsampled with lttb to at most max_points points.'''
+    idx = lttb(t, y, max_points)
+    return ax.plot(t[idx], y[idx], **kwargs)
+
+
+def raster_image(trains, n_bins=2000, order=None):
+    '''
+    Spike counts per (neuron, time bin), shape (n_cells, n_bins), with rows
+    in order (a neuron permutation, e.g. sort_inds) if given.
+    '''
+    t = trains.t
+    n = t.shape[0]
+    rows = trains.neurons
+    if order is not None:
+        rank = np.empty(trains.n_cells, dtype=np.int64)
+        rank[order] = np.arange(trains.n_cells)
+        rows = rank[rows]
+    bins = trains.steps * n_bins // n
+    img = np.bincount(rows * n_bins + bins, minlength=trains.n_cells * n_bins)
+    return img.reshape(trains.n_cells, n_bins)
+
+
+def plot_raster(ax, trains, order=None, n_bins=2000, cmap='Greys'):
+    '''
+    Raster of every neuron as one rasterized image rather than one
+    eventplot line collection per neuron; cost does not grow with the
+    number of spikes once binned.
+    '''
+    if not isinstance(trains, SpikeTrains):
+        raise TypeError('plot_raster expects SpikeTrains')
+    img = raster_image(trains, n_bins, order)
+    t = trains.t
+    return ax.imshow(img > 0,
+                     aspect='auto',
+                     origin='lower',
+                     interpolation='nearest',
+                     cmap=cmap,
+                     extent=(t[0], t[-1], -0.5, trains.n_cells - 0.5),
+                     rasterized=True)
+
+
+@profiling.profiled('matplotlib')
+def results_figure(results, trains, analysis, max_points=2000):
+    '''
+    Summary of one run from stored results: cluster-sorted raster and
+    correlation matrix, cluster-mean g and the cluster means of cormat.
+
+    results is a results.SimulationResults with g, trains a SpikeTrains and
+    analysis an analysis.ClusterAnalysis. Returns the Figure.
+    '''
+    fig, ax = new_figure(2, 2, figsize=(12, 8))
+
+    plot_raster(ax[0, 0], trains, order=analysis.sort_inds)
+    ax[0, 0].set_title('Spikes (cluster order)')
+
+    ax[0, 1].imshow(analysis.cormat_sorted, origin='lower', aspect='equal')
+    ax[0, 1].set_title('g correlation (cluster order)')
+
+    ids, means = results.cluster_means('g')
+    for i, cl in enumerate(ids):
+        plot_trace(ax[1, 0], results.t, means[i], max_points,
+                   label='Cluster {}'.format(cl))
+    ax[1, 0].set_xlim(0, results.t.max())
+    ax[1, 0].legend()
+    ax[1, 0].set_title('Cluster mean g')
+
+    ax[1, 1].imshow(analysis.cluster_means[:, analysis.sort_inds],
+                    origin='lower',
+                    aspect='auto')
+    ax[1, 1].set_title('Cluster mean correlation')
+
+    return fig
@@ -0,0 +1,155 @@
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# the enabled Profiler, or None; hooks check this and do nothing else
+active = None
+
+_NULL = nullcontext()
+
+
+class Profiler:
+    '''
+    Wall time, call counts and counters per phase of a run.
+
+    Phases nest: a phase entered inside another is recorded under the path
+    of enclosing phase names, e.g. ('simulate_network', 'integrate'). The
+    hooks in netsim record steps, neuron_steps, spikes and alloc_bytes
+    (bytes of trace arrays allocated) as counters.
+
+        with netsim.Profiler() as prof:
+            t, n, v, g, spike = netsim.simulate_network(...)
+            analysis = netsim.ClusterAnalysis(g)
+            analysis.labels
+        print(prof.report())
+        prof.save_collapsed('run.folded')  # flamegraph.pl / speedscope
+
+    Only this process is profiled, not the workers of runner.run_units.
+    '''
+
+    def __init__(self):
+        self.stats = {}
+        self._stack = []
+        self._previous = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def enable(self):
+        global active
+        self._previous = active
+        active = self
+
+    def disable(self):
+        global active
+        active = self._previous
+        self._previous = None
+
+    def _entry(self, path):
+        entry = self.stats.get(path)
+        if entry is None:
+            entry = self.stats[path] = {'calls': 0, 'seconds': 0.0}
+        return entry
+
+    @contextmanager
+    def phase(self, name):
+        self._stack.append(name)
+        path = tuple(self._stack)
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            entry = self._entry(path)
+            entry['calls'] += 1
+            entry['seconds'] += time.perf_counter() - t0
+            self._stack.pop()
+
+    def count(self, name, value=1):
+        '''Add value to counter name of the current phase.'''
+        entry = self._entry(tuple(self._stack))
+        entry[name] = entry.get(name, 0) + value
+
+    def _self_seconds(self):
+        out = {path: entry['seconds'] for path, entry in self.stats.items()}
+        for path, entry in self.stats.items():
+            if len(path) > 1 and path[:-1] in out:
+                out[path[:-1]] -= entry['seconds']
+        return out
+
+    def report(self):
+        '''One row per phase path: calls, seconds, self_seconds, counters.'''
+        self_seconds = self._self_seconds()
+        rows = [{
+            'phase': '/'.join(path),
+            **entry,
+            'self_seconds': self_seconds[path],
+        } for path, entry in sorted(self.stats.items()) if path]
+        return pd.DataFrame(rows).fillna(0)
+
+    def to_dict(self):
+        self_seconds = self._self_seconds()
+        return {
+            '/'.join(path): {
+                **entry, 'self_seconds': self_seconds[path]
+            }
+            for path, entry in self.stats.items() if path
+        }
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1, default=float)
+
+    def collapsed(self):
+        '''
+        Collapsed-stack lines, "outer;inner <self microseconds>", as read
+        by flamegraph.pl and speedscope.
+        '''
+        return [
+            '{} {}'.format(';'.join(path), max(int(round(s * 1e6)), 0))
+            for path, s in sorted(self._self_seconds().items()) if path
+        ]
+
+    def save_collapsed(self, path):
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.collapsed()) + '\n')
+
+
+def enabled():
+    return active is not None
+
+
+def phase(name):
+    '''Context manager timing phase name, a shared no-op when disabled.'''
+    if active is None:
+        return _NULL
+    return active.phase(name)
+
+
+def count(name, value=1):
+    if active is not None:
+        active.count(name, value)
+
+
+def profiled(name=None):
+    '''Decorator recording every call of a function as a phase.'''
+
+    def decorate(func):
+        label = func.__name__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return func(*args, **kwargs)
+            with active.phase(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,68 @@
+import numpy as np
+
+from .clustering import membership_matrix
+from .spikes import SpikeTrains
+
+
+class ClusterReadout:
+    '''
+    Threshold readout of cluster-averaged activity.
+
+    The normalized (k x N) membership operator is built once from
+    cluster_labels, so all cluster means of a block of g are one sparse
+    product M @ g. weights (n_channels x k, default identity) maps cluster
+    means onto readout channels, e.g. motor pathways; a channel responds at
+    every step where its drive exceeds threshold (scalar or per channel).
+
+    Responses are event arrays: detect returns a SpikeTrains with one train
+    per channel. The readout is also a monitor, so run_network can feed it
+    g block by block; after the run the events are in readout.responses.
+    '''
+
+    def __init__(self, cluster_labels, threshold, weights=None, ids=None,
+                 variable='g'):
+        self.ids, self.M = membership_matrix(cluster_labels, ids)
+        self.weights = weights
+        self.threshold = np.reshape(threshold, (-1, 1))
+        self.variable = variable
+        self.responses = None
+
+    @property
+    def n_channels(self):
+        if self.weights is None:
+            return self.ids.shape[0]
+        return self.weights.shape[0]
+
+    def drive(self, g):
+        '''Channel drive for a (N, m) block of g, shape (n_channels, m).'''
+        x = np.asarray(self.M @ g)
+        if self.weights is not None:
+            x = self.weights @ x
+        return x
+
+    def crossings(self, g):
+        '''(channel, column) indices of supra-threshold samples of g.'''
+        return np.nonzero(self.drive(g) > self.threshold)
+
+    def detect(self, g, t):
+        '''Responses over the full trace g (N, n), sampled at t.'''
+        channels, steps = self.crossings(g)
+        return SpikeTrains.from_events(channels, steps, self.n_channels, t)
+
+    def start(self, n_cells, n, t):
+        self.t = t
+        self._channels = []
+        self._steps = []
+
+    def record(self, i_first, block):
+        # column 0 was already seen as the last column of the previous block
+        first = 0 if i_first == 0 else 1
+        channels, cols = self.crossings(block[self.variable][:, first:])
+        self._channels.append(channels)
+        self._steps.append(cols + i_first + first)
+
+    def finish(self):
+        channels = np.concatenate(self._channels) if self._channels else []
+        steps = np.concatenate(self._steps) if self._steps else []
+        self.responses = SpikeTrains.from_events(channels, steps,
+                                                 self.n_channels, self.t)
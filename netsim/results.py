@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .clustering import membership_matrix
+
+
+class SimulationResults:
+    '''
+    Traces of one run held as the original (n_cells, n) arrays, with
+    neuron, cluster and time views over them.
+
+    Aggregates (cluster means, decimation) are array reductions; a
+    long-format DataFrame with one row per neuron and sample is only built
+    by to_frame, and is usually best built from a decimated view.
+    '''
+
+    def __init__(self, t, cluster_labels=None, **traces):
+        self.t = t
+        self.traces = traces
+        self.cluster_labels = cluster_labels
+
+    @property
+    def n_cells(self):
+        return next(iter(self.traces.values())).shape[0]
+
+    @property
+    def n(self):
+        return self.t.shape[0]
+
+    def __getitem__(self, var):
+        return self.traces[var]
+
+    def neurons(self, idx, var='g'):
+        '''Traces of the neurons in idx (no copy for slices).'''
+        return self.traces[var][idx]
+
+    def cluster(self, label, var='g'):
+        '''Traces of the neurons with this cluster label.'''
+        return self.traces[var][self.cluster_labels == label]
+
+    def decimate(self, var='g', every=100):
+        '''Every every-th sample of var, as a view, and its times.'''
+        return self.t[::every], self.traces[var][:, ::every]
+
+    def cluster_means(self, var='g', every=1):
+        '''
+        Per-cluster mean of var at every every-th sample.
+        Returns cluster ids and a (k, n // every) array.
+        '''
+        ids, M = membership_matrix(self.cluster_labels)
+        return ids, np.asarray(M @ self.traces[var][:, ::every])
+
+    @profiling.profiled('dataframe')
+    def neuron_frame(self):
+        '''One row per neuron: neuron, cluster.'''
+        return pd.DataFrame({
+            'neuron': np.arange(self.n_cells),
+            'cluster': self.cluster_labels,
+        })
+
+    @profiling.profiled('dataframe')
+    def cluster_frame(self, var='g', every=100):
+        '''Long-format cluster means (cluster, t, var) for seaborn.'''
+        ids, means = self.cluster_means(var, every)
+        t = self.t[::every]
+        return pd.DataFrame({
+            'cluster': pd.Categorical(np.repeat(ids, t.shape[0])),
+            't': np.tile(t, ids.shape[0]),
+            var: means.ravel(),
+        })
+
+    @profiling.profiled('dataframe')
+    def to_frame(self, every=1):
+        '''Long-format frame (neuron, cluster, traces..., t), built now.'''
+        t = self.t[::every]
+        m = t.shape[0]
+        d = {'neuron': np.repeat(np.arange(self.n_cells), m)}
+        if self.cluster_labels is not None:
+            d['cluster'] = np.repeat(self.cluster_labels, m)
+        for var, x in self.traces.items():
+            d[var] = x[:, ::every].ravel()
+        d['t'] = np.tile(t, self.n_cells)
+        return pd.DataFrame(d)
+
+    @property
+    def nbytes(self):
+        return sum(x.nbytes for x in self.traces.values())
@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .experiment import run_reward_learning
+
+
+def spawn_rngs(seed, n):
+    '''n independent Generators spawned from one SeedSequence.'''
+    return [
+        np.random.default_rng(s)
+        for s in np.random.SeedSequence(seed).spawn(n)
+    ]
+
+
+def _run_unit(func, unit, seed_seq):
+    return func(unit, np.random.default_rng(seed_seq))
+
+
+def run_units(func, units, seed=None, n_workers=None, indices=None):
+    '''
+    Call func(unit, rng) for every unit, spread across a process pool.
+
+    Each unit gets its own Generator spawned from SeedSequence(seed) by its
+    position in units (or by indices, when only part of a larger set is
+    run), so the results (returned in the order of units) do not depend on
+    n_workers. func must be importable (defined in a module, not in a
+    script cell) so it can be sent to the workers. n_workers=1 runs
+    everything in this process; None uses every core.
+    '''
+    units = list(units)
+    root = np.random.SeedSequence(seed)
+    if indices is None:
+        indices = range(len(units))
+    seqs = [
+        np.random.SeedSequence(root.entropy, spawn_key=(i, ))
+        for i in indices
+    ]
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = max(1, min(n_workers, len(units)))
+
+    if n_workers == 1:
+        return [_run_unit(func, unit, seq) for unit, seq in zip(units, seqs)]
+
+    with ProcessPoolExecutor(n_workers) as pool:
+        futures = [
+            pool.submit(_run_unit, func, unit, seq)
+            for unit, seq in zip(units, seqs)
+        ]
+        return [f.result() for f in futures]
+
+
+def _learning_unit(unit, rng):
+    return run_reward_learning(unit['n_simulations'],
+                               unit['time_params'],
+                               unit['params'],
+                               rng,
+                               checkpoint=unit['checkpoint'],
+                               checkpoint_every=unit['checkpoint_every'],
+                               checkpoint_seconds=unit['checkpoint_seconds'],
+                               stopping=unit['stopping'])
+
+
+def run_reward_learning_pool(n_simulations,
+                             time_params,
+                             params=None,
+                             seed=None,
+                             n_workers=None,
+                             sims_per_unit=25,
+                             checkpoint_dir=None,
+                             checkpoint_every=10,
+                             checkpoint_seconds=None,
+                             stopping=None):
+    '''
+    run_reward_learning split into batches of sims_per_unit simulations
+    and spread over a process pool. Learning curves are concatenated along
+    the simulation axis; v and g come from the first batch. With
+    checkpoint_dir, every batch checkpoints to its own file there, so a
+    rerun with the same seed resumes each batch where it stopped
+    (checkpoint_every and checkpoint_seconds as in run_reward_learning).
+    Each batch checks the stopping criteria on its own simulations, so
+    n_trials_run and stop_reason are lists with one entry per batch.
+    '''
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    sizes = [sims_per_unit] * (n_simulations // sims_per_unit)
+    if n_simulations % sims_per_unit:
+        sizes.append(n_simulations % sims_per_unit)
+
+    units = [{
+        'n_simulations': size,
+        'time_params': time_params,
+        'params': params,
+        'checkpoint': (None if checkpoint_dir is None else os.path.join(
+            checkpoint_dir, 'batch{:04d}.npz'.format(b))),
+        'checkpoint_every': checkpoint_every,
+        'checkpoint_seconds': checkpoint_seconds,
+        'stopping': stopping,
+    } for b, size in enumerate(sizes)]
+    results = run_units(_learning_unit, units, seed, n_workers)
+
+    res = {
+        key: np.concatenate([r[key] for r in results])
+        for key in results[0]
+        if key not in ('v', 'g', 'n_trials_run', 'stop_reason')
+    }
+    res['v'] = results[0]['v']
+    res['g'] = results[0]['g']
+    res['n_trials_run'] = [r['n_trials_run'] for r in results]
+    res['stop_reason'] = [r['stop_reason'] for r in results]
+    return res
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class SpikeTrains:
+    '''
+    Spikes as compact (neuron, step) events in a CSR-like layout.
+
+    steps[indptr[i]:indptr[i + 1]] are the (sorted) step indices at which
+    neuron i fired, and t maps step indices to times.
+    '''
+
+    def __init__(self, indptr, steps, t):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.steps = np.asarray(steps, dtype=np.int64)
+        self.t = t
+
+    @classmethod
+    def from_events(cls, neurons, steps, n_cells, t):
+        neurons = np.asarray(neurons, dtype=np.int64)
+        steps = np.asarray(steps, dtype=np.int64)
+        order = np.lexsort((steps, neurons))
+        counts = np.bincount(neurons, minlength=n_cells)
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        return cls(indptr, steps[order], t)
+
+    @classmethod
+    def from_dense(cls, spike, t):
+        '''Convert an (n_cells, n) 0/1 spike matrix.'''
+        neurons, steps = np.nonzero(spike)
+        return cls.from_events(neurons, steps, spike.shape[0], t)
+
+    @property
+    def n_cells(self):
+        return self.indptr.shape[0] - 1
+
+    @property
+    def neurons(self):
+        '''Neuron index of every event, aligned with self.steps.'''
+        return np.repeat(np.arange(self.n_cells), np.diff(self.indptr))
+
+    @property
+    def times(self):
+        return self.t[self.steps]
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.steps.nbytes
+
+    def __len__(self):
+        return self.steps.shape[0]
+
+    def spike_steps(self, i):
+        return self.steps[self.indptr[i]:self.indptr[i + 1]]
+
+    def spike_times(self, i=None):
+        '''
+        Spike times of neuron i, or a list with one array per neuron (the
+        layout eventplot expects) when i is None.
+        '''
+        if i is not None:
+            return self.t[self.spike_steps(i)]
+        return np.split(self.times, self.indptr[1:-1])
+
+    def counts(self):
+        return np.diff(self.indptr)
+
+    def rates(self, duration=None):
+        '''Firing rate of every neuron in Hz (t and duration in ms).'''
+        if duration is None:
+            duration = self.t[-1] - self.t[0] + (self.t[1] - self.t[0])
+        return self.counts() / (duration / 1000)
+
+    def raster(self, order=None):
+        '''
+        (times, rows) of every event for a scatter-style raster. order is an
+        optional permutation of neurons, e.g. np.argsort(cluster_labels);
+        row r then shows neuron order[r].
+        '''
+        rows = self.neurons
+        if order is not None:
+            rank = np.empty(self.n_cells, dtype=np.int64)
+            rank[np.asarray(order)] = np.arange(self.n_cells)
+            rows = rank[rows]
+        return self.times, rows
+
+    def reorder(self, order):
+        '''New SpikeTrains with neuron r taken from neuron order[r].'''
+        order = np.asarray(order)
+        counts = self.counts()[order]
+        starts = self.indptr[order]
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        take = np.repeat(starts - indptr[:-1], counts) + np.arange(indptr[-1])
+        return SpikeTrains(indptr, self.steps[take], self.t)
+
+    def to_dense(self):
+        spike = np.zeros((self.n_cells, self.t.shape[0]))
+        spike[self.neurons, self.steps] = 1
+        return spike
@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class StoppingCriterion:
+    '''
+    Test evaluated between trials of run_reward_learning.
+
+    check(trl, rec, params) gets the index of the trial just finished, the
+    dict of (n_simulations, n_trials) records filled up to it (w_rec_d1,
+    w_rec_d2, response, motor_act_rec, ...) and the experiment parameters,
+    and returns a reason string to stop or None to carry on. Criteria look
+    at the last `window` trials and never fire before min_trials trials
+    have run. Trial 0 only holds the initial state (nothing is simulated
+    on it), so windows start at trial 1. A batch stops only when every
+    simulation in it meets the criterion.
+    '''
+
+    reason = 'stopped'
+
+    def __init__(self, window=10, min_trials=None):
+        self.window = window
+        self.min_trials = window if min_trials is None else min_trials
+
+    def __call__(self, trl, rec, params):
+        if trl < max(self.min_trials, self.window):
+            return None
+        recent = slice(trl - self.window + 1, trl + 1)
+        return self.reason if np.all(self.test(rec, recent, params)) else None
+
+    def test(self, rec, recent, params):
+        '''Boolean per simulation: criterion met over the trials in recent.'''
+        raise NotImplementedError
+
+
+class WeightConvergence(StoppingCriterion):
+    '''w_rec_d1 and w_rec_d2 moved by less than tol over the window.'''
+
+    reason = 'weights converged'
+
+    def __init__(self, tol=1e-4, window=10, min_trials=None):
+        super().__init__(window, min_trials)
+        self.tol = tol
+
+    def test(self, rec, recent, params):
+        return np.all([
+            np.ptp(rec[k][:, recent], axis=1) < self.tol
+            for k in ('w_rec_d1', 'w_rec_d2')
+        ], axis=0)
+
+
+class WeightsPinned(StoppingCriterion):
+    '''
+    Both plastic weights stuck at w_min or w_max over the window. A weight
+    that has never moved from its initial value is not pinned, since the
+    weights start at w_min.
+    '''
+
+    reason = 'weights pinned'
+
+    def test(self, rec, recent, params):
+        pinned = True
+        for k in ('w_rec_d1', 'w_rec_d2'):
+            w = rec[k][:, recent]
+            moved = np.any(rec[k][:, :recent.stop] != rec[k][:, :1], axis=1)
+            pinned = pinned & moved & np.all(
+                np.isclose(w, params['w_min']) | np.isclose(w, params['w_max']),
+                axis=1)
+        return pinned
+
+
+class Plateau(StoppingCriterion):
+    '''
+    The learning curve rec[key] (averaged over simulations) changed by less
+    than tol between the two halves of the window.
+    '''
+
+    reason = 'plateau'
+
+    def __init__(self, key='predicted_reward', tol=0.02, window=10,
+                 min_trials=None):
+        super().__init__(window, min_trials)
+        self.key = key
+        self.tol = tol
+
+    def test(self, rec, recent, params):
+        curve = rec[self.key][:, recent].mean(0)
+        half = curve.shape[0] // 2
+        return abs(curve[half:].mean() - curve[:half].mean()) < self.tol
+
+
+class Silent(StoppingCriterion):
+    '''No responses and motor activity at most min_activity over the window.'''
+
+    reason = 'silent'
+
+    def __init__(self, min_activity=0, window=10, min_trials=None):
+        super().__init__(window, min_trials)
+        self.min_activity = min_activity
+
+    def test(self, rec, recent, params):
+        return (np.all(rec['response'][:, recent] == 0, axis=1) &
+                np.all(rec['motor_act_rec'][:, recent] <= self.min_activity,
+                       axis=1))
+
+
+class Saturated(StoppingCriterion):
+    '''Motor activity above max_activity (runaway firing) over the window.'''
+
+    reason = 'saturated'
+
+    def __init__(self, max_activity, window=3, min_trials=None):
+        super().__init__(window, min_trials)
+        self.max_activity = max_activity
+
+    def test(self, rec, recent, params):
+        return np.all(rec['motor_act_rec'][:, recent] > self.max_activity,
+                      axis=1)
+
+
+def check_stopping(criteria, trl, rec, params):
+    '''Reason of the first criterion that fires, or None.'''
+    for criterion in criteria or ():
+        reason = criterion(trl, rec, params)
+        if reason is not None:
+            return reason
+    return None
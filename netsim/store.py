@@ -0,0 +1,259 @@
+import json
+import os
+
+import numpy as np
+
+from .monitors import STATE_VARIABLES
+from .spikes import SpikeTrains
+
+
+def _to_json(x):
+    if isinstance(x, dict):
+        return {k: _to_json(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [_to_json(v) for v in x]
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    return x
+
+
+class ChunkedArray:
+    '''
+    Read-only view of an array stored as chunks along its last axis.
+
+    .npy chunks are memory-mapped and .npz chunks decompressed, and only
+    the chunks a slice touches are opened, so indexing a large run is
+    cheap. Index with [..., i0:i1] (or any key whose last element selects
+    along the chunk axis); the result is an in-memory ndarray.
+    '''
+
+    def __init__(self, root, name, info):
+        self.root = root
+        self.name = name
+        self.dtype = np.dtype(info['dtype'])
+        self.lengths = np.asarray(info['lengths'], dtype=np.int64)
+        self.files = info['files']
+        self.head = tuple(info['head'])
+        self.offsets = np.concatenate(([0], np.cumsum(self.lengths)))
+
+    @property
+    def shape(self):
+        return self.head + (int(self.offsets[-1]), )
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def chunk(self, c):
+        path = os.path.join(self.root, self.files[c])
+        if path.endswith('.npz'):
+            with np.load(path) as z:
+                return z['data']
+        return np.load(path, mmap_mode='r')
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, ) if self.ndim == 1 else (key, slice(None))
+        if key[0] is Ellipsis:
+            key = (slice(None), ) * (self.ndim - len(key) + 1) + key[1:]
+        head, last = key[:-1], key[-1]
+
+        if isinstance(last, (int, np.integer)):
+            last = last % self.shape[-1]
+            c = np.searchsorted(self.offsets, last, side='right') - 1
+            return np.asarray(self.chunk(c)[head + (last - self.offsets[c], )])
+
+        start, stop, step = last.indices(self.shape[-1])
+        if step != 1:
+            return self[head + (slice(start, stop), )][..., ::step]
+        parts = []
+        c0 = max(np.searchsorted(self.offsets, start, side='right') - 1, 0)
+        for c in range(c0, self.lengths.shape[0]):
+            a, b = self.offsets[c], self.offsets[c + 1]
+            if a >= stop:
+                break
+            cols = slice(max(start - a, 0), min(stop, b) - a)
+            parts.append(np.asarray(self.chunk(c)[head + (cols, )]))
+        if not parts:
+            empty = np.zeros(self.head + (0, ), self.dtype)
+            return empty[head + (slice(None), )]
+        return np.concatenate(parts, axis=-1)
+
+    def to_array(self):
+        return self[..., :]
+
+
+class ResultStore:
+    '''
+    Directory of chunked arrays plus JSON attributes (parameters).
+
+    Arrays grow along their last axis (time for traces, events for spike
+    lists) with append, one file per chunk: .npy when compress is False
+    (memory-mapped on read) and compressed .npz otherwise. write stores a
+    whole array as a single chunk (weights, learning curves). Metadata is
+    kept in memory and written to index.json by flush and close, by
+    replacing the file, so a reader (or a crash) only ever sees a complete
+    index of chunks already on disk. StoreMonitor flushes once per block,
+    so a store can be read while, or after, the run that fills it.
+
+        with ResultStore(path, 'w') as store:
+            netsim.run_network(..., [StoreMonitor(store)])
+        g = ResultStore(path)['g'][:, 1000:2000]
+    '''
+
+    def __init__(self, path, mode='r', compress=False):
+        self.path = path
+        self.mode = mode
+        self.compress = compress
+        if mode == 'w':
+            os.makedirs(path, exist_ok=True)
+            self.index = {'arrays': {}, 'attrs': {}}
+            self.flush()
+        else:
+            with open(os.path.join(path, 'index.json')) as f:
+                self.index = json.load(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.mode == 'w':
+            self.flush()
+
+    def flush(self):
+        '''Write the index, atomically, to index.json.'''
+        tmp = os.path.join(self.path, 'index.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, os.path.join(self.path, 'index.json'))
+
+    @property
+    def attrs(self):
+        return self.index['attrs']
+
+    def set_attrs(self, **attrs):
+        self.index['attrs'].update(_to_json(attrs))
+
+    def __contains__(self, name):
+        return name in self.index['arrays']
+
+    def keys(self):
+        return self.index['arrays'].keys()
+
+    def append(self, name, block):
+        '''Add block as the next chunk of name along the last axis.'''
+        block = np.asarray(block)
+        info = self.index['arrays'].setdefault(
+            name, {
+                'dtype': block.dtype.str,
+                'head': list(block.shape[:-1]),
+                'lengths': [],
+                'files': [],
+            })
+        if list(block.shape[:-1]) != info['head']:
+            raise ValueError('chunk shape {} does not match {}'.format(
+                block.shape, info['head']))
+
+        os.makedirs(os.path.join(self.path, name), exist_ok=True)
+        c = len(info['files'])
+        if self.compress:
+            fname = os.path.join(name, '{:06d}.npz'.format(c))
+            np.savez_compressed(os.path.join(self.path, fname), data=block)
+        else:
+            fname = os.path.join(name, '{:06d}.npy'.format(c))
+            np.save(os.path.join(self.path, fname), block)
+        info['files'].append(fname)
+        info['lengths'].append(int(block.shape[-1]))
+
+    def write(self, name, array):
+        '''Store a whole array (replacing any earlier one) as one chunk.'''
+        self.index['arrays'].pop(name, None)
+        array = np.asarray(array)
+        if array.ndim == 0:
+            array = array.reshape(1)
+        self.append(name, array)
+
+    def __getitem__(self, name):
+        return ChunkedArray(self.path, name, self.index['arrays'][name])
+
+    def spike_trains(self, name='spike'):
+        '''SpikeTrains from the {name}_neurons / {name}_steps event arrays.'''
+        info = self.attrs[name]
+        return SpikeTrains.from_events(self[name + '_neurons'].to_array(),
+                                       self[name + '_steps'].to_array(),
+                                       info['n_cells'], self['t'].to_array())
+
+
+class StoreMonitor:
+    '''
+    Stream state variables and spike events into a ResultStore during
+    run_network, one chunk per block, so the run never holds more than a
+    block in memory.
+
+    Traces of the selected neurons are stored every every-th step under
+    their variable names, with their sample times in 't_trace' and the full
+    time grid in 't'. With spikes True,
+    spike events go to 'spike_neurons' / 'spike_steps' (read back with
+    store.spike_trains()).
+    '''
+
+    def __init__(self, store, variables=('v', 'g'), neurons=None, every=1,
+                 spikes=True, dtype=None):
+        for var in variables:
+            if var not in STATE_VARIABLES:
+                raise ValueError('unknown state variable: {}'.format(var))
+        self.store = store
+        self.variables = tuple(variables)
+        self.neurons = neurons
+        self.every = int(every)
+        self.spikes = spikes
+        self.dtype = dtype
+
+    def start(self, n_cells, n, t):
+        if self.neurons is None:
+            self.neurons = np.arange(n_cells)
+        self.neurons = np.asarray(self.neurons)
+        self.store.write('t', t)
+        self.store.write('t_trace', t[::self.every])
+        self.store.set_attrs(neurons=self.neurons, every=self.every,
+                             spike={'n_cells': int(self.neurons.shape[0])})
+        self._tail = None
+
+    def _write(self, steps, cols, block):
+        keep = steps % self.every == 0
+        if not keep.any():
+            return
+        for var in self.variables:
+            x = block[var][self.neurons][:, cols[keep]]
+            if self.dtype is not None:
+                x = x.astype(self.dtype)
+            self.store.append(var, x)
+
+    def record(self, i_first, block):
+        # the last column of a block is held back and written as column 0
+        # of the next block, which carries the vpeak overwrite of v
+        m = next(iter(block.values())).shape[1]
+        steps = np.arange(i_first, i_first + m - 1)
+        self._write(steps, np.arange(m - 1), block)
+        self._tail = (i_first + m - 1,
+                      {var: block[var][:, -1:].copy() for var in self.variables})
+
+        if self.spikes:
+            # column 0 was already seen as the last column of the previous block
+            rows, cols = np.nonzero(block['spike'][self.neurons, 1:])
+            if rows.size > 0 or i_first == 0:
+                self.store.append('spike_neurons', rows)
+                self.store.append('spike_steps', cols + i_first + 1)
+
+        self.store.flush()
+
+    def finish(self):
+        if self._tail is not None:
+            i, tail = self._tail
+            self._write(np.array([i]), np.array([0]), tail)
+        self.store.close()
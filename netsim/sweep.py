@@ -0,0 +1,294 @@
+import itertools
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from . import connectivity
+from .analysis import ClusterAnalysis
+from .cache import code_version, input_key
+from .engine import IZ_SPN, make_iz_params
+from .experiment import default_learning_params, run_reward_learning
+from .network import simulate_network
+from .runner import run_units
+from .spikes import SpikeTrains
+
+
+def grid(**axes):
+    '''Every combination of the listed values, e.g. grid(p=[0.2, 0.95]).'''
+    names = list(axes)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(axes[k] for k in names))
+    ]
+
+
+def _scale(u, ranges):
+    '''Map unit-cube samples u (n, d) onto ranges {name: (lo, hi[, 'log'])}.'''
+    points = []
+    for row in u:
+        point = {}
+        for x, (name, r) in zip(row, ranges.items()):
+            lo, hi = r[0], r[1]
+            if len(r) > 2 and r[2] == 'log':
+                point[name] = float(np.exp(np.log(lo) + x * np.log(hi / lo)))
+            else:
+                point[name] = float(lo + x * (hi - lo))
+        points.append(point)
+    return points
+
+
+def random_points(n, seed=None, **ranges):
+    '''
+    n points drawn uniformly from ranges, given as name=(lo, hi) or
+    name=(lo, hi, 'log') for log-uniform (learning rates).
+    '''
+    u = np.random.default_rng(seed).random((n, len(ranges)))
+    return _scale(u, ranges)
+
+
+def lhs(n, seed=None, **ranges):
+    '''n Latin-hypercube points over ranges (as in random_points).'''
+    u = qmc.LatinHypercube(d=len(ranges), seed=seed).random(n)
+    return _scale(u, ranges)
+
+
+def network_unit(unit, rng):
+    '''
+    One random network from scratch.py, drawn from rng.
+
+    unit is a dict with n_cells, p, ksyn, ibif and time_params (plus any
+    extra simulate_network keyword arguments under 'kwargs'). Returns
+    t, n, v, g, spike.
+    '''
+    n_cells = unit['n_cells']
+    p = unit['p']
+    time_params = unit['time_params']
+
+    # NOTE: fixed input
+    I = rng.uniform(unit['ibif'], unit['ibif'] + 1, (n_cells, 1))
+
+    w = connectivity.random_weights(n_cells, p, unit['ksyn'],
+                                    seed=int(rng.integers(2**63)))
+
+    return simulate_network(n_cells, w, I, time_params,
+                            make_iz_params(n_cells, IZ_SPN),
+                            **unit.get('kwargs', {}))
+
+
+def network_metrics(t, n, v, g, spike):
+    '''Mean firing rate (Hz), cophenetic correlation and cluster count.'''
+    rates = SpikeTrains.from_dense(spike, t).rates()
+    metrics = {
+        'rate_mean': rates.mean(),
+        'rate_max': rates.max(),
+        'cophenet': np.nan,
+        'n_clusters': 0,
+    }
+    # silent cells leave nan rows in corrcoef, which linkage rejects
+    if np.all(g.std(1) > 0):
+        analysis = ClusterAnalysis(g)
+        metrics['cophenet'] = analysis.cophenet
+        metrics['n_clusters'] = analysis.n_clusters
+    return metrics
+
+
+def network_point(point, rng, base):
+    '''
+    Sweep evaluator for the scratch.py network: base holds the network_unit
+    keys (n_cells, p, ksyn, ibif, time_params) and point overrides any of
+    them.
+    '''
+    return network_metrics(*network_unit({**base, **point}, rng))
+
+
+def learning_metrics(res, params):
+    '''
+    Final weights, response rate per phase and mean learning curves. Keys
+    ending in _sims hold one value per simulation, for run_adaptive_sweep.
+    '''
+    n_acq = params['n_trials_acquisition']
+    n_ext = params['n_trials_extinction']
+    last = res['n_trials_run'] - 1
+    response = res['response']
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        # phases a stopped run never reached are nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'w_d1_final': res['w_rec_d1'][:, last].mean(),
+            'w_d2_final': res['w_rec_d2'][:, last].mean(),
+            'response_acquisition': np.nanmean(response[:, 1:n_acq]),
+            'response_extinction': np.nanmean(response[:,
+                                                       n_acq:n_acq + n_ext]),
+            'response_reacquisition': np.nanmean(response[:, n_acq + n_ext:]),
+            'w_rec_d1': res['w_rec_d1'].mean(0),
+            'w_rec_d2': res['w_rec_d2'].mean(0),
+            'response': response.mean(0),
+            'predicted_reward': res['predicted_reward'].mean(0),
+            'w_d1_final_sims': res['w_rec_d1'][:, last],
+            'w_d2_final_sims': res['w_rec_d2'][:, last],
+            'response_sims': np.nanmean(response[:, 1:], axis=1),
+            'n_trials_run': res['n_trials_run'],
+            'stop_reason': res['stop_reason'] or '',
+        }
+
+
+def learning_point(point, rng, base):
+    '''
+    Sweep evaluator for the tmp_hw4_3.py experiment: point overrides keys
+    of default_learning_params (alpha_d1, beta_d2, alpha_pr, ...) or
+    n_simulations; base holds n_simulations, time_params and optionally
+    params and a list of stopping criteria under 'stopping'.
+    '''
+    params = {**default_learning_params(), **base.get('params', {})}
+    params.update({k: v for k, v in point.items() if k in params})
+    n_simulations = point.get('n_simulations', base['n_simulations'])
+    res = run_reward_learning(n_simulations,
+                              base['time_params'],
+                              params,
+                              rng,
+                              stopping=base.get('stopping'))
+    return learning_metrics(res, params)
+
+
+def _save_point(path, metrics):
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **{k: np.asarray(v) for k, v in metrics.items()})
+    os.replace(tmp, path)
+
+
+def _load_point(path):
+    with np.load(path, allow_pickle=False) as z:
+        return {k: (z[k].item() if z[k].ndim == 0 else z[k]) for k in z.files}
+
+
+def _sweep_unit(unit, rng):
+    metrics = unit['evaluate'](unit['point'], rng, unit['base'])
+    if unit['path'] is not None:
+        _save_point(unit['path'], metrics)
+    return metrics
+
+
+def run_sweep(evaluate, points, base=None, seed=None, n_workers=None,
+              store_dir=None):
+    '''
+    Evaluate every point (a dict of parameter overrides, e.g. from grid,
+    random_points or lhs) with evaluate(point, rng, base) across a process
+    pool and collect the metrics into one DataFrame, one row per point,
+    with the point's parameters as columns (array metrics such as learning
+    curves are kept as object columns).
+
+    Point i always draws from the Generator spawned from SeedSequence(seed)
+    at index i. With store_dir, each point's metrics are saved there as
+    soon as it finishes, keyed as StageCache keys a stage (the evaluator's
+    code, the netsim code version) plus the point, base and seed; points
+    already stored are loaded instead of rerun, so an interrupted sweep
+    resumes where it stopped (pass the same seed).
+
+    n_workers other than 1 starts a process pool, which re-imports the
+    calling script in every worker under the spawn start method (macOS,
+    Windows): call it under if __name__ == '__main__': there, or pass
+    n_workers=1 from #%% cell scripts.
+    '''
+    base = {} if base is None else base
+    points = list(points)
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if store_dir is not None:
+        os.makedirs(store_dir, exist_ok=True)
+
+    paths = [None] * len(points)
+    done = {}
+    for i, point in enumerate(points):
+        if store_dir is None:
+            continue
+        key = input_key(evaluate.__qualname__, evaluate, code_version(),
+                        point, base, seed, i)
+        paths[i] = os.path.join(store_dir, key + '.npz')
+        if os.path.exists(paths[i]):
+            done[i] = _load_point(paths[i])
+
+    todo = [i for i in range(len(points)) if i not in done]
+    units = [{
+        'evaluate': evaluate,
+        'point': points[i],
+        'base': base,
+        'path': paths[i],
+    } for i in todo]
+    for i, metrics in zip(todo,
+                          run_units(_sweep_unit, units, seed, n_workers,
+                                    indices=todo)):
+        done[i] = metrics
+
+    rows = [{**points[i], **done[i]} for i in range(len(points))]
+    return pd.DataFrame(rows)
+
+
+def _standard_error(x):
+    if x.shape[0] < 2:
+        return np.inf
+    return x.std(ddof=1) / np.sqrt(x.shape[0])
+
+
+def run_adaptive_sweep(evaluate,
+                       points,
+                       metric,
+                       base=None,
+                       target_se=0.01,
+                       max_rounds=4,
+                       seed=None,
+                       n_workers=None):
+    '''
+    Sweep that spends extra simulations only where they are needed.
+
+    Every point is evaluated once; afterwards, only points whose metric
+    (a per-simulation array returned by evaluate, e.g. 'w_d1_final_sims'
+    from learning_point) still has a standard error above target_se are
+    evaluated again, for up to max_rounds rounds. Round r of point i draws
+    from spawn key r * len(points) + i. The table holds the first round's
+    metrics plus {metric}_mean, {metric}_se, {metric}_n and rounds.
+    '''
+    base = {} if base is None else base
+    points = list(points)
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+
+    first = [None] * len(points)
+    samples = [[] for _ in points]
+    active = list(range(len(points)))
+    for r in range(max_rounds):
+        if not active:
+            break
+        units = [{
+            'evaluate': evaluate,
+            'point': points[i],
+            'base': base,
+            'path': None,
+        } for i in active]
+        indices = [r * len(points) + i for i in active]
+        for i, metrics in zip(
+                active,
+                run_units(_sweep_unit, units, seed, n_workers,
+                          indices=indices)):
+            if first[i] is None:
+                first[i] = metrics
+            samples[i].append(np.atleast_1d(metrics[metric]))
+        active = [
+            i for i in active
+            if _standard_error(np.concatenate(samples[i])) > target_se
+        ]
+
+    rows = []
+    for i, point in enumerate(points):
+        x = np.concatenate(samples[i])
+        rows.append({
+            **point,
+            **first[i],
+            metric + '_mean': x.mean(),
+            metric + '_se': _standard_error(x),
+            metric + '_n': x.shape[0],
+            'rounds': len(samples[i]),
+        })
+    return pd.DataFrame(rows)
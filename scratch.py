@@ -1,4 +1,5 @@
 #%% Import libraries and packages
+import os
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -10,7 +11,14 @@ from scipy.cluster.hierarchy import dendrogram, linkage
 from scipy.cluster.hierarchy import cophenet
 from scipy.spatial.distance import pdist
 from scipy.cluster.hierarchy import fcluster
+import netsim
 # %matplotlib qt
+
+# NOTE: figures are written to FIG_DIR; with INTERACTIVE they are also
+# opened in windows and plt.show() blocks until they are closed
+INTERACTIVE = False
+FIG_DIR = 'figures'
+os.makedirs(FIG_DIR, exist_ok=True)
 '''
 TODO: Minor
 label plots and prep explanations
@@ -18,65 +26,9 @@ label plots and prep explanations
 #%% Define functions
 def simulate_network(n_cells, w, I, time_params):
 
-    tau = time_params['tau']
-    T = time_params['T']
-    t = time_params['t']
-    n = time_params['n']
-
-    A = 1
-    t_peak = 2
-    psp_amp = 1
-    psp_decay = 100
-
-    v = np.zeros((n_cells, n))
-    u = np.zeros((n_cells, n))
-    g = np.zeros((n_cells, n))
-    spike = np.zeros((n_cells, n))
-
-    # hold onto sum of all presynaptic outputs
-    I_net = np.zeros((n_cells, n))
-
-    # neuron parameters
-    C = 50
-    vr = -80
-    vt = -25
-    vpeak = 40
-    k = 1
-    a = 0.01
-    b = -20
-    c = -55
-    d = 150
-
-    # init v and u
-    v[:, 0] = vr
-
-    # Simulate the network in order to identify the clusters
-    for i in range(1, n):
-
-        dt = t[i] - t[i - 1]
-
-        # iterate through postsynaptic neurons
-        for jj in range(n_cells):
-
-            # iterate through presynaptic neurons
-            for kk in range(n_cells):
-                if jj != kk:
-                    I_net[jj, i - 1] += w[kk, jj] * g[kk, i - 1]
-
-            dvdt = (k * (v[jj, i - 1] - vr) * (v[jj, i - 1] - vt) -
-                    u[jj, i - 1] - I_net[jj, i - 1] + I[jj, i - 1]) / C
-            dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
-            dgdt = (-g[jj, i - 1] + psp_amp * spike[jj, i - 1]) / psp_decay
-
-            v[jj, i] = v[jj, i - 1] + dvdt * dt
-            u[jj, i] = u[jj, i - 1] + dudt * dt
-            g[jj, i] = g[jj, i - 1] + dgdt * dt
-
-            if v[jj, i] >= vpeak:
-                v[jj, i - 1] = vpeak
-                v[jj, i] = c
-                u[jj, i] = u[jj, i] + d
-                spike[jj, i] = 1
+    # NOTE: SPN cells, psp_amp = 1, psp_decay = 100 and inhibitory coupling are
+    # the netsim defaults; the whole population is advanced one step at a time
+    t, n, v, g, spike = netsim.simulate_network(n_cells, w, I, time_params)
     '''            
     # PERFORM THE CLUSTERING
     # get spike times
@@ -160,16 +112,28 @@ def simulate_network(n_cells, w, I, time_params):
     return t, n, v, g, spike
 
 #%%
-def plot_results(t, n, v, g, spike):
+def cluster_network(g):
+
+    # compute covaraince matrix on output g; the analysis is rebuilt on
+    # cormat so a stored cluster stage holds the artefacts, not the traces
+    cormat = netsim.ClusterAnalysis.of(g).cormat
+    analysis = netsim.ClusterAnalysis(cormat=cormat)
+
+    # everything plot_results reads, so the stored stage is complete (and
+    # its key as the plot stage's input does not change once plotted)
+    for artefact in ('cophenet', 'labels', 'cluster_means', 'cormat_sorted'):
+        getattr(analysis, artefact)
+    return analysis
+
+#%%
+@netsim.profiled('plot_results')
+def plot_results(t, spike, analysis, name='run'):
 
     # get spike times
-    spike_times = []
+    trains = netsim.SpikeTrains.from_dense(spike, t)
     cmap = ['C0', 'C1', 'C2']
-    for i in range(spike.shape[0]):
-        spike_times.append(t[spike[i, :] == 1])
 
-    # compute covaraince matrix on output g
-    cormat_raw = np.corrcoef(g)
+    cormat_raw = analysis.cormat
 
     # k-means cluster cov matrix
     # X = cormat_raw
@@ -178,30 +142,21 @@ def plot_results(t, n, v, g, spike):
 
     # Agglomerative cluster cov matrix
     X = cormat_raw
-    Z = linkage(X, method='ward', optimal_ordering=True)
+    Z = analysis.linkage
 
-    c, coph_dists = cophenet(Z, pdist(X))
+    c = analysis.cophenet
     print(c)
 
-    R = dendrogram(
-        Z,
-        truncate_mode=None,
-        no_plot=True,
-    )
-
-    k = np.unique(R['color_list']).shape[0]
-    clusters = fcluster(Z, k, criterion='maxclust')
+    k = analysis.n_clusters
+    clusters = analysis.labels
     cluster_labels = clusters
     
     # print("Cluster labels: ", clusters)
     
-    XX = np.zeros((k, X.shape[1]))
-    for i in range(k):
-        XX[i, :] = np.array([
-            X[clusters == i + 1, :].mean(axis=0),
-        ])
+    XX = analysis.cluster_means
 
-    fig, ax = plt.subplots(2, 1, squeeze=False, figsize=(12, 6))
+    fig, ax = netsim.new_figure(2, 1, figsize=(12, 6),
+                                interactive=INTERACTIVE)
     im = ax.flatten()[0].imshow(XX, origin='lower', aspect='auto')
     # ax.flatten()[0].set_yticks(np.arange(0, k, 1))
     # ax.flatten()[0].set_xticks(np.arange(0, len(labels), 1))
@@ -213,49 +168,31 @@ def plot_results(t, n, v, g, spike):
                    leaf_font_size=12,
                    show_contracted=True,
                    ax=ax.flatten()[1])
-    plt.suptitle(str(c))
+    fig.suptitle(str(c))
     cbar_ax = fig.add_axes([0.91, 0.55, 0.04, 0.3])
-    plt.colorbar(im, cax=cbar_ax)
-    plt.show()
-
-    # sort g by k-means clusters and recompute cov matrix
-    # NOTE: Seems like I ought to be able to directly sort the cov matrix but I
-    # am not quite seeing how at the moment
-    sort_inds = np.argsort(cluster_labels)
-    g_sort = g[sort_inds, :]
-    v_sort = v[sort_inds, :]
-    spike_times_sort = [spike_times[i] for i in sort_inds]
-    cormat_sort = np.corrcoef(g_sort)
-
-    # plot raster and cov matrix
-    fig, ax = plt.subplots(2, 2, squeeze=False)
-    ax[0, 0].eventplot(spike_times, colors='k', lineoffsets=1, linelengths=0.75)
-    ax[1, 0].eventplot(spike_times_sort,
-                       colors='k',
-                       lineoffsets=1,
-                       linelengths=0.75)
+    fig.colorbar(im, cax=cbar_ax)
+    netsim.save_figure(fig, os.path.join(FIG_DIR, name + '_clusters.png'))
+
+    # sort by cluster; the sorted cov matrix is a permutation of cormat_raw
+    sort_inds = analysis.sort_inds
+    cormat_sort = analysis.cormat_sorted
+
+    # plot raster and cov matrix; each raster is one binned image
+    fig, ax = netsim.new_figure(2, 2, figsize=(12, 6),
+                                interactive=INTERACTIVE)
+    netsim.plot_raster(ax[0, 0], trains)
+    netsim.plot_raster(ax[1, 0], trains, order=sort_inds)
     ax[0, 1].imshow(cormat_raw, origin='lower', aspect='equal')
     ax[1, 1].imshow(cormat_sort, origin='lower', aspect='equal')
     ax[0, 0].set_xlim(0, t.max())
     ax[1, 0].set_xlim(0, t.max())
-    plt.show()
+    netsim.save_figure(fig, os.path.join(FIG_DIR, name + '_raster.png'))
+    if INTERACTIVE:
+        plt.show()
 
-    # hold useful data in a data frame for convenience in later steps
-    neuron = np.repeat(np.arange(0, n_cells, 1), n)
-    cluster = np.repeat(cluster_labels, n)
-    d = pd.DataFrame({
-        'neuron': neuron,
-        'cluster': cluster,
-        'g': g.flatten(),
-        'v': v.flatten(),
-        'spike': spike.flatten(),
-        't': np.tile(t, n_cells)
-    })
-    
-    # print(d)
-    return d
+    return [name + '_clusters.png', name + '_raster.png']
 
-    dd = d.iloc[::100, :]
+    dd = d.to_frame(every=100)
     sns.lineplot(data=dd, x='t', y='g', hue='neuron')
     plt.show()
     '''
@@ -274,9 +211,7 @@ def plot_results(t, n, v, g, spike):
                        colors=[cmap[x] for x in cluster_labels[sort_inds] - 1],
                        lineoffsets=1,
                        linelengths=0.75)
-    dd = d.groupby(['cluster', 't'])['g'].mean().reset_index()
-    dd['cluster'] = dd['cluster'].astype('category')
-    dd = dd.iloc[::100, :]
+    dd = d.cluster_frame('g', every=100)
     sns.lineplot(data=dd,
                  x='t',
                  y='g',
@@ -299,23 +234,27 @@ t = np.arange(0, T, tau)
 n = t.shape[0]
 time_params = {'tau': tau, 'T': T, 't': t, 'n': n}
 
+# NOTE: re-running a cell reuses each stored stage (simulation, clustering,
+# plots) unless its own inputs or the code changed; stored plots are not
+# drawn again, so interactive runs leave the plot stage uncached
+cache = netsim.StageCache('.netsim_cache')
+plot_cache = netsim.StageCache('.netsim_cache', enabled=not INTERACTIVE)
+
 n_cells = 10
 
 ibif = 340
 
 # NOTE: fixed input
-I = np.random.uniform(ibif, ibif + 1, (n_cells, 1))
-I = np.tile(I, n)
+I = netsim.Constant(np.random.uniform(ibif, ibif + 1, (n_cells, 1)))
 '''
-# for i in range(I.shape[0]):
-#     plt.plot(t, I[i, :])
+# for i in range(n_cells):
+#     plt.plot(t, I.block(0, n)[i, :])
 # plt.show()
 
 ## NOTE: fluctuating input (changes every 10 ms ~ 10 ms / tau ms / sample)
-# I = np.random.uniform(ibif, ibif + 1, (n_cells, int(10 / tau)))
-# I = np.repeat(I, n // I.shape[1], axis=1)
-# for i in range(I.shape[0]):
-#     plt.plot(t, I[i, :])
+# I = netsim.HeldRandom(ibif, ibif + 1, n_cells, hold=int(10 / tau))
+# for i in range(n_cells):
+#     plt.plot(t, I.block(0, n)[i, :])
 # plt.show()
 '''
 
@@ -323,25 +262,25 @@ ksyn = 2e3
 
 #%% NOTE: weakly interconnected
 p = 0.2 #fixed probability
-w = np.random.uniform(0, 1, (n_cells, n_cells))
-w = (w < p).astype(int)
-eps = np.random.uniform(0.8, 1.2, (n_cells, n_cells))
-k = (ksyn / p) * eps
-w = w * k
-t, n, v, g, spike = simulate_network(n_cells, w, I, time_params)
+w = netsim.random_weights(n_cells, p, ksyn, seed=np.random.randint(2**31))
+t, n, v, g, spike = cache.run(simulate_network, n_cells, w, I, time_params)
+analysis = cache.run(cluster_network, g)
+plot_cache.run(plot_results, t, spike, analysis, name='weak')
 
-d_weak = plot_results(t, n, v, g, spike)
+# hold useful data for later steps as views over the traces; a
+# long-format frame is only built on request (d.to_frame)
+d_weak = netsim.SimulationResults(t, analysis.labels, g=g, v=v, spike=spike)
 
 #%% set conditions: weakly interconnected (i.e. lever presses)
 '''WRONG APPROACH'''
 # Create new dataFrame n_clusters_weak with only neuron num and cluster num
 cols = ['neuron', 'cluster']
-neurons_to_clusters_weak = d_weak[cols]
+neurons_to_clusters_weak = d_weak.neuron_frame()[cols]
 # Drop neuron duplicates
 singleNeurons_to_clusters_weak = neurons_to_clusters_weak.drop_duplicates(subset = "neuron")
 
 # Create list with only clusters without duplicates
-clustersOnly_weak = d_weak["cluster"]
+clustersOnly_weak = d_weak.neuron_frame()["cluster"]
 singleClusters_weak = clustersOnly_weak.drop_duplicates()
 
 # Assign different tasks to each cluster
@@ -357,14 +296,38 @@ print(clusterNum)
 
 #%% NOTE: strongly interconnected
 p = 0.95
-w = np.random.uniform(0, 1, (n_cells, n_cells))
-w = (w < p).astype(int)
-eps = np.random.uniform(0.8, 1.2, (n_cells, n_cells))
-k = (ksyn / p) * eps
-w = w * k
-t, n, v, g, spike = simulate_network(n_cells, w, I, time_params)
+w = netsim.random_weights(n_cells, p, ksyn, seed=np.random.randint(2**31))
+t, n, v, g, spike = cache.run(simulate_network, n_cells, w, I, time_params)
+analysis = cache.run(cluster_network, g)
+plot_cache.run(plot_results, t, spike, analysis, name='strong')
 
-d_strong = plot_results(t, n, v, g, spike)
+# hold useful data for later steps as views over the traces; a
+# long-format frame is only built on request (d.to_frame)
+d_strong = netsim.SimulationResults(t, analysis.labels, g=g, v=v, spike=spike)
 
 #%% set conditions: strongly interconnected (i.e. lever presses)
 
+#%% NOTE: weak vs strong (and anything in between) as a parameter sweep
+# NOTE: n_workers=1, since a process pool needs a __main__ guard this
+# cell script does not have
+sweep = netsim.run_sweep(netsim.network_point,
+                         netsim.grid(p=[0.2, 0.95]),
+                         base={
+                             'n_cells': n_cells,
+                             'ksyn': ksyn,
+                             'ibif': ibif,
+                             'time_params': time_params
+                         },
+                         seed=0,
+                         n_workers=1)
+print(sweep)
+
+#%% NOTE: where the time goes (simulation, clustering, plotting)
+# NOTE: start from an empty analysis cache, or clustering is not measured
+netsim.ClusterAnalysis.clear_cache()
+with netsim.Profiler() as prof:
+    t, n, v, g, spike = simulate_network(n_cells, w, I, time_params)
+    analysis = cluster_network(g)
+    plot_results(t, spike, analysis, name='profile')
+print(prof.report())
+prof.save_collapsed('scratch.folded')
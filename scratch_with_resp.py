@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -9,6 +10,13 @@ from scipy.cluster.hierarchy import dendrogram, linkage
 from scipy.cluster.hierarchy import cophenet
 from scipy.spatial.distance import pdist
 from scipy.cluster.hierarchy import fcluster
+import netsim
+
+# NOTE: figures are written to FIG_DIR; with INTERACTIVE they are also
+# opened in windows and plt.show() blocks until they are closed
+INTERACTIVE = False
+FIG_DIR = 'figures'
+os.makedirs(FIG_DIR, exist_ok=True)
 '''
 TODO: Minor
 label plots and prep explanations
@@ -36,8 +44,6 @@ def simulate_network(n_cells, w, I, time_params, w_ctx_msn):
     t = time_params['t']
     n = time_params['n']
 
-    A = 1
-    t_peak = 2
     psp_amp = 1
     psp_decay = 100
 
@@ -46,22 +52,14 @@ def simulate_network(n_cells, w, I, time_params, w_ctx_msn):
     g = np.zeros((n_cells, n))
     spike = np.zeros((n_cells, n))
 
-    # hold onto sum of all presynaptic outputs
-    I_net = np.zeros((n_cells, n))
-
-    # neuron parameters
-    C = 50
-    vr = -80
-    vt = -25
-    vpeak = 40
-    k = 1
-    a = 0.01
-    b = -20
-    c = -55
-    d = 150
+    # neuron parameters (SPN)
+    iz_params = netsim.make_iz_params(n_cells, netsim.IZ_SPN)
+    iz = netsim.unpack_iz_params(iz_params)
+    w = netsim.remove_autapses(w)
 
     # init v and u
-    v[:, 0] = vr
+    state = netsim.init_state(n_cells, iz_params)
+    v[:, 0] = state['v']
 
     w_alpha = 0.1
     pr_alpha = 0.1
@@ -77,29 +75,15 @@ def simulate_network(n_cells, w, I, time_params, w_ctx_msn):
 
         dt = t[i] - t[i - 1]
 
-        # iterate through postsynaptic neurons
-        for jj in range(n_cells):
-
-            # iterate through presynaptic neurons
-            for kk in range(n_cells):
-                if jj != kk:
-                    I_net[jj, i - 1] += w[kk, jj] * g[kk, i - 1]
+        # advance every neuron at once; ctx input is scaled by w_ctx_msn
+        I_ctx = w_ctx_msn[:, i - 1] * I.block(i - 1, i)[:, 0]
+        fired = netsim.step(state, I_ctx, w, iz, dt, psp_amp, psp_decay)
 
-            dvdt = (k * (v[jj, i - 1] - vr) *
-                    (v[jj, i - 1] - vt) - u[jj, i - 1] - I_net[jj, i - 1] +
-                    w_ctx_msn[jj, i - 1] * I[jj, i - 1]) / C
-            dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
-            dgdt = (-g[jj, i - 1] + psp_amp * spike[jj, i - 1]) / psp_decay
-
-            v[jj, i] = v[jj, i - 1] + dvdt * dt
-            u[jj, i] = u[jj, i - 1] + dudt * dt
-            g[jj, i] = g[jj, i - 1] + dgdt * dt
-
-            if v[jj, i] >= vpeak:
-                v[jj, i - 1] = vpeak
-                v[jj, i] = c
-                u[jj, i] = u[jj, i] + d
-                spike[jj, i] = 1
+        v[fired, i - 1] = iz['vpeak'][fired]
+        v[:, i] = state['v']
+        u[:, i] = state['u']
+        g[:, i] = state['g']
+        spike[:, i] = state['spike']
 
         # TODO:
         # determine if the lever was pressed or not
@@ -141,16 +125,16 @@ def simulate_network(n_cells, w, I, time_params, w_ctx_msn):
     return t, n, v, g, spike, w_ctx_msn, resp, r_obtained, r_predicted, rpe
 
 
-def plot_results(t, n, v, g, spike):
+@netsim.profiled('plot_results')
+def plot_results(t, n, v, g, spike, name='run'):
 
     # get spike times
-    spike_times = []
+    trains = netsim.SpikeTrains.from_dense(spike, t)
     cmap = ['C0', 'C1', 'C2']
-    for i in range(spike.shape[0]):
-        spike_times.append(t[spike[i, :] == 1])
 
     # compute covaraince matrix on output g
-    cormat_raw = np.corrcoef(g)
+    analysis = netsim.ClusterAnalysis.of(g, optimal_ordering=False)
+    cormat_raw = analysis.cormat
 
     # k-means cluster cov matrix
     # X = cormat_raw
@@ -159,28 +143,19 @@ def plot_results(t, n, v, g, spike):
 
     # Agglomerative cluster cov matrix
     X = cormat_raw
-    Z = linkage(X, method='ward')
+    Z = analysis.linkage
 
-    c, coph_dists = cophenet(Z, pdist(X))
+    c = analysis.cophenet
     print(c)
 
-    R = dendrogram(
-        Z,
-        truncate_mode=None,
-        no_plot=True,
-    )
-
-    k = np.unique(R['color_list']).shape[0]
-    clusters = fcluster(Z, k, criterion='maxclust')
+    k = analysis.n_clusters
+    clusters = analysis.labels
     cluster_labels = clusters
 
-    XX = np.zeros((k, X.shape[1]))
-    for i in range(k):
-        XX[i, :] = np.array([
-            X[clusters == i + 1, :].mean(axis=0),
-        ])
+    XX = analysis.cluster_means
 
-    fig, ax = plt.subplots(2, 1, squeeze=False, figsize=(12, 6))
+    fig, ax = netsim.new_figure(2, 1, figsize=(12, 6),
+                                interactive=INTERACTIVE)
     im = ax.flatten()[0].imshow(XX, origin='lower', aspect='auto')
     # ax.flatten()[0].set_yticks(np.arange(0, k, 1))
     # ax.flatten()[0].set_xticks(np.arange(0, len(labels), 1))
@@ -191,44 +166,32 @@ def plot_results(t, n, v, g, spike):
                    leaf_font_size=12,
                    show_contracted=True,
                    ax=ax.flatten()[1])
-    plt.suptitle(str(c))
+    fig.suptitle(str(c))
     cbar_ax = fig.add_axes([0.91, 0.55, 0.04, 0.3])
-    plt.colorbar(im, cax=cbar_ax)
-    plt.show()
+    fig.colorbar(im, cax=cbar_ax)
+    netsim.save_figure(fig, os.path.join(FIG_DIR, name + '_clusters.png'))
 
-    # sort g by k-means clusters and recompute cov matrix
-    # NOTE: Seems like I ought to be able to directly sort the cov matrix but I
-    # am not quite seeing how at the moment
-    sort_inds = np.argsort(cluster_labels)
+    # sort g by cluster; the sorted cov matrix is a permutation of cormat_raw
+    sort_inds = analysis.sort_inds
     g_sort = g[sort_inds, :]
     v_sort = v[sort_inds, :]
-    spike_times_sort = [spike_times[i] for i in sort_inds]
-    cormat_sort = np.corrcoef(g_sort)
-
-    # plot raster and cov matrix
-    fig, ax = plt.subplots(2, 2, squeeze=False)
-    ax[0, 0].eventplot(spike_times, colors='k', lineoffsets=1, linelengths=0.1)
-    ax[1, 0].eventplot(spike_times_sort,
-                       colors='k',
-                       lineoffsets=1,
-                       linelengths=0.1)
+    cormat_sort = analysis.cormat_sorted
+
+    # plot raster and cov matrix; each raster is one binned image
+    fig, ax = netsim.new_figure(2, 2, figsize=(12, 6),
+                                interactive=INTERACTIVE)
+    netsim.plot_raster(ax[0, 0], trains)
+    netsim.plot_raster(ax[1, 0], trains, order=sort_inds)
     ax[0, 1].imshow(cormat_raw, origin='lower', aspect='equal')
     ax[1, 1].imshow(cormat_sort, origin='lower', aspect='equal')
     ax[0, 0].set_xlim(0, t.max())
     ax[1, 0].set_xlim(0, t.max())
-    plt.show()
+    netsim.save_figure(fig, os.path.join(FIG_DIR, name + '_raster.png'))
 
-    # hold useful data in a data frame for convenience in later steps
-    neuron = np.repeat(np.arange(0, n_cells, 1), n)
-    cluster = np.repeat(cluster_labels, n)
-    d = pd.DataFrame({
-        'neuron': neuron,
-        'cluster': cluster,
-        'g': g.flatten(),
-        'spike': spike.flatten(),
-        't': np.tile(t, n_cells)
-    })
-    # dd = d.iloc[::100, :]
+    # hold useful data for later steps as views over the traces; a
+    # long-format frame is only built on request (d.to_frame)
+    d = netsim.SimulationResults(t, cluster_labels, g=g, spike=spike)
+    # dd = d.to_frame(every=100)
     # sns.lineplot(data=dd, x='t', y='g', hue='neuron')
     # plt.show()
 
@@ -241,29 +204,21 @@ def plot_results(t, n, v, g, spike):
     # plt.show()
 
     # figure 5
-    fig, ax = plt.subplots(2, 2, squeeze=False)
-    cmap = ['C{}'.format(i) for i in range(np.unique(cluster_labels).shape[0])]
-    ax[0, 0].eventplot(spike_times_sort,
-                       colors=[cmap[x] for x in cluster_labels[sort_inds] - 1],
-                       lineoffsets=1,
-                       linelengths=0.1)
-    dd = d.groupby(['cluster', 't'])['g'].mean().reset_index()
-    dd['cluster'] = dd['cluster'].astype('category')
-    dd = dd.iloc[::100, :]
-    sns.lineplot(data=dd,
-                 x='t',
-                 y='g',
-                 hue='cluster',
-                 legend=None,
-                 ax=ax[1, 0])
+    fig, ax = netsim.new_figure(2, 2, figsize=(12, 6),
+                                interactive=INTERACTIVE)
+    netsim.plot_raster(ax[0, 0], trains, order=sort_inds)
+    ids, means = d.cluster_means('g')
+    for i, cl in enumerate(ids):
+        netsim.plot_trace(ax[1, 0], t, means[i], color='C{}'.format(i))
     ax[0, 1].imshow(cormat_sort, origin='lower', aspect='equal')
     gg = g[:, ::100]
     ptm = np.dot(gg.T, gg)
     ax[1, 1].imshow(ptm, origin='lower', aspect='equal')
     ax[0, 0].set_xlim(0, t.max())
     ax[1, 0].set_xlim(0, t.max())
-    plt.show()
-
+    netsim.save_figure(fig, os.path.join(FIG_DIR, name + '_summary.png'))
+    if INTERACTIVE:
+        plt.show()
 
 tau = 0.1
 T = 1000
@@ -275,17 +230,15 @@ n_cells = 5
 
 # NOTE: Input --- off for 1s, on for 1s, off for 1s
 ibif = 325
-II = np.hstack((np.zeros((n_cells, int(
-    (T // 3) / tau))), np.ones((n_cells, int(
-        (T // 3) / tau))), np.zeros((n_cells, int((T // 3) / tau)))))
-II = np.tile(II, n // II.shape[1])
-I = np.zeros((n_cells, t.shape[0]))
-I[:, 0:II.shape[1]] = II
-for i in range(I.shape[0]):
-    plt.plot(t, I[i, :])
-plt.show()
-
-w_ctx_msn = np.random.normal(1, 0.1, I.shape)
+third = int((T // 3) / tau)
+I = netsim.Piecewise([third, 2 * third], [1, 0])
+fig, ax = netsim.new_figure(interactive=INTERACTIVE)
+netsim.plot_trace(ax[0, 0], t, I.block(0, n)[0, :])
+netsim.save_figure(fig, os.path.join(FIG_DIR, 'input.png'))
+if INTERACTIVE:
+    plt.show()
+
+w_ctx_msn = np.random.normal(1, 0.1, (n_cells, n))
 
 # NOTE: weakly interconnected
 p = 0.15
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from netsim import bench
+
+
+def _record(case, seconds):
+    return {
+        'case': case,
+        'seconds': seconds,
+        'neuron_steps_per_s': 1e6 / seconds,
+        'peak_mb': 1.0,
+    }
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = [
+        _record('slower', 1.0),
+        _record('noise', 1.0),
+        _record('faster', 1.0),
+        _record('dropped', 1.0),
+    ]
+    records = [
+        _record('slower', 1.5),
+        _record('noise', 1.1),
+        _record('faster', 0.5),
+        _record('new', 1.0),
+    ]
+    table = bench.compare(records, baseline, tolerance=0.2).set_index('case')
+    assert sorted(table.index) == ['faster', 'noise', 'slower']
+    assert table.loc['slower', 'regression']
+    assert not table.loc['noise', 'regression']
+    assert not table.loc['faster', 'regression']
+    assert table.loc['faster', 'speedup'] == pytest.approx(2.0)
+
+    # a tighter tolerance catches the smaller slowdown too
+    table = bench.compare(records, baseline, tolerance=0.05)
+    assert table.set_index('case').loc['noise', 'regression']
+
+
+def test_results_round_trip(tmp_path):
+    records = bench.run_suite([('tan_cell', bench.grid(T=[20]))], repeat=1)
+    path = str(tmp_path / 'bench.json')
+    bench.save_results(path, records)
+    loaded = bench.load_results(path)
+    assert loaded == records
+
+    table = bench.compare(loaded, records)
+    np.testing.assert_allclose(table['speedup'], 1.0)
+    assert not table['regression'].any()
+
+
+def test_learning_counts_simulated_steps():
+    time_params = bench.time_grid(50, 0.1)
+    n_cells, n_steps = bench.learning(bench.StageTimer(),
+                                      np.random.default_rng(0),
+                                      n_simulations=2, n_trials=1, T=50)
+    # three trials, of which trial 0 is the initial state
+    assert n_cells == 2 * 3
+    assert n_steps == 2 * (time_params['n'] - 1)
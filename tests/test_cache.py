@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def _time_params(T, tau=0.1):
+    t = np.arange(0, T, tau)
+    return {'tau': tau, 'T': T, 't': t, 'n': t.shape[0]}
+
+
+def simulate(n_cells, w, I, time_params):
+    return netsim.simulate_network(n_cells, w, I, time_params)
+
+
+def cluster(g):
+    return netsim.ClusterAnalysis(cormat=np.corrcoef(g)).labels
+
+
+def plot(t, spike, labels, n_bins):
+    trains = netsim.SpikeTrains.from_dense(spike, t)
+    return netsim.raster_image(trains, n_bins, order=np.argsort(labels))
+
+
+@pytest.fixture
+def network_calls(monkeypatch):
+    calls = []
+    network = netsim.simulate_network
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return network(*args, **kwargs)
+
+    monkeypatch.setattr(netsim, 'simulate_network', counted)
+    return calls
+
+
+def test_changed_plot_argument_reuses_upstream_stages(tmp_path,
+                                                      network_calls):
+    cache = netsim.StageCache(str(tmp_path))
+    n_cells = 6
+    w = netsim.random_weights(n_cells, 0.5, 2e3, seed=0)
+    rng = np.random.default_rng(0)
+    I = netsim.Constant(rng.uniform(340, 341, (n_cells, 1)))
+    time_params = _time_params(1000)
+
+    images = []
+    for n_bins in (50, 50, 80):
+        t, n, v, g, spike = cache.run(simulate, n_cells, w, I, time_params)
+        labels = cache.run(cluster, g)
+        images.append(cache.run(plot, t, spike, labels, n_bins))
+
+    assert len(network_calls) == 1
+    # simulation, clustering and the two plots
+    assert len(cache.entries()) == 4
+    np.testing.assert_array_equal(images[0], images[1])
+    assert images[2].shape == (n_cells, 80)
+
+    # a changed simulation input runs everything again
+    cache.run(simulate, n_cells, 2 * w, I, time_params)
+    assert len(network_calls) == 2
+
+
+def test_eviction_keeps_directory_under_bound(tmp_path):
+    entry = np.zeros(1000)
+    cache = netsim.StageCache(str(tmp_path), max_bytes=3.5 * entry.nbytes)
+    for i in range(10):
+        cache.put(str(i), entry)
+        assert cache.nbytes <= cache.max_bytes
+        assert str(i) in cache
+    assert len(cache.entries()) == 3
+    assert cache.nbytes > 0
+
+    cache.evict(0)
+    assert cache.entries() == []
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+import netsim
+import netsim.experiment
+import netsim.runner
+
+
+def _time_params(T=100, tau=0.1):
+    t = np.arange(0, T, tau)
+    return {'tau': tau, 'T': T, 't': t, 'n': t.shape[0]}
+
+
+def _params(n_trials=5):
+    params = netsim.default_learning_params()
+    for phase in ('acquisition', 'extinction', 'reacquisition'):
+        params['n_trials_' + phase] = n_trials
+    return params
+
+
+# long enough for the cells to fire, so the weights move every trial and a
+# wrong resume shows in w_rec as well as in the draws
+RESUME_T = 1000
+
+
+def _run(path=None):
+    return netsim.run_reward_learning(2, _time_params(RESUME_T), _params(),
+                                      np.random.default_rng(5),
+                                      checkpoint=path, checkpoint_every=2)
+
+
+@pytest.fixture(scope='module')
+def uninterrupted():
+    return _run()
+
+
+def _kill_at(monkeypatch, trial):
+    '''Interrupt run_reward_learning during trial, before its update.'''
+    update = netsim.experiment._learning_update
+
+    def killed(saved, trl, *args):
+        if trl == trial:
+            raise KeyboardInterrupt
+        return update(saved, trl, *args)
+
+    monkeypatch.setattr(netsim.experiment, '_learning_update', killed)
+
+
+def _assert_same(res, expected):
+    for key in ('obtained_reward', 'predicted_reward', 'delta', 'response',
+                'motor_act_rec', 'w_rec_d1', 'w_rec_d2', 'v', 'g'):
+        np.testing.assert_array_equal(res[key], expected[key], err_msg=key)
+    assert res['n_trials_run'] == expected['n_trials_run']
+
+
+# saved after trials 1, 3, 5, ... (checkpoint_every=2)
+@pytest.mark.parametrize('kill, saved', [(3, 1), (7, 5), (12, 11)])
+def test_resume_is_bit_exact(tmp_path, monkeypatch, uninterrupted, kill,
+                             saved):
+    path = str(tmp_path / 'learning.npz')
+    assert np.ptp(uninterrupted['w_rec_d1']) > 0
+
+    with monkeypatch.context() as m:
+        _kill_at(m, kill)
+        with pytest.raises(KeyboardInterrupt):
+            _run(path)
+    _, meta = netsim.load_checkpoint(path)
+    assert meta['trial'] == saved
+
+    _assert_same(_run(path), uninterrupted)
+    assert not (tmp_path / 'learning.npz').exists()
+
+
+def test_checkpoint_of_other_stopping_is_rejected(tmp_path, monkeypatch):
+    path = str(tmp_path / 'learning.npz')
+    time_params = _time_params()
+    params = _params()
+    # never fires, so the run gets to the interrupt
+    stopping = [netsim.WeightConvergence(tol=0, window=3)]
+
+    with monkeypatch.context() as m:
+        _kill_at(m, 6)
+        with pytest.raises(KeyboardInterrupt):
+            netsim.run_reward_learning(2, time_params, params,
+                                       np.random.default_rng(0),
+                                       checkpoint=path, checkpoint_every=1,
+                                       stopping=stopping)
+
+    rng = np.random.default_rng(1)
+    state = rng.bit_generator.state
+    other = [netsim.WeightConvergence(tol=1e-3, window=3)]
+    with pytest.raises(ValueError, match='different experiment'):
+        netsim.run_reward_learning(2, time_params, params, rng,
+                                   checkpoint=path, stopping=other)
+    assert rng.bit_generator.state == state
+
+
+def test_pool_forwards_checkpoint_settings(tmp_path, monkeypatch):
+    calls = []
+    run = netsim.runner.run_reward_learning
+
+    def recorded(*args, **kwargs):
+        calls.append(kwargs)
+        return run(*args, **kwargs)
+
+    monkeypatch.setattr(netsim.runner, 'run_reward_learning', recorded)
+    netsim.run_reward_learning_pool(3, _time_params(), _params(3), seed=0,
+                                    n_workers=1, sims_per_unit=2,
+                                    checkpoint_dir=str(tmp_path),
+                                    checkpoint_every=4,
+                                    checkpoint_seconds=30.0)
+    assert len(calls) == 2
+    for kwargs in calls:
+        assert kwargs['checkpoint_every'] == 4
+        assert kwargs['checkpoint_seconds'] == 30.0
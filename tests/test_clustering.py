@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def _planted(n_clusters=4, size=60, m=2000, seed=0):
+    '''
+    Traces that follow one of n_clusters shared signals plus private noise,
+    with per-neuron gain and offset, in shuffled order.
+    '''
+    rng = np.random.default_rng(seed)
+    shared = np.cumsum(rng.normal(size=(n_clusters, m)), axis=1)
+    labels = np.repeat(np.arange(n_clusters), size)
+    noise = rng.normal(scale=5.0, size=(labels.shape[0], m))
+    gain = rng.uniform(0.5, 2, (labels.shape[0], 1))
+    offset = rng.uniform(0, 100, (labels.shape[0], 1))
+    g = gain * (shared[labels] + noise) + offset
+    order = rng.permutation(labels.shape[0])
+    return g[order], labels[order]
+
+
+def _same_partition(a, b):
+    '''True if labels a and b group the neurons identically.'''
+    pairs = np.unique(np.stack([a, b]), axis=1)
+    return (pairs.shape[1] == np.unique(a).shape[0] == np.unique(b).shape[0])
+
+
+@pytest.mark.parametrize('options', [
+    dict(method='spectral', n_clusters=4),
+    dict(method='spectral', n_clusters=4, block_rows=50, every=3),
+    dict(method='spectral'),
+    dict(method='minibatch', n_clusters=4),
+])
+def test_cluster_traces_recovers_planted_clusters(options):
+    g, planted = _planted()
+    labels = netsim.cluster_traces(g, seed=0, **options)
+    assert labels.shape == planted.shape
+    np.testing.assert_array_equal(np.unique(labels), np.arange(1, 5))
+    assert _same_partition(labels, planted)
+
+
+def test_minibatch_needs_n_clusters():
+    g, _ = _planted(n_clusters=2, size=10, m=100)
+    with pytest.raises(ValueError, match='n_clusters'):
+        netsim.cluster_traces(g, method='minibatch')
+
+
+def test_membership_matrix_gives_cluster_means():
+    g, planted = _planted(n_clusters=3, size=5, m=50)
+    ids, M = netsim.membership_matrix(planted + 1)
+    np.testing.assert_array_equal(ids, [1, 2, 3])
+    expected = np.stack([g[planted == c].mean(0) for c in range(3)])
+    np.testing.assert_allclose(M @ g, expected)
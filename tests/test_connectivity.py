@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+@pytest.mark.parametrize('block_rows', [1, 7, 64, 100, 1024])
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_random_weights_independent_of_blocks(block_rows, n_workers):
+    expected = netsim.random_weights(300, 0.1, 2e3, seed=3, sparse=False)
+    w = netsim.random_weights(300, 0.1, 2e3, seed=3, sparse=False,
+                              block_rows=block_rows, n_workers=n_workers)
+    np.testing.assert_array_equal(w, expected)
+
+
+def test_weight_block_rebuilds_rows():
+    w = netsim.random_weights(300, 0.1, 2e3, seed=3, sparse=True,
+                              block_rows=100)
+    block = netsim.weight_block(2, 300, 0.1, 2e3, seed=3, block_rows=100)
+    np.testing.assert_array_equal(block.toarray(), w[200:].toarray())
+
+
+def test_random_weights_distribution():
+    p, ksyn = 0.2, 2e3
+    w = netsim.random_weights(500, p, ksyn, seed=0, sparse=False)
+    nonzero = w[w > 0]
+    assert abs(nonzero.shape[0] / w.size - p) < 0.01
+    assert nonzero.min() >= 0.8 * ksyn / p
+    assert nonzero.max() <= 1.2 * ksyn / p
+    assert not np.array_equal(
+        w, netsim.random_weights(500, p, ksyn, seed=1, sparse=False))
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def _signals(n_signals=6, m=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    mix = rng.normal(size=(n_signals, n_signals))
+    X = mix @ rng.normal(size=(n_signals, m))
+    # a large, slowly varying offset, as in g, where sum / sum-of-squares
+    # would lose most of its digits
+    X += 1e6 + np.linspace(0, 50, m)
+    return X
+
+
+def _split(m, seed=1):
+    '''Uneven block boundaries over m samples, with an empty block.'''
+    cuts = np.sort(np.random.default_rng(seed).choice(m, 8, replace=False))
+    return np.concatenate(([0, 0], cuts, [m]))
+
+
+def test_update_in_blocks_matches_numpy():
+    X = _signals()
+    acc = netsim.OnlineCovariance(X.shape[0])
+    edges = _split(X.shape[1])
+    for i0, i1 in zip(edges[:-1], edges[1:]):
+        acc.update(X[:, i0:i1])
+    assert acc.n == X.shape[1]
+    np.testing.assert_allclose(acc.mean, X.mean(1), rtol=1e-12)
+    np.testing.assert_allclose(acc.cov(), np.cov(X), rtol=1e-9)
+    np.testing.assert_allclose(acc.corr(), np.corrcoef(X), atol=1e-9)
+
+
+def test_merged_accumulators_match_numpy():
+    X = _signals()
+    edges = _split(X.shape[1])
+    parts = []
+    for i0, i1 in zip(edges[:-1], edges[1:]):
+        part = netsim.OnlineCovariance(X.shape[0])
+        part.update(X[:, i0:i1])
+        parts.append(part)
+
+    # merge pairwise, as independent workers would be combined
+    while len(parts) > 1:
+        merged = []
+        for a, b in zip(parts[::2], parts[1::2]):
+            a.merge(b)
+            merged.append(a)
+        parts = merged + parts[len(merged) * 2:]
+    acc = parts[0]
+    assert acc.n == X.shape[1]
+    np.testing.assert_allclose(acc.cov(), np.cov(X), rtol=1e-9)
+    np.testing.assert_allclose(acc.corr(), np.corrcoef(X), atol=1e-9)
+
+
+def test_flat_signal_gives_nan_row():
+    X = _signals(n_signals=4, m=1000)
+    X[2] = 3.0
+    acc = netsim.OnlineCovariance(4)
+    acc.update(X[:, :400])
+    acc.update(X[:, 400:])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = np.corrcoef(X)
+    c = acc.corr()
+    np.testing.assert_array_equal(np.isnan(c), np.isnan(expected))
+    keep = ~np.isnan(expected)
+    np.testing.assert_allclose(c[keep], expected[keep], atol=1e-9)
+
+
+@pytest.mark.parametrize('block_size', [300, 700, 5000])
+def test_monitor_matches_full_trace(block_size):
+    t = np.arange(0, 300, 0.1)
+    time_params = {'tau': 0.1, 'T': 300, 't': t, 'n': t.shape[0]}
+    rng = np.random.default_rng(0)
+    w = netsim.random_weights(6, 0.5, 2e3, seed=0)
+    I = rng.uniform(590, 610, (6, 1))
+    g = netsim.simulate_network(6, w, I, time_params, backend='numpy')[3]
+
+    window = 400
+    monitor = netsim.CorrelationMonitor('g', window=window)
+    netsim.run_network(6, w, I, time_params, monitors=[monitor],
+                       backend='numpy', block_size=block_size)
+    np.testing.assert_allclose(monitor.corr, np.corrcoef(g), atol=1e-9)
+
+    n_windows = t.shape[0] // window
+    assert monitor.windows.shape == (n_windows, 6, 6)
+    np.testing.assert_array_equal(monitor.window_t, t[::window][:n_windows])
+    for k in range(n_windows):
+        x = g[:, k * window:(k + 1) * window]
+        # g is flat until a cell first fires, so early windows have nan rows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = np.corrcoef(x)
+        np.testing.assert_allclose(monitor.windows[k], expected, atol=1e-9)
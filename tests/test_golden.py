@@ -0,0 +1,72 @@
+import functools
+import os
+
+import pytest
+
+import netsim
+from netsim.golden import exact_tolerances
+
+GOLDEN = os.path.join(os.path.dirname(__file__), 'golden.npz')
+
+needs_numba = pytest.mark.skipif(not netsim.HAVE_NUMBA,
+                                 reason='numba not installed')
+
+
+@pytest.mark.parametrize('options', [
+    {'backend': 'numpy'},
+    pytest.param({'backend': 'numba'}, marks=needs_numba),
+    {'sparse': False},
+    {'sparse': True},
+    {'synapses': 'euler'},
+    {'backend': 'numpy', 'sparse': True},
+],
+                         ids=repr)
+def test_backend_reproduces_golden(options):
+    netsim.assert_golden(
+        GOLDEN, network=functools.partial(netsim.simulate_network, **options))
+
+
+@pytest.mark.parametrize('backend', [
+    'numpy',
+    pytest.param('numba', marks=needs_numba),
+])
+def test_exact_synapses_reproduce_golden(backend):
+    network = functools.partial(netsim.simulate_network, backend=backend,
+                                synapses='exact')
+    netsim.assert_golden(GOLDEN, network=network,
+                         tolerances=exact_tolerances())
+
+
+@pytest.mark.parametrize('options', [
+    {'psp_decay': 110},
+    {'psp_amp': 1.02},
+],
+                         ids=repr)
+def test_perturbed_network_fails(options):
+    network = functools.partial(netsim.simulate_network, **options)
+    with pytest.raises(AssertionError, match='scratch_'):
+        netsim.assert_golden(GOLDEN, network=network)
+    # even the looser tolerances of the exact synapses reject it
+    with pytest.raises(AssertionError, match='scratch_'):
+        netsim.assert_golden(GOLDEN, network=network,
+                             tolerances=exact_tolerances())
+
+
+def test_perturbed_learning_rule_fails():
+
+    def learning(n_simulations, time_params, params, rng):
+        params['alpha_d1'] *= 1.1
+        return netsim.run_reward_learning(n_simulations, time_params, params,
+                                          rng)
+
+    with pytest.raises(AssertionError, match='weight_error'):
+        netsim.assert_golden(GOLDEN, learning=learning)
+
+
+def test_changed_clusters_fail():
+
+    def network(n_cells, w, *args, **kwargs):
+        return netsim.simulate_network(n_cells, 1.5 * w, *args, **kwargs)
+
+    with pytest.raises(AssertionError, match='label_match'):
+        netsim.assert_golden(GOLDEN, network=network)
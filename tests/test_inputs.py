@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def test_time_course_is_shared_across_cells():
+    n = 50
+    I = np.linspace(0, 1, n)
+    source = netsim.as_input(I, n_cells=3, n=n)
+    assert isinstance(source, netsim.ArrayInput)
+    np.testing.assert_array_equal(
+        np.broadcast_to(source.block(10, 20), (3, 10)),
+        np.tile(I[10:20], (3, 1)))
+    # one value per cell still wins when the length is n_cells
+    assert isinstance(netsim.as_input(np.ones(3), n_cells=3, n=n),
+                      netsim.Constant)
+
+
+def test_mismatched_vector_names_expected_shapes():
+    with pytest.raises(ValueError, match=r'\(1, 50\)'):
+        netsim.as_input(np.ones(7), n_cells=3, n=50)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def _setup(n_cells=8, T=300, tau=0.1):
+    t = np.arange(0, T, tau)
+    time_params = {'tau': tau, 'T': T, 't': t, 'n': t.shape[0]}
+    w = netsim.random_weights(n_cells, 0.5, 2e3, seed=0)
+    I = np.random.default_rng(0).uniform(590, 610, (n_cells, 1))
+    return w, I, time_params
+
+
+def _monitors():
+    return [
+        netsim.StateMonitor(('v', 'u', 'g', 'spike')),
+        netsim.StateMonitor(('v', 'g'), neurons=[1, 4, 6], every=7),
+        netsim.SummaryMonitor(('v', 'g', 'spike')),
+        netsim.SpikeMonitor(neurons=[0, 2, 3]),
+    ]
+
+
+def _run(block_size):
+    w, I, time_params = _setup()
+    monitors = _monitors()
+    netsim.run_network(w.shape[0], w, I, time_params, monitors,
+                       backend='numpy', block_size=block_size)
+    return monitors
+
+
+@pytest.fixture(scope='module')
+def single_block():
+    n = _setup()[2]['n']
+    return _run(n)
+
+
+# n = 3000 steps: none of these divide n - 1, and 1 leaves every block a
+# single step
+@pytest.mark.parametrize('block_size', [1, 7, 333, 1000, 2998])
+def test_blocks_match_single_block(single_block, block_size):
+    full, decimated, summary, spikes = _run(block_size)
+    ref_full, ref_decimated, ref_summary, ref_spikes = single_block
+
+    for var in full.variables:
+        np.testing.assert_array_equal(full[var], ref_full[var], err_msg=var)
+    np.testing.assert_array_equal(decimated.t, ref_decimated.t)
+    for var in decimated.variables:
+        np.testing.assert_array_equal(decimated[var], ref_decimated[var],
+                                      err_msg=var)
+    for var in summary.variables:
+        np.testing.assert_allclose(summary.sum[var], ref_summary.sum[var],
+                                   rtol=1e-12, err_msg=var)
+        np.testing.assert_array_equal(summary.max[var], ref_summary.max[var],
+                                      err_msg=var)
+    np.testing.assert_array_equal(spikes.trains.to_dense(),
+                                  ref_spikes.trains.to_dense())
+
+
+def test_single_block_matches_simulate_network(single_block):
+    w, I, time_params = _setup()
+    _, _, v, g, spike = netsim.simulate_network(w.shape[0], w, I, time_params,
+                                                backend='numpy')
+    full, decimated, summary, spikes = single_block
+    assert spike.sum() > 0
+    np.testing.assert_array_equal(full['v'], v)
+    np.testing.assert_array_equal(full['g'], g)
+    np.testing.assert_array_equal(full['spike'], spike)
+    np.testing.assert_array_equal(decimated['g'], g[[1, 4, 6], ::7])
+    np.testing.assert_allclose(summary.sum['g'], g.sum(1), rtol=1e-12)
+    np.testing.assert_array_equal(summary.spike_counts, spike.sum(1))
+    np.testing.assert_array_equal(summary.max['v'], v.max(1))
+    np.testing.assert_array_equal(spikes.trains.to_dense(), spike[[0, 2, 3]])
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def _spiky(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 0.1
+    y = np.sin(t / 50) + 0.01 * rng.standard_normal(n)
+    # narrow peaks and troughs that a stride would step over
+    y[rng.choice(n, 5, replace=False)] = 10
+    y[rng.choice(n, 5, replace=False)] = -10
+    return t, y
+
+
+@pytest.mark.parametrize('n_out', [3, 100, 2000])
+def test_lttb_keeps_endpoints_and_length(n_out):
+    t, y = _spiky(50000)
+    idx = netsim.lttb(t, y, n_out)
+    assert idx.shape == (n_out,)
+    assert idx[0] == 0
+    assert idx[-1] == t.shape[0] - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_extrema():
+    t, y = _spiky(50000)
+    idx = set(netsim.lttb(t, y, 500).tolist())
+    assert set(np.flatnonzero(y == y.max())) <= idx
+    assert set(np.flatnonzero(y == y.min())) <= idx
+
+
+def test_lttb_short_input_is_unchanged():
+    t, y = _spiky(50)
+    np.testing.assert_array_equal(netsim.lttb(t, y, 100), np.arange(50))
+
+
+def _trains(n_cells=7, n=10000, seed=0):
+    rng = np.random.default_rng(seed)
+    spike = (rng.random((n_cells, n)) < 0.01).astype(float)
+    return netsim.SpikeTrains.from_dense(spike, np.arange(n) * 0.1)
+
+
+@pytest.mark.parametrize('n_bins', [1, 37, 2000, 10000])
+def test_raster_image_counts_every_spike(n_bins):
+    trains = _trains()
+    img = netsim.raster_image(trains, n_bins=n_bins)
+    assert img.shape == (trains.n_cells, n_bins)
+    np.testing.assert_array_equal(img.sum(1), trains.counts())
+    assert img.sum() == trains.steps.shape[0]
+
+
+def test_raster_image_rows_follow_order():
+    trains = _trains()
+    order = np.random.default_rng(1).permutation(trains.n_cells)
+    img = netsim.raster_image(trains, n_bins=100, order=order)
+    np.testing.assert_array_equal(img.sum(1), trains.counts()[order])
+    np.testing.assert_array_equal(
+        img, netsim.raster_image(trains, n_bins=100)[order])
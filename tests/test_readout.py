@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import netsim
+
+
+def _traces(n_cells=30, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    g = np.cumsum(rng.normal(size=(n_cells, n)), axis=1)
+    labels = rng.integers(1, 5, n_cells)
+    # a label that is missing from 1 .. 5
+    labels[labels == 3] = 5
+    return g, labels, np.arange(n) * 0.1
+
+
+def _dense_responses(g, labels, thresh):
+    '''The per-cluster loop of the original scripts.'''
+    resp = []
+    for cl in np.unique(labels):
+        resp.append(np.mean(g[labels == cl, :], axis=0) > thresh)
+    return np.array(resp, dtype=float)
+
+
+@pytest.mark.parametrize('thresh', [0.0, 5.0, -5.0])
+def test_detect_matches_dense_threshold(thresh):
+    g, labels, t = _traces()
+    readout = netsim.ClusterReadout(labels, thresh)
+    responses = readout.detect(g, t)
+    expected = _dense_responses(g, labels, thresh)
+    assert expected.any() and not expected.all()
+    assert responses.n_cells == 4
+    np.testing.assert_array_equal(responses.to_dense(), expected)
+
+
+def test_detect_with_weights_and_channel_thresholds():
+    g, labels, t = _traces()
+    means = np.stack([g[labels == cl].mean(0) for cl in np.unique(labels)])
+    weights = np.array([[1., 1., 0., 0.], [0., 0.5, 0., -1.]])
+    thresh = np.array([2.0, -1.0])
+    readout = netsim.ClusterReadout(labels, thresh, weights=weights)
+    expected = (weights @ means > thresh[:, None]).astype(float)
+    np.testing.assert_array_equal(readout.detect(g, t).to_dense(), expected)
+
+
+def test_monitor_matches_detect():
+    t = np.arange(0, 300, 0.1)
+    time_params = {'tau': 0.1, 'T': 300, 't': t, 'n': t.shape[0]}
+    rng = np.random.default_rng(0)
+    w = netsim.random_weights(12, 0.5, 2e3, seed=0)
+    I = rng.uniform(590, 610, (12, 1))
+    g = netsim.simulate_network(12, w, I, time_params, backend='numpy')[3]
+    labels = np.repeat([1, 2, 3], 4)
+    thresh = np.median(g[g > 0])
+
+    readout = netsim.ClusterReadout(labels, thresh)
+    netsim.run_network(12, w, I, time_params, monitors=[readout],
+                       backend='numpy', block_size=700)
+    expected = _dense_responses(g, labels, thresh)
+    assert expected.any()
+    np.testing.assert_array_equal(readout.responses.to_dense(), expected)
+    np.testing.assert_array_equal(readout.detect(g, t).to_dense(), expected)
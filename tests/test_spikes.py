@@ -0,0 +1,61 @@
+import numpy as np
+
+import netsim
+
+
+def _dense(n_cells=8, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    spike = (rng.random((n_cells, n)) < 0.01).astype(float)
+    # a silent neuron and one firing on the first and last step
+    spike[2] = 0
+    spike[5, [0, n - 1]] = 1
+    return spike, np.arange(n) * 0.1
+
+
+def test_dense_round_trip():
+    spike, t = _dense()
+    trains = netsim.SpikeTrains.from_dense(spike, t)
+    assert trains.n_cells == spike.shape[0]
+    assert len(trains) == spike.sum()
+    np.testing.assert_array_equal(trains.to_dense(), spike)
+    np.testing.assert_array_equal(trains.counts(), spike.sum(1))
+
+
+def test_from_events_in_any_order():
+    spike, t = _dense()
+    neurons, steps = np.nonzero(spike)
+    shuffle = np.random.default_rng(1).permutation(neurons.shape[0])
+    trains = netsim.SpikeTrains.from_events(neurons[shuffle], steps[shuffle],
+                                            spike.shape[0], t)
+    expected = netsim.SpikeTrains.from_dense(spike, t)
+    np.testing.assert_array_equal(trains.indptr, expected.indptr)
+    np.testing.assert_array_equal(trains.steps, expected.steps)
+    np.testing.assert_array_equal(trains.to_dense(), spike)
+
+
+def test_spike_times_match_dense_loop():
+    spike, t = _dense()
+    trains = netsim.SpikeTrains.from_dense(spike, t)
+    # the loop of the original scripts
+    spike_times = []
+    for i in range(spike.shape[0]):
+        spike_times.append(t[spike[i, :] == 1])
+
+    listed = trains.spike_times()
+    assert len(listed) == spike.shape[0]
+    for i, expected in enumerate(spike_times):
+        np.testing.assert_array_equal(trains.spike_times(i), expected)
+        np.testing.assert_array_equal(listed[i], expected)
+
+
+def test_reorder_and_raster_follow_order():
+    spike, t = _dense()
+    trains = netsim.SpikeTrains.from_dense(spike, t)
+    order = np.random.default_rng(2).permutation(spike.shape[0])
+    np.testing.assert_array_equal(trains.reorder(order).to_dense(),
+                                  spike[order])
+
+    times, rows = trains.raster(order)
+    image = np.zeros_like(spike)
+    image[rows, np.searchsorted(t, times)] = 1
+    np.testing.assert_array_equal(image, spike[order])
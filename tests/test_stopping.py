@@ -0,0 +1,52 @@
+import numpy as np
+
+import netsim
+
+
+def _time_params(T=100, tau=0.1):
+    t = np.arange(0, T, tau)
+    return {'tau': tau, 'T': T, 't': t, 'n': t.shape[0]}
+
+
+def _params(n_trials=5):
+    params = netsim.default_learning_params()
+    for phase in ('acquisition', 'extinction', 'reacquisition'):
+        params['n_trials_' + phase] = n_trials
+    return params
+
+
+def test_window_skips_initial_trial():
+    # trial 0 is the untouched initial state: silent, weights at w_min
+    rec = {
+        'response': np.zeros((2, 10)),
+        'motor_act_rec': np.zeros((2, 10)),
+        'w_rec_d1': np.full((2, 10), 0.1),
+        'w_rec_d2': np.full((2, 10), 0.1),
+    }
+    params = _params()
+    silent = netsim.Silent(window=3)
+    assert silent(2, rec, params) is None
+    assert silent(3, rec, params) == 'silent'
+    # weights that never left w_min are not pinned
+    assert netsim.WeightsPinned(window=3)(5, rec, params) is None
+    rec['w_rec_d1'][:, 1:3] = 0.5
+    assert netsim.WeightsPinned(window=3)(5, rec, params) is None
+    rec['w_rec_d2'][:, 1:3] = 0.5
+    assert netsim.WeightsPinned(window=3)(5, rec, params) == 'weights pinned'
+
+
+def test_learning_run_fills_window_before_stopping():
+    window = 3
+    res = netsim.run_reward_learning(
+        2,
+        _time_params(),
+        _params(),
+        np.random.default_rng(0),
+        stopping=[
+            netsim.WeightConvergence(tol=np.inf, window=window),
+            netsim.Silent(min_activity=np.inf, window=window),
+        ])
+    # trials 1 .. window are simulated before any criterion may fire
+    assert res['stop_reason'] == 'weights converged'
+    assert res['n_trials_run'] == window + 1
+    assert np.all(np.isnan(res['w_rec_d1'][:, window + 1:]))
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+import netsim
+
+
+def test_index_is_written_on_flush_only(tmp_path):
+    path = str(tmp_path / 'store')
+    store = netsim.ResultStore(path, 'w')
+    store.append('x', np.ones((2, 3)))
+    assert 'x' not in netsim.ResultStore(path)
+    store.flush()
+    assert netsim.ResultStore(path)['x'].shape == (2, 3)
+    store.append('x', np.zeros((2, 4)))
+    store.close()
+    x = netsim.ResultStore(path)['x'].to_array()
+    np.testing.assert_array_equal(x[:, :3], 1)
+    np.testing.assert_array_equal(x[:, 3:], 0)
+    assert not os.path.exists(os.path.join(path, 'index.json.tmp'))
+
+
+def test_store_monitor_matches_simulate_network(tmp_path):
+    path = str(tmp_path / 'run')
+    t = np.arange(0, 300, 0.1)
+    time_params = {'tau': 0.1, 'T': 300, 't': t, 'n': t.shape[0]}
+    w = netsim.random_weights(5, 0.5, 2e3, seed=0)
+    I = np.full((5, 1), 600.)
+    ref = netsim.simulate_network(5, w, I, time_params, backend='numpy')
+    with netsim.ResultStore(path, 'w') as store:
+        netsim.run_network(5, w, I, time_params,
+                           monitors=[netsim.StoreMonitor(store)],
+                           backend='numpy', block_size=700)
+    store = netsim.ResultStore(path)
+    np.testing.assert_array_equal(store['g'].to_array(), ref[3])
+    np.testing.assert_array_equal(store['v'].to_array(), ref[2])
+    np.testing.assert_array_equal(store.spike_trains().to_dense(), ref[4])
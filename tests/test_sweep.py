@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pytest
+
+import netsim
+import netsim.sweep
+
+
+def test_grid_is_every_combination():
+    points = netsim.grid(p=[0.2, 0.95], ksyn=[1e3, 2e3, 3e3])
+    assert len(points) == 6
+    assert {(x['p'], x['ksyn']) for x in points} == {
+        (p, k) for p in (0.2, 0.95) for k in (1e3, 2e3, 3e3)
+    }
+
+
+@pytest.mark.parametrize('sample', [netsim.random_points, netsim.lhs])
+def test_points_stay_in_range(sample):
+    points = sample(50, seed=0, p=(0.1, 0.9), alpha=(1e-4, 1e-1, 'log'))
+    assert points == sample(50, seed=0, p=(0.1, 0.9),
+                            alpha=(1e-4, 1e-1, 'log'))
+    p = np.array([x['p'] for x in points])
+    alpha = np.array([x['alpha'] for x in points])
+    assert np.all((p >= 0.1) & (p <= 0.9))
+    assert np.all((alpha >= 1e-4) & (alpha <= 1e-1))
+
+
+def test_lhs_fills_every_stratum():
+    n = 20
+    points = netsim.lhs(n, seed=1, p=(0, 1), alpha=(1e-4, 1, 'log'))
+    p = np.array([x['p'] for x in points])
+    u = np.log(np.array([x['alpha'] for x in points]) / 1e-4) / np.log(1e4)
+    for x in (p, u):
+        np.testing.assert_array_equal(np.sort(np.floor(x * n)),
+                                      np.arange(n))
+
+
+def evaluate(point, rng, base):
+    # NOTE: calls are logged to a file, since a counter the function names
+    # would be part of its key
+    with open(os.path.join(base['log_dir'], 'calls'), 'a') as f:
+        f.write('{}\n'.format(point['x']))
+    if point['x'] == base['fail_at'] and os.path.exists(
+            os.path.join(base['log_dir'], 'interrupt')):
+        raise KeyboardInterrupt
+    return {'y': point['x'] + rng.random(), 'curve': rng.random(3)}
+
+
+def _calls(log_dir):
+    path = os.path.join(log_dir, 'calls')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        calls = [float(x) for x in f.read().split()]
+    os.remove(path)
+    return calls
+
+
+def test_interrupted_sweep_resumes_missing_points(tmp_path):
+    log_dir = str(tmp_path)
+    points = netsim.grid(x=[0.0, 1.0, 2.0, 3.0, 4.0])
+    base = {'log_dir': log_dir, 'fail_at': 3.0}
+
+    def sweep(store_dir):
+        return netsim.run_sweep(evaluate, points, base=base, seed=7,
+                                n_workers=1, store_dir=store_dir)
+
+    expected = sweep(None)
+    assert _calls(log_dir) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    store_dir = os.path.join(log_dir, 'store')
+    open(os.path.join(log_dir, 'interrupt'), 'w').close()
+    with pytest.raises(KeyboardInterrupt):
+        sweep(store_dir)
+    assert _calls(log_dir) == [0.0, 1.0, 2.0, 3.0]
+    assert len(os.listdir(store_dir)) == 3
+
+    os.remove(os.path.join(log_dir, 'interrupt'))
+    resumed = sweep(store_dir)
+    assert _calls(log_dir) == [3.0, 4.0]
+    np.testing.assert_array_equal(resumed['y'], expected['y'])
+    for a, b in zip(resumed['curve'], expected['curve']):
+        np.testing.assert_array_equal(a, b)
+
+    # nothing is left to run
+    sweep(store_dir)
+    assert _calls(log_dir) == []
+
+
+def test_stored_points_expire_with_code_version(tmp_path, monkeypatch):
+    log_dir = str(tmp_path)
+    points = netsim.grid(x=[0.0, 1.0])
+    base = {'log_dir': log_dir, 'fail_at': None}
+    store_dir = os.path.join(log_dir, 'store')
+
+    netsim.run_sweep(evaluate, points, base=base, seed=0, n_workers=1,
+                     store_dir=store_dir)
+    assert _calls(log_dir) == [0.0, 1.0]
+
+    monkeypatch.setattr(netsim.sweep, 'code_version', lambda: 'changed')
+    netsim.run_sweep(evaluate, points, base=base, seed=0, n_workers=1,
+                     store_dir=store_dir)
+    assert _calls(log_dir) == [0.0, 1.0]
@@ -1,11 +1,20 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
+import netsim
+
+# NOTE: figures are written to FIG_DIR; with INTERACTIVE they are also
+# opened in windows and plt.show() blocks until they are closed
+INTERACTIVE = False
+FIG_DIR = 'figures'
+os.makedirs(FIG_DIR, exist_ok=True)
 
 np.random.seed(1)
 tau = 0.1
 T = 3000
 t = np.arange(0, T, tau)
 n_steps = t.shape[0]
+time_params = {'tau': tau, 'T': T, 't': t, 'n': n_steps}
 
 # # striatal projection neuron
 # C = 50; vr = -80; vt = -25; vpeak = 40;
@@ -24,30 +33,20 @@ iz_params = np.array([
 n_cells = iz_params.shape[0]
 
 # define input signal
-I_in = np.zeros(n_steps)
-I_in[n_steps // 3:2 * n_steps // 3] = 3e2
+I_in = netsim.top_hat(3e2, n_steps // 3, 2 * n_steps // 3)
 
 w_in = np.zeros(n_cells)
 w_in[0] = 0.25
+I_ext = w_in * I_in
 
 # response of each spike on post synaptic membrane v
 psp_amp = 5e5
 psp_decay = 400
 
-# allocate memory for each neuron
-v = np.zeros((n_cells, n_steps))
-u = np.zeros((n_cells, n_steps))
-g = np.zeros((n_cells, n_steps))
-spike = np.zeros((n_cells, n_steps))
-v[:, 0] = iz_params[:, 1]
-
 # connection weight matrix
 w = np.zeros((n_cells, n_cells))
 w[0, 1] = 0.2
 
-# input into cells from other cells
-I_net = np.zeros((n_cells, n_steps))
-
 n_trials = 60
 obtained_reward = np.zeros(n_trials)
 predicted_reward = np.zeros(n_trials)
@@ -67,49 +66,25 @@ for trl in range(1, n_trials):
 
     print(trl)
 
-    v[:] = 0
-    g[:] = 0
-    spike[:] = 0
-    v[:, 0] = iz_params[:, 1]
-
-    for i in range(1, n_steps):
-
-        dt = t[i] - t[i - 1]
-
-        I_net[:] = 0
-        for jj in range(n_cells):
-            for kk in range(n_cells):
-                if jj != kk:
-                    I_net[jj, i - 1] += w[kk, jj] * g[kk, i - 1]
-
-            I_net[jj, i - 1] += w_in[jj] * I_in[i - 1]
-
-            C = iz_params[jj, 0]
-            vr = iz_params[jj, 1]
-            vt = iz_params[jj, 2]
-            vpeak = iz_params[jj, 3]
-            a = iz_params[jj, 4]
-            b = iz_params[jj, 5]
-            c = iz_params[jj, 6]
-            d = iz_params[jj, 7]
-            k = iz_params[jj, 8]
-
-            dvdt = (k * (v[jj, i - 1] - vr) *
-                    (v[jj, i - 1] - vt) - u[jj, i - 1] + I_net[jj, i - 1]) / C
-            dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
-            dgdt = (-g[jj, i - 1] + psp_amp * spike[jj, i - 1]) / psp_decay
-
-            v[jj, i] = v[jj, i - 1] + dvdt * dt
-            u[jj, i] = u[jj, i - 1] + dudt * dt
-            g[jj, i] = g[jj, i - 1] + dgdt * dt
-
-            if v[jj, i] >= vpeak:
-                v[jj, i - 1] = vpeak
-                v[jj, i] = c
-                u[jj, i] = u[jj, i] + d
-                spike[jj, i] = 1
-
-    motor_activity[trl] = g[-1, :].sum()
+    # NOTE: only per-trial sums are needed; full traces are kept for the
+    # last trial, which is the one plotted
+    summary = netsim.SummaryMonitor(('g', ))
+    monitors = [summary]
+    if trl == n_trials - 1:
+        trace = netsim.StateMonitor(('v', 'g'))
+        monitors.append(trace)
+    netsim.run_network(n_cells,
+                       w,
+                       I_ext,
+                       time_params,
+                       monitors,
+                       iz_params,
+                       psp_amp,
+                       psp_decay,
+                       syn_sign=1)
+    g_sum = summary.sum['g']
+
+    motor_activity[trl] = g_sum[-1]
     if motor_activity[trl] > resp_thresh:
         response[trl] = 1
     elif np.random.rand() < 0.3:
@@ -130,8 +105,8 @@ for trl in range(1, n_trials):
                                              1] + alpha_pr * delta[trl - 1]
     delta[trl] = obtained_reward[trl] - predicted_reward[trl]
 
-    pre = g[0, :].sum()
-    post = g[1, :].sum()
+    pre = g_sum[0]
+    post = g_sum[1]
     if delta[trl] > 0:
         w[0, 1] += alpha * pre * post * delta[trl] * (1 - w[0, 1])
     else:
@@ -139,22 +114,26 @@ for trl in range(1, n_trials):
 
     w_rec[trl] = w[0, 1]
 
+v = trace['v']
+g = trace['g']
+
 # NOTE: plot the results
-fig, ax = plt.subplots(4, 2, squeeze=False, figsize=(12, 7))
+fig, ax = netsim.new_figure(4, 2, figsize=(12, 7),
+                            interactive=INTERACTIVE)
 
-ax[0, 0].plot(t, I_in)
+netsim.plot_trace(ax[0, 0], t, I_in.block(0, n_steps)[0])
 ax[0, 0].set_title('Input signal')
 
 ax1 = ax[1, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[0, :], 'C0')
-ax2.plot(t, g[0, :], 'C1')
+netsim.plot_trace(ax1, t, v[0, :], color='C0')
+netsim.plot_trace(ax2, t, g[0, :], color='C1')
 ax1.set_title('Regular spiking neuron')
 
 ax1 = ax[2, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[1, :], 'C0')
-ax2.plot(t, g[1, :], 'C1')
+netsim.plot_trace(ax1, t, v[1, :], color='C0')
+netsim.plot_trace(ax2, t, g[1, :], color='C1')
 ax1.set_title('Striatal projection neuron')
 
 tt = np.arange(0, n_trials - 1, 1)
@@ -185,5 +164,7 @@ ax[3, 1].set_title('Response Threshold')
 
 [x.set_xticks(tt[::2]) for x in ax[:, 1].flatten()]
 [x.set_xticklabels(tt[::2]) for x in ax[:, 1].flatten()]
-plt.tight_layout()
-plt.show()
+fig.tight_layout()
+netsim.save_figure(fig, os.path.join(FIG_DIR, 'tmp_hw4.png'))
+if INTERACTIVE:
+    plt.show()
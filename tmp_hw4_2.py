@@ -1,5 +1,13 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
+import netsim
+
+# NOTE: figures are written to FIG_DIR; with INTERACTIVE they are also
+# opened in windows and plt.show() blocks until they are closed
+INTERACTIVE = False
+FIG_DIR = 'figures'
+os.makedirs(FIG_DIR, exist_ok=True)
 
 np.random.seed(1)
 
@@ -7,6 +15,7 @@ tau = 0.1
 T = 3000
 t = np.arange(0, T, tau)
 n_steps = t.shape[0]
+time_params = {'tau': tau, 'T': T, 't': t, 'n': n_steps}
 
 n_trials_acquisition = 20
 n_trials_extinction = 20
@@ -45,8 +54,6 @@ iz_params = np.array([
 
 n_cells = iz_params.shape[0]
 
-I_net = np.zeros((n_cells, n_steps))
-
 w = np.zeros((n_cells, n_cells))
 
 w_min = 0.1
@@ -56,16 +63,10 @@ w[0, 1] = w_min  # ctx -> d1
 w[0, 2] = w_min  # ctx -> d2
 w[2, 1] = -0.375  # d2 -> d1
 
-I_in = np.zeros(n_steps)
-I_in[n_steps // 3:2 * n_steps // 3] = 3e2
+I_in = netsim.top_hat(3e2, n_steps // 3, 2 * n_steps // 3)
 w_in = np.zeros(n_cells)
 w_in[0] = 0.6
-
-v = np.zeros((n_cells, n_steps))
-u = np.zeros((n_cells, n_steps))
-g = np.zeros((n_cells, n_steps))
-spike = np.zeros((n_cells, n_steps))
-v[:, 0] = iz_params[:, 1]
+I_ext = w_in * I_in
 
 obtained_reward = np.zeros((n_simulations, n_trials))
 predicted_reward = np.zeros((n_simulations, n_trials))
@@ -84,51 +85,27 @@ for sim in range(n_simulations):
 
         print(sim, trl)
 
-        v[:] = 0
-        g[:] = 0
-        spike[:] = 0
-        v[:, 0] = iz_params[:, 1]
-
-        for i in range(1, n_steps):
-
-            dt = t[i] - t[i - 1]
-
-            I_net[:] = 0
-            for jj in range(n_cells):
-                for kk in range(n_cells):
-                    if jj != kk:
-                        I_net[jj, i - 1] += w[kk, jj] * g[kk, i - 1]
-
-                I_net[jj, i - 1] += w_in[jj] * I_in[i - 1]
-
-                C = iz_params[jj, 0]
-                vr = iz_params[jj, 1]
-                vt = iz_params[jj, 2]
-                vpeak = iz_params[jj, 3]
-                a = iz_params[jj, 4]
-                b = iz_params[jj, 5]
-                c = iz_params[jj, 6]
-                d = iz_params[jj, 7]
-                k = iz_params[jj, 8]
-
-                dvdt = (k * (v[jj, i - 1] - vr) * (v[jj, i - 1] - vt) -
-                        u[jj, i - 1] + I_net[jj, i - 1]) / C
-                dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
-                dgdt = (-g[jj, i - 1] + psp_amp * spike[jj, i - 1]) / psp_decay
-
-                v[jj, i] = v[jj, i - 1] + dvdt * dt
-                u[jj, i] = u[jj, i - 1] + dudt * dt
-                g[jj, i] = g[jj, i - 1] + dgdt * dt
-
-                if v[jj, i] >= vpeak:
-                    v[jj, i - 1] = vpeak
-                    v[jj, i] = c
-                    u[jj, i] = u[jj, i] + d
-                    spike[jj, i] = 1
-
-        motor_act_rec[sim, trl] = g[1, :].sum()
-
-        if g[1, :].sum() > resp_thresh:
+        # NOTE: only per-trial sums are needed; full traces are kept for the
+        # last trial, which is the one plotted
+        summary = netsim.SummaryMonitor(('g', ))
+        monitors = [summary]
+        if trl == n_trials - 1:
+            trace = netsim.StateMonitor(('v', 'g'))
+            monitors.append(trace)
+        netsim.run_network(n_cells,
+                           w,
+                           I_ext,
+                           time_params,
+                           monitors,
+                           iz_params,
+                           psp_amp,
+                           psp_decay,
+                           syn_sign=1)
+        g_sum = summary.sum['g']
+
+        motor_act_rec[sim, trl] = g_sum[1]
+
+        if g_sum[1] > resp_thresh:
             response[sim, trl] = 1
         elif np.random.rand() < 0.3:
             response[sim, trl] = 1
@@ -153,9 +130,9 @@ for sim in range(n_simulations):
         delta[sim,
               trl] = obtained_reward[sim, trl] - predicted_reward[sim, trl]
 
-        pre = g[0, :].sum()
-        post_d1 = g[1, :].sum()
-        post_d2 = g[2, :].sum()
+        pre = g_sum[0]
+        post_d1 = g_sum[1]
+        post_d2 = g_sum[2]
         if delta[sim, trl] > 0:
             w[0,
               1] += alpha_d1 * pre * post_d1 * delta[sim,
@@ -173,28 +150,32 @@ for sim in range(n_simulations):
         w_rec_d1[sim, trl] = w[0, 1]
         w_rec_d2[sim, trl] = w[0, 2]
 
+v = trace['v']
+g = trace['g']
+
 # NOTE: plot the results
-fig, ax = plt.subplots(4, 2, squeeze=False, figsize=(12, 7))
+fig, ax = netsim.new_figure(4, 2, figsize=(12, 7),
+                            interactive=INTERACTIVE)
 
-ax[0, 0].plot(t, I_in)
+netsim.plot_trace(ax[0, 0], t, I_in.block(0, n_steps)[0])
 ax[0, 0].set_title('Input signal')
 
 ax1 = ax[1, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[0, :], 'C0')
-ax2.plot(t, g[0, :], 'C1')
+netsim.plot_trace(ax1, t, v[0, :], color='C0')
+netsim.plot_trace(ax2, t, g[0, :], color='C1')
 ax1.set_title('Regular spiking neuron')
 
 ax1 = ax[2, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[1, :], 'C0')
-ax2.plot(t, g[1, :], 'C1')
+netsim.plot_trace(ax1, t, v[1, :], color='C0')
+netsim.plot_trace(ax2, t, g[1, :], color='C1')
 ax1.set_title('Striatal projection neuron (d1)')
 
 ax1 = ax[3, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[2, :], 'C0')
-ax2.plot(t, g[2, :], 'C1')
+netsim.plot_trace(ax1, t, v[2, :], color='C0')
+netsim.plot_trace(ax2, t, g[2, :], color='C1')
 ax1.set_title('Striatal projection neuron (d2)')
 
 tt = np.arange(0, n_trials - 1, 1)
@@ -236,5 +217,7 @@ ax[3, 1].set_title('Motor thresh')
 
 [x.set_xticks(tt[::2]) for x in ax[:, 1].flatten()]
 [x.set_xticklabels(tt[::2]) for x in ax[:, 1].flatten()]
-plt.tight_layout()
-plt.show()
+fig.tight_layout()
+netsim.save_figure(fig, os.path.join(FIG_DIR, 'tmp_hw4_2.png'))
+if INTERACTIVE:
+    plt.show()
@@ -1,19 +1,26 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
+import netsim
 
-np.random.seed(0)
+# NOTE: figures are written to FIG_DIR; with INTERACTIVE they are also
+# opened in windows and plt.show() blocks until they are closed
+INTERACTIVE = False
+FIG_DIR = 'figures'
+os.makedirs(FIG_DIR, exist_ok=True)
 
 tau = 0.1
 T = 3000
 t = np.arange(0, T, tau)
 n_steps = t.shape[0]
+time_params = {'tau': tau, 'T': T, 't': t, 'n': n_steps}
 
 n_trials_acquisition = 20
 n_trials_extinction = 20
 n_trials_reacquisition = 20
 n_trials = n_trials_acquisition + n_trials_extinction + n_trials_reacquisition
 
-n_simulations = 1
+n_simulations = 100
 
 alpha_d1 = 1e-15
 beta_d1 = 1e-15
@@ -27,7 +34,6 @@ psp_amp = 5e5
 psp_decay = 400
 
 resp_thresh = 5e5
-motor_act_rec = np.zeros((n_simulations, n_trials))
 
 # # striatal projection neuron
 # C = 50; vr = -80; vt = -25; vpeak = 40;
@@ -45,8 +51,6 @@ iz_params = np.array([
 
 n_cells = iz_params.shape[0]
 
-I_net = np.zeros((n_cells, n_steps))
-
 w = np.zeros((n_cells, n_cells))
 
 w_min = 0.1
@@ -56,155 +60,78 @@ w[0, 1] = w_min  # ctx -> d1
 w[0, 2] = w_min  # ctx -> d2
 w[2, 1] = -0.05  # d2 -> d1
 
+input_amp = 3e2
 I_in = np.zeros(n_steps)
-I_in[n_steps // 3:2 * n_steps // 3] = 3e2
+I_in[n_steps // 3:2 * n_steps // 3] = input_amp
 w_in = np.zeros(n_cells)
 w_in[0] = 0.6
 
-v = np.zeros((n_cells, n_steps))
-u = np.zeros((n_cells, n_steps))
-g = np.zeros((n_cells, n_steps))
-spike = np.zeros((n_cells, n_steps))
-v[:, 0] = iz_params[:, 1]
-
-obtained_reward = np.zeros((n_simulations, n_trials))
-predicted_reward = np.zeros((n_simulations, n_trials))
-delta = np.zeros((n_simulations, n_trials))
-response = np.zeros((n_simulations, n_trials))
-reward = np.zeros((n_simulations, n_trials))
-
-w_rec_d1 = np.zeros((n_simulations, n_trials))
-w_rec_d2 = np.zeros((n_simulations, n_trials))
-w_rec_d1[0] = w[0, 1]
-w_rec_d2[0] = w[0, 2]
-
-for sim in range(n_simulations):
-
-    for trl in range(1, n_trials):
-
-        print(sim, trl)
-
-        v[:] = 0
-        g[:] = 0
-        spike[:] = 0
-        v[:, 0] = iz_params[:, 1]
-
-        for i in range(1, n_steps):
-
-            dt = t[i] - t[i - 1]
-
-            I_net[:] = 0
-            for jj in range(n_cells):
-                for kk in range(n_cells):
-                    if jj != kk:
-                        I_net[jj, i - 1] += w[kk, jj] * g[kk, i - 1]
-
-                I_net[jj, i - 1] += w_in[jj] * I_in[i - 1]
-
-                C = iz_params[jj, 0]
-                vr = iz_params[jj, 1]
-                vt = iz_params[jj, 2]
-                vpeak = iz_params[jj, 3]
-                a = iz_params[jj, 4]
-                b = iz_params[jj, 5]
-                c = iz_params[jj, 6]
-                d = iz_params[jj, 7]
-                k = iz_params[jj, 8]
-
-                dvdt = (k * (v[jj, i - 1] - vr) * (v[jj, i - 1] - vt) -
-                        u[jj, i - 1] + I_net[jj, i - 1]) / C
-                dudt = a * (b * (v[jj, i - 1] - vr) - u[jj, i - 1])
-                dgdt = (-g[jj, i - 1] + psp_amp * spike[jj, i - 1]) / psp_decay
-
-                v[jj, i] = v[jj, i - 1] + dvdt * dt
-                u[jj, i] = u[jj, i - 1] + dudt * dt
-                g[jj, i] = g[jj, i - 1] + dgdt * dt
-
-                if v[jj, i] >= vpeak:
-                    v[jj, i - 1] = vpeak
-                    v[jj, i] = c
-                    u[jj, i] = u[jj, i] + d
-                    spike[jj, i] = 1
-
-        motor_act_rec[sim, trl] = g[1, :].sum()
-
-        wd1 = w[0, 1]
-        wd2 = w[0, 2]
-        resp_act = np.clip(wd1 - wd2, 0, 1)
-        resp_prob = 1 / (1 + np.exp(-10 * (resp_act - 0.2)))
-
-        # x = np.linspace(0, 1, 1000)
-        # y = 1 / (1 + np.exp(-10 * (x - 0.2)))
-        # plt.plot(x, y)
-        # plt.show()
-
-        if resp_prob > np.random.rand():
-            response[sim, trl] = 1
-        elif np.random.rand() < 0.2:
-            response[sim, trl] = 1
-        else:
-            response[sim, trl] = 0
-
-        if trl < n_trials_acquisition:
-            if response[sim, trl] == 1:
-                if np.random.rand() < 1:
-                    obtained_reward[sim, trl] = 1
-
-        elif trl >= n_trials_acquisition and trl < n_trials_acquisition + n_trials_extinction:
-            obtained_reward[sim, trl] = 0
-
-        elif trl >= n_trials_acquisition + n_trials_extinction:
-            if response[sim, trl] == 1:
-                if np.random.rand() < 1:
-                    obtained_reward[sim, trl] = 1
-
-        predicted_reward[sim, trl] = predicted_reward[
-            sim, trl - 1] + alpha_pr * delta[sim, trl - 1]
-        delta[sim,
-              trl] = obtained_reward[sim, trl] - predicted_reward[sim, trl]
-
-        pre = g[0, :].sum()
-        post_d1 = g[1, :].sum()
-        post_d2 = g[2, :].sum()
-        if delta[sim, trl] > 0:
-            w[0,
-              1] += alpha_d1 * pre * post_d1 * delta[sim,
-                                                     trl] * (w_max - w[0, 1])
-            w[0, 2] -= beta_d2 * pre * post_d2 * delta[sim, trl] * w_min
-        else:
-            w[0, 1] += beta_d1 * pre * post_d1 * delta[sim, trl] * w_min
-            w[0,
-              2] -= alpha_d2 * pre * post_d2 * delta[sim,
-                                                     trl] * (w_max - w[0, 2])
-
-        w[0, 1] = np.clip(w[0, 1], w_min, w_max)
-        w[0, 2] = np.clip(w[0, 2], w_min, w_max)
-
-        w_rec_d1[sim, trl] = w[0, 1]
-        w_rec_d2[sim, trl] = w[0, 2]
+params = {
+    'iz_params': iz_params,
+    'w': w,
+    'w_in': w_in,
+    'input_amp': input_amp,
+    'psp_amp': psp_amp,
+    'psp_decay': psp_decay,
+    'n_trials_acquisition': n_trials_acquisition,
+    'n_trials_extinction': n_trials_extinction,
+    'n_trials_reacquisition': n_trials_reacquisition,
+    'alpha_d1': alpha_d1,
+    'beta_d1': beta_d1,
+    'alpha_d2': alpha_d2,
+    'beta_d2': beta_d2,
+    'alpha_pr': alpha_pr,
+    'w_min': w_min,
+    'w_max': w_max,
+    'p_reward': 1.0,
+    'p_guess': 0.2,
+}
+
+# NOTE: every simulation advances together along a leading simulation axis,
+# each with its own response / reward draws
+res = netsim.run_reward_learning(n_simulations,
+                                 time_params,
+                                 params,
+                                 rng=np.random.default_rng(0),
+                                 verbose=True,
+                                 checkpoint='tmp_hw4_3_checkpoint.npz',
+                                 checkpoint_every=5)
+
+obtained_reward = res['obtained_reward']
+predicted_reward = res['predicted_reward']
+delta = res['delta']
+response = res['response']
+motor_act_rec = res['motor_act_rec']
+w_rec_d1 = res['w_rec_d1']
+w_rec_d2 = res['w_rec_d2']
+
+# traces from the final trial of the first simulation
+v = res['v']
+g = res['g']
 
 # NOTE: plot the results
-fig, ax = plt.subplots(4, 2, squeeze=False, figsize=(12, 7))
+fig, ax = netsim.new_figure(4, 2, figsize=(12, 7),
+                            interactive=INTERACTIVE)
 
-ax[0, 0].plot(t, I_in)
+netsim.plot_trace(ax[0, 0], t, I_in)
 ax[0, 0].set_title('Input signal')
 
 ax1 = ax[1, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[0, :], 'C0')
-ax2.plot(t, g[0, :], 'C1')
+netsim.plot_trace(ax1, t, v[0, :], color='C0')
+netsim.plot_trace(ax2, t, g[0, :], color='C1')
 ax1.set_title('Regular spiking neuron')
 
 ax1 = ax[2, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[1, :], 'C0')
-ax2.plot(t, g[1, :], 'C1')
+netsim.plot_trace(ax1, t, v[1, :], color='C0')
+netsim.plot_trace(ax2, t, g[1, :], color='C1')
 ax1.set_title('Striatal projection neuron (d1)')
 
 ax1 = ax[3, 0]
 ax2 = ax1.twinx()
-ax1.plot(t, v[2, :], 'C0')
-ax2.plot(t, g[2, :], 'C1')
+netsim.plot_trace(ax1, t, v[2, :], color='C0')
+netsim.plot_trace(ax2, t, g[2, :], color='C1')
 ax1.set_title('Striatal projection neuron (d2)')
 
 tt = np.arange(0, n_trials - 1, 1)
@@ -246,5 +173,7 @@ ax[3, 1].set_title('Motor thresh')
 
 [x.set_xticks(tt[::2]) for x in ax[:, 1].flatten()]
 [x.set_xticklabels(tt[::2]) for x in ax[:, 1].flatten()]
-plt.tight_layout()
-plt.show()
+fig.tight_layout()
+netsim.save_figure(fig, os.path.join(FIG_DIR, 'tmp_hw4_3.png'))
+if INTERACTIVE:
+    plt.show()